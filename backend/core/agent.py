@@ -1,18 +1,29 @@
 import os
-import traceback
 import json
 from datetime import datetime, timedelta
 from dateutil import parser as date_parser
 from services.gpt import parse_intent
-from services.caldotcom import get_available_slots, book_slot_v2, get_event_type_id_by_duration
+from services.llm_gateway import generate as llm_generate
+from services.caldotcom import async_get_available_slots, async_book_slot_v2, lookup_event_type_id, CAL_AVAILABILITY_TTL
 from services.tts import speak
 import random
 import uuid
 import time
 import asyncio
 import re
+import difflib
 from typing import Tuple
 from services.twilio_sms import send_sms
+from core.session_store import create_session_store
+from core.log_writer import BatchedLogWriter, JsonlFileSink
+from core.lead_store import LeadStore
+from core.analytics import ANALYTICS
+from supabase_client import CALL_RECORDER
+from services.circuit_breaker import CALCOM_BREAKER, GEMINI_BREAKER, CircuitOpenError, FALLBACK_REPLIES, fallback_reply
+from core.logger import get_logger, CALL_SID
+from core.tracing import begin_turn, current_trace, end_turn, stage, traced
+
+log = get_logger("agent")
 
 # Hardcoded business context
 BUSINESS_CONTEXT = {
@@ -39,10 +50,11 @@ QUALIFICATION_PROFILE = {
     }
 }
 
-# Global session memory dict
-SESSION_MEMORY = {}
-# Global Cal.com 401 cache
-CAL_API_401_CACHE = {"last_401": 0}
+# Session used when a caller has no CallSid (local /stream and simulations)
+DEFAULT_SESSION_ID = "simulate_call_user_1"
+
+# Per-call session state (in-memory with idle eviction, or SQLite via SESSION_STORE=sqlite)
+SESSION_STORE = create_session_store()
 
 # --- JUNK MESSAGE PATTERNS ---
 JUNK_PATTERNS = [
@@ -57,6 +69,28 @@ ROUTER_RESPONSE_TEMPLATES = {
     "pending_booking": lambda state: "Hold tight — we're just finishing up your booking. Will ping you once it's confirmed."
 }
 
+# --- STATIC RESPONSES ---
+BOOKING_UNAVAILABLE_TEXT = fallback_reply("calcom")
+CANCEL_CONFIRMED_TEXT = "No worries, your call has been canceled. If you’d ever like to reconnect, just ping us — we’ll be here."
+ALREADY_CANCELLED_TEXT = "Your call was already cancelled."
+NO_BOOKING_TO_CANCEL_TEXT = "There is no active booking to cancel."
+# First thing a caller hears on the media stream path
+GREETING_TEXT = "Hi, this is Chronos. How can I help you today?"
+
+def static_responses():
+    """
+    Every fixed reply the agent can speak, for pre-warming the TTS cache.
+    """
+    templates = [template({}) for template in ROUTER_RESPONSE_TEMPLATES.values()]
+    fixed = [GREETING_TEXT, BOOKING_UNAVAILABLE_TEXT, CANCEL_CONFIRMED_TEXT, ALREADY_CANCELLED_TEXT, NO_BOOKING_TO_CANCEL_TEXT]
+    return templates + fixed + list(FALLBACK_REPLIES.values())
+
+# --- BATCHED LOGS ---
+ROUTER_LOG = BatchedLogWriter(JsonlFileSink("router_log.jsonl"))
+# Qualified leads go to an indexed SQLite table (see core/lead_store.py)
+LEAD_STORE = LeadStore()
+DAILY_LOG = BatchedLogWriter(LEAD_STORE)
+
 # --- ROUTER LOGGING ---
 def log_router_action(session_id, reason, user_utterance, action_taken):
     log_entry = {
@@ -66,12 +100,9 @@ def log_router_action(session_id, reason, user_utterance, action_taken):
         "user_utterance": user_utterance,
         "action_taken": action_taken
     }
-    print(f"[router] {log_entry}")
-    try:
-        with open("router_log.jsonl", "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as e:
-        print(f"[router] Failed to log: {e}")
+    log.info("Router skipped Gemini (%s)", reason, extra={"router_reason": reason})
+    # Queued for the background flusher; never touches the filesystem on the turn path
+    ROUTER_LOG.write_nowait(log_entry)
 
 # --- ROUTER FUNCTION ---
 def should_skip_gemini(user_utterance: str, session_state: dict) -> Tuple[bool, str]:
@@ -91,27 +122,115 @@ def should_skip_gemini(user_utterance: str, session_state: dict) -> Tuple[bool,
             return True, "duplicate_intent_within_30s"
     return False, None
 
+def _opened_session(state, created):
+    if created:
+        ANALYTICS.incr("calls")
+        start_availability_prefetch(state)
+    return state
+
 def get_session_state(session_id):
-    if session_id not in SESSION_MEMORY:
-        SESSION_MEMORY[session_id] = {
-            "last_intent": None,
-            "last_slot": None,
-            "last_contact": None,
-            "errors": [],
-            "last_booking": None,  # Track last booking per session
-            "cancelled": False,
-            "qualified": None,     # Cache qualification result
-            "last_user_utterance": None,  # Cache last user input
-            "last_intent_result": None,   # Cache last intent/slot/duration
-        }
-    return SESSION_MEMORY[session_id]
+    """
+    This process's record for the session; never touches a shared store.
+    """
+    return _opened_session(*SESSION_STORE.get_or_create(session_id))
+
+async def load_session_state(session_id):
+    """
+    Like get_session_state, but first picks up what another worker saved (SQLite store).
+    """
+    return _opened_session(*await SESSION_STORE.load(session_id))
+
+def save_session_state(state):
+    SESSION_STORE.save(state)
+
+# --- SPECULATIVE AVAILABILITY PREFETCH ---
+AVAILABILITY_PREFETCH_ENABLED = os.getenv("AGENT_PREFETCH_AVAILABILITY", "1") != "0"
+
+def default_event_type_id():
+    return int(os.getenv("CAL_EVENT_TYPE_ID") or 0)
+
+def _consume_task_exception(task):
+    if not task.cancelled():
+        task.exception()
+
+def start_availability_prefetch(state, event_type_id=None):
+    """
+    Start fetching availability in the background so a booking turn finds it resolved.
+    No-op without a running event loop or if a fresh prefetch is already in progress.
+    """
+    if not AVAILABILITY_PREFETCH_ENABLED:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    event_type_id = event_type_id or default_event_type_id()
+    if not event_type_id:
+        return None
+    prefetch = state.get("availability_prefetch")
+    if (prefetch and prefetch["event_type_id"] == event_type_id and prefetch["task"].get_loop() is loop
+            and time.monotonic() - prefetch["started_at"] < CAL_AVAILABILITY_TTL):
+        return prefetch["task"]
+    task = asyncio.create_task(async_get_available_slots(event_type_id=event_type_id))
+    task.add_done_callback(_consume_task_exception)
+    state["availability_prefetch"] = {"task": task, "event_type_id": event_type_id, "started_at": time.monotonic()}
+    return task
+
+def discard_availability_prefetch(state):
+    prefetch = state.get("availability_prefetch")
+    if prefetch:
+        if not prefetch["task"].done():
+            prefetch["task"].cancel()
+        state["availability_prefetch"] = None
+
+@traced("calcom_availability")
+async def get_turn_availability(state, event_type_id):
+    """
+    Use the speculative prefetch if it matches this event type and is still fresh;
+    otherwise fetch (through the shared availability cache).
+    """
+    prefetch = state.get("availability_prefetch")
+    state["availability_prefetch"] = None
+    if (prefetch and prefetch["event_type_id"] == event_type_id
+            and not prefetch["task"].cancelled()
+            and prefetch["task"].get_loop() is asyncio.get_running_loop()
+            and time.monotonic() - prefetch["started_at"] < CAL_AVAILABILITY_TTL):
+        try:
+            return await prefetch["task"]
+        except Exception as e:
+            log.warning("Availability prefetch failed (%r), refetching", e)
+    return await async_get_available_slots(event_type_id=event_type_id)
+
+def record_booking(state, session_id, confirmation, slot, contact):
+    log.info("Booked %s", slot, extra={"booking": confirmation})
+    ANALYTICS.incr("booking:success")
+    CALL_RECORDER.set_booking(session_id, slot)
+    state["last_booking"] = {
+        "confirmation": confirmation,
+        "slot": slot,
+        "contact": contact["name"]
+    }
+    state["cancelled"] = False
+
+def _record_detached_booking(task, session_id, slot, contact):
+    """
+    Done callback for a booking whose turn was cancelled (barge-in) while Cal.com
+    was answering: the booking still lands in the session for the next turn.
+    """
+    state = get_session_state(session_id)
+    if task.cancelled() or task.exception() is not None:
+        ANALYTICS.incr("booking:failure")
+    else:
+        record_booking(state, session_id, task.result(), slot, contact)
+    # Held since the turn was cancelled so a repeated "book it" can't book the slot twice
+    state["booking_pending"] = False
+    save_session_state(state)
 
 def pick_contact():
     # For now, always pick the first contact (Vaishakh)
     return BUSINESS_CONTEXT["contacts"][0]
 
 async def generate_llm_reply(intent, slot, contact, error=None):
-    from services.gpt import model
     prompt = f"""
 You are an AI scheduling assistant. Be direct and concise. Help the user book, reschedule, or cancel a call. Only ask for what is needed. Do not repeat information or add unnecessary politeness.
 Intent: {intent}
@@ -120,8 +239,7 @@ Contact: {contact['name']} ({contact['role']})
 """
     if error:
         prompt += f"\nError: {error}\nRespond with a short, actionable next step."
-    res = await asyncio.to_thread(model.generate_content, prompt)
-    raw = res.text.strip()
+    raw = await llm_generate(prompt)
     if raw.startswith('```'):
         raw = raw.split('\n', 1)[-1]
         if raw.endswith('```'):
@@ -130,7 +248,6 @@ Contact: {contact['name']} ({contact['role']})
     return raw
 
 async def classify_qualification(user_utterance: str, business_context, qualification_profile):
-    from services.gpt import model
     prompt = f"""
 Given the following user message, return ONLY this JSON:
 {{
@@ -140,8 +257,7 @@ Given the following user message, return ONLY this JSON:
 }}
 User message: "{user_utterance}"
 """
-    res = await asyncio.to_thread(model.generate_content, prompt)
-    raw = res.text.strip()
+    raw = await llm_generate(prompt)
     if raw.startswith('```'):
         raw = raw.split('\n', 1)[-1]
         if raw.endswith('```'):
@@ -152,9 +268,244 @@ User message: "{user_utterance}"
         q = json.loads(raw)
         return q
     except Exception as e:
-        print(f"[agent] Qualification parse error: {e}, raw: {raw}")
+        log.warning("Qualification parse error: %s", e, extra={"raw": raw})
         return {"qualified": False, "reason": "Could not parse LLM output", "route_to": None}
 
+# --- FUSED TURN PLANNER ---
+# One Gemini call returning qualification, intent, datetime, duration and a reply draft.
+# Disable with AGENT_TURN_PLANNER=0 to use the three sequential calls instead.
+TURN_PLANNER_ENABLED = os.getenv("AGENT_TURN_PLANNER", "1") != "0"
+TURN_PLAN_INTENTS = ("book_call", "cancel_call", "reschedule_call", "ask_question", "other")
+SLOT_PLACEHOLDER = "{slot}"
+
+def validate_turn_plan(plan):
+    """
+    Strictly validate a turn plan. Returns a normalised dict or raises ValueError.
+    """
+    if not isinstance(plan, dict):
+        raise ValueError("turn plan must be a JSON object")
+    qualified = plan.get("qualified")
+    if not isinstance(qualified, bool):
+        raise ValueError(f"qualified must be a boolean, got {qualified!r}")
+    route_to = plan.get("route_to")
+    if route_to not in (None, "Aryan", "Ignore"):
+        raise ValueError(f"route_to must be null, 'Aryan' or 'Ignore', got {route_to!r}")
+    intent = plan.get("intent")
+    if intent not in TURN_PLAN_INTENTS:
+        raise ValueError(f"intent must be one of {TURN_PLAN_INTENTS}, got {intent!r}")
+    for field in ("reason", "datetime", "duration"):
+        if plan.get(field) is not None and not isinstance(plan[field], str):
+            raise ValueError(f"{field} must be a string or null")
+    reply = plan.get("reply")
+    if not isinstance(reply, str) or not reply.strip():
+        raise ValueError("reply must be a non-empty string")
+    return {
+        "qualified": qualified,
+        "reason": plan.get("reason") or "",
+        "route_to": route_to,
+        "intent": intent,
+        "datetime": plan.get("datetime"),
+        "duration": plan.get("duration"),
+        "reply": reply.strip(),
+    }
+
+async def plan_turn(user_utterance: str, contact):
+    """
+    Fused qualification + intent + reply draft in a single LLM round trip.
+    Returns a validated plan dict, or None if the response doesn't match the schema
+    (the caller then falls back to the sequential path).
+    """
+    prompt = f"""
+You are an AI scheduling assistant for {BUSINESS_CONTEXT['seller']}. Be direct and concise.
+Ideal caller: {QUALIFICATION_PROFILE['ideal_user']['type']} with revenue {QUALIFICATION_PROFILE['ideal_user']['revenue']}.
+Unqualified callers with generic service offers or cold sales go to "Aryan"; job seekers are "Ignore".
+Contact for qualified callers: {contact['name']} ({contact['role']})
+
+User message: "{user_utterance}"
+
+Return ONLY this JSON:
+{{
+  "qualified": true/false,
+  "reason": "...",
+  "route_to": null or "Aryan" or "Ignore",
+  "intent": one of {list(TURN_PLAN_INTENTS)},
+  "datetime": "..." or null,
+  "duration": "..." or null,  // e.g. '15m', '30m', '1 hour'
+  "reply": "..."  // one short sentence to speak to the caller
+}}
+If intent is "book_call", the reply must confirm the booking and contain the literal text {SLOT_PLACEHOLDER} where the booked time goes.
+"""
+    raw = await llm_generate(prompt)
+    if raw.startswith('```'):
+        raw = raw.split('\n', 1)[-1]
+        if raw.endswith('```'):
+            raw = raw.rsplit('```', 1)[0]
+        raw = raw.strip()
+    try:
+        return validate_turn_plan(json.loads(raw))
+    except Exception as e:
+        log.warning("Turn plan rejected (%s), falling back", e, extra={"raw": raw})
+        return None
+
+def plan_reply(plan, slot=None):
+    """
+    Reply draft from a turn plan, with the booked slot filled in. None if unusable.
+    """
+    if not plan:
+        return None
+    reply = plan["reply"]
+    if SLOT_PLACEHOLDER in reply:
+        if slot is None:
+            return None
+        return reply.replace(SLOT_PLACEHOLDER, str(slot))
+    return reply
+
+# --- SPECULATIVE TURNS ---
+# Plan the turn (and warm availability) from a stable partial transcript while the
+# STT endpointer is still deciding the caller is done; the final transcript reuses the
+# result if it says (nearly) the same thing. Disable with AGENT_SPECULATIVE_TURNS=0.
+SPECULATIVE_TURNS_ENABLED = os.getenv("AGENT_SPECULATIVE_TURNS", "1") != "0"
+# difflib ratio between the speculated and the final utterance needed to keep the result
+SPECULATIVE_MIN_SIMILARITY = float(os.getenv("AGENT_SPECULATIVE_MIN_SIMILARITY", "0.9"))
+# A partial is stable once it has this many words and hasn't changed for this long
+SPECULATIVE_MIN_WORDS = int(os.getenv("AGENT_SPECULATIVE_MIN_WORDS", "3"))
+SPECULATIVE_STABLE_MS = float(os.getenv("AGENT_SPECULATIVE_STABLE_MS", "300"))
+
+def _normalise_utterance(text):
+    return " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+
+def speculation_matches(speculated, final):
+    """
+    True if a plan made for `speculated` can stand in for `final`: similar enough
+    overall, and the same numbers, since "at 3" vs "at 4" is one character but a different booking.
+    """
+    speculated, final = _normalise_utterance(speculated), _normalise_utterance(final)
+    if re.findall(r"\d+", speculated) != re.findall(r"\d+", final):
+        return False
+    return difflib.SequenceMatcher(None, speculated, final).ratio() >= SPECULATIVE_MIN_SIMILARITY
+
+async def _speculative_plan(user_utterance, contact):
+    if TURN_PLANNER_ENABLED:
+        return {"plan": await plan_turn(user_utterance, contact)}
+    qualification, intent_result = await asyncio.gather(
+        classify_qualification(user_utterance, BUSINESS_CONTEXT, QUALIFICATION_PROFILE),
+        parse_intent(user_utterance),
+    )
+    return {"qualification": qualification, "intent_result": intent_result}
+
+def speculate_turn(user_utterance, session_id):
+    """
+    Start planning a turn for a partial transcript in the background.
+    Replaces (and cancels) any earlier speculation for the session. No-op without a
+    running event loop, for utterances the router would answer without Gemini,
+    or while a booking is in flight.
+    """
+    if not SPECULATIVE_TURNS_ENABLED:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    state = get_session_state(session_id)
+    current = state.get("speculation")
+    if current and current["text"] == user_utterance and current["task"].get_loop() is loop:
+        return current["task"]
+    discard_speculation(state)
+    if (state.get("booking_pending") or user_utterance == state.get("last_user_utterance")
+            or should_skip_gemini(user_utterance, state)[0]):
+        return None
+    contact = pick_contact()
+    start_availability_prefetch(state)
+    task = asyncio.create_task(_speculative_plan(user_utterance, contact))
+    task.add_done_callback(_consume_task_exception)
+    state["speculation"] = {"text": user_utterance, "task": task, "contact": contact}
+    ANALYTICS.incr("speculation:started")
+    log.debug("Speculating on partial: %s", user_utterance)
+    return task
+
+def discard_speculation(state):
+    speculation = state.get("speculation")
+    if speculation:
+        if not speculation["task"].done():
+            speculation["task"].cancel()
+        state["speculation"] = None
+
+async def take_speculation(state, user_utterance):
+    """
+    The speculative result for this final utterance ({"plan"} or {"qualification",
+    "intent_result"}, plus "contact"), or None if there is none or it doesn't match.
+    """
+    speculation = state.get("speculation")
+    state["speculation"] = None
+    if not speculation:
+        return None
+    task = speculation["task"]
+    if (task.cancelled() or task.get_loop() is not asyncio.get_running_loop()
+            or not speculation_matches(speculation["text"], user_utterance)):
+        if not task.done():
+            task.cancel()
+        ANALYTICS.incr("speculation:miss")
+        log.debug("Speculation discarded: %r -> %r", speculation["text"], user_utterance)
+        return None
+    try:
+        # Only the part of the speculative plan the final transcript still had to wait for
+        with stage("speculation_wait"):
+            result = await task
+    except Exception as e:
+        log.warning("Speculative plan failed (%r), planning again", e)
+        ANALYTICS.incr("speculation:miss")
+        return None
+    ANALYTICS.incr("speculation:hit")
+    log.info("Using speculative plan from partial: %s", speculation["text"])
+    return {**result, "contact": speculation["contact"]}
+
+class PartialSpeculator:
+    """
+    Per-call debounce between the transcript stream and speculate_turn: a partial
+    with at least SPECULATIVE_MIN_WORDS words that stays unchanged for
+    SPECULATIVE_STABLE_MS starts a speculative turn; a final or end cancels the wait.
+    Feed it every (kind, text) from services.assembly.parse_message.
+    """
+
+    def __init__(self, session_id, stable_ms=SPECULATIVE_STABLE_MS, min_words=SPECULATIVE_MIN_WORDS):
+        self.session_id = session_id
+        self.stable_seconds = stable_ms / 1000
+        self.min_words = min_words
+        self._timer = None
+        self._text = None
+
+    def update(self, kind, text):
+        if not SPECULATIVE_TURNS_ENABLED:
+            return
+        if kind == "partial":
+            if text == self._text or len(text.split()) < self.min_words:
+                return
+            self.cancel()
+            self._text = text
+            self._timer = asyncio.get_running_loop().call_later(
+                self.stable_seconds, speculate_turn, text, self.session_id
+            )
+        elif kind in ("final", "end"):
+            self.cancel()
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._text = None
+
+async def fallback_llm_reply(error):
+    """
+    Reply for a turn that failed. Uses the canned Gemini fallback (with pre-warmed audio)
+    when Gemini itself is tripped or unreachable, instead of waiting on it again.
+    """
+    if not isinstance(error, CircuitOpenError) and not GEMINI_BREAKER.is_open():
+        try:
+            return await generate_llm_reply("unknown", None, pick_contact(), error=str(error))
+        except Exception as e:
+            log.warning("Fallback reply failed: %s", e)
+    return fallback_reply("gemini")
+
 def split_date_ranges_to_slots(date_ranges, slot_length_minutes=30):
     slots = []
     for rng in date_ranges:
@@ -175,17 +526,55 @@ def ensure_mock_dir():
         os.makedirs(mock_dir)
     return mock_dir
 
-async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_1'):
+def cleanup_mock_wavs(max_age_seconds):
+    """
+    Delete per-turn response_*.wav files older than max_age_seconds. TTS cache
+    files (tts_*) are left to services.tts_cache. Returns the number removed.
+    """
+    mock_dir = ensure_mock_dir()
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(mock_dir):
+        if not (name.startswith("response_") and name.endswith(".wav")):
+            continue
+        path = os.path.join(mock_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+async def agent_loop(user_utterance: str, session_id: str = DEFAULT_SESSION_ID, synthesize: bool = True):
+    """
+    Run one conversational turn. With synthesize=False no TTS file is written
+    (tts_path is None) so the caller can stream audio via services.tts.speak_stream.
+    """
+    turn_started = time.monotonic()
+    ANALYTICS.incr("turns")
+    # Tag this turn's log records (the request or call task owns the context)
+    CALL_SID.set(session_id)
+    # Streaming routes start the trace when the final transcript arrives; otherwise it starts here
+    trace = current_trace()
+    owns_trace = trace is None
+    if owns_trace:
+        trace = begin_turn(session_id, started_at=turn_started)
     try:
-        print(f"[agent] User utterance: {user_utterance}")
-        state = get_session_state(session_id)
+        log.info("User utterance: %s", user_utterance)
+        state = await load_session_state(session_id)
         # --- PRE-GEMINI ROUTER ---
-        skip, reason = should_skip_gemini(user_utterance, state)
+        with stage("router"):
+            skip, reason = should_skip_gemini(user_utterance, state)
         if skip:
+            discard_speculation(state)
             response_text = ROUTER_RESPONSE_TEMPLATES[reason](state)
             log_router_action(session_id, reason, user_utterance, f"Skipped Gemini. Returned: {response_text}")
+            ANALYTICS.incr(f"router_skip:{reason}")
+            CALL_RECORDER.add_turn(session_id, user_utterance, response_text)
             # For junk, skip TTS to save tokens
-            tts_path = None if reason == "junk_message" else await speak(response_text)
+            tts_path = None if reason == "junk_message" or not synthesize else await speak(response_text)
+            ANALYTICS.observe_latency((time.monotonic() - turn_started) * 1000)
             return {
                 "text": response_text,
                 "tts_path": tts_path,
@@ -197,23 +586,57 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
                 "session_id": session_id
             }
         # --- END ROUTER ---
-        # 1. Qualification step (cache)
-        if state.get("qualified") is not None and user_utterance == state.get("last_user_utterance"):
-            qualification = state["qualified"]
-            print(f"[agent] (cached) Qualification: {qualification}")
+        contact = pick_contact()
+        cached_turn = user_utterance == state.get("last_user_utterance")
+        # 1+2. Fused turn plan (single LLM call) unless we already have results for this utterance
+        # Overlap the Cal.com lookup with the LLM calls below
+        start_availability_prefetch(state)
+        # Planning may already be done (or under way) from a stable partial transcript
+        speculated = None
+        if cached_turn:
+            discard_speculation(state)
         else:
-            qualification = await classify_qualification(user_utterance, BUSINESS_CONTEXT, QUALIFICATION_PROFILE)
-            print(f"[agent] Qualification: {qualification}")
+            speculated = await take_speculation(state, user_utterance)
+        plan = None
+        if speculated is not None:
+            contact = speculated["contact"]
+            plan = speculated.get("plan")
+        elif TURN_PLANNER_ENABLED and not cached_turn:
+            plan = await plan_turn(user_utterance, contact)
+        if plan:
+            qualification = {"qualified": plan["qualified"], "reason": plan["reason"], "route_to": plan["route_to"]}
+            intent, slot, duration = plan["intent"], plan["datetime"], plan["duration"]
+            log.info("Turn plan: intent=%s slot=%s duration=%s qualified=%s", intent, slot, duration, qualification.get("qualified"))
             state["qualified"] = qualification
-        # 2. Intent/slot extraction (cache)
-        if user_utterance == state.get("last_user_utterance") and state.get("last_intent_result") is not None:
-            intent, slot, duration = state["last_intent_result"]
-            print(f"[agent] (cached) Gemini intent: {intent}, slot: {slot}, duration: {duration}")
-        else:
-            intent, slot, duration = await parse_intent(user_utterance)
-            print(f"[agent] Gemini intent: {intent}, slot: {slot}, duration: {duration}")
             state["last_intent_result"] = (intent, slot, duration)
-        contact = pick_contact()
+        else:
+            # 1. Qualification step (cache)
+            if state.get("qualified") is not None and cached_turn:
+                qualification = state["qualified"]
+                log.debug("(cached) Qualification: %s", qualification)
+            elif speculated and "qualification" in speculated:
+                qualification = speculated["qualification"]
+                log.info("(speculative) Qualification: %s", qualification)
+                state["qualified"] = qualification
+            else:
+                qualification = await classify_qualification(user_utterance, BUSINESS_CONTEXT, QUALIFICATION_PROFILE)
+                log.info("Qualification: %s", qualification)
+                state["qualified"] = qualification
+            # 2. Intent/slot extraction (cache)
+            if cached_turn and state.get("last_intent_result") is not None:
+                intent, slot, duration = state["last_intent_result"]
+                log.debug("(cached) Gemini intent: %s, slot: %s, duration: %s", intent, slot, duration)
+            elif speculated and "intent_result" in speculated:
+                intent, slot, duration = speculated["intent_result"]
+                log.info("(speculative) Gemini intent: %s, slot: %s, duration: %s", intent, slot, duration)
+                state["last_intent_result"] = (intent, slot, duration)
+            else:
+                intent, slot, duration = await parse_intent(user_utterance)
+                log.info("Gemini intent: %s, slot: %s, duration: %s", intent, slot, duration)
+                state["last_intent_result"] = (intent, slot, duration)
+        if intent != "book_call":
+            discard_availability_prefetch(state)
+        ANALYTICS.incr(f"intent:{intent if intent in TURN_PLAN_INTENTS else 'other'}")
         state["last_intent"] = intent
         state["last_slot"] = slot
         state["last_contact"] = contact["name"]
@@ -222,32 +645,35 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
         response_text = ""
         booking_confirmation = None
         error = None
-        now = time.time()
         # 3. Special case: gratitude/thanks utterance (handled by router now)
         # 4. Routing logic
         if qualification["qualified"]:
-            # Fail-fast: skip booking if 401 seen in last 5 min
-            if intent == "book_call" and (now - CAL_API_401_CACHE["last_401"] < 300):
-                response_text = "Sorry, our booking system is temporarily unavailable. Redirecting you to a team member."
-                state["errors"].append("Booking down: recent 401 from Cal.com API")
+            # Fail-fast: skip booking while the Cal.com breaker is open (errors, slowness or a 401)
+            if intent == "book_call" and CALCOM_BREAKER.is_open():
+                response_text = BOOKING_UNAVAILABLE_TEXT
+                state["errors"].append("Booking down: Cal.com circuit breaker open")
+                ANALYTICS.incr("booking:failure")
             elif intent == "book_call":
+                booking_detached = False
                 try:
                     # Set booking_pending before booking
                     state["booking_pending"] = True
-                    # Dynamically select event type based on duration
-                    event_type_id = int(os.getenv("CAL_EVENT_TYPE_ID"))
+                    # Dynamically select event type based on duration (in-memory index, no network)
+                    event_type_id = lookup_event_type_id(duration) if duration else None
+                    if not event_type_id:
+                        event_type_id = default_event_type_id()
                     if not event_type_id:
                         error = f"No event type found for duration: {duration}"
                         state["errors"].append(error)
                         response_text = await generate_llm_reply(intent, slot, contact, error=error)
                     else:
-                        slots_response = get_available_slots(event_type_id=event_type_id)
-                        print(f"[agent] Available slots: {slots_response}")
+                        slots_response = await get_turn_availability(state, event_type_id)
+                        log.debug("Available slots: %s", slots_response)
                         date_ranges = slots_response.get('dateRanges', [])
                         slots = split_date_ranges_to_slots(date_ranges)
                         first_slot = slots[0] if slots else None
                         if first_slot:
-                            booking_confirmation = book_slot_v2(
+                            booking_task = asyncio.ensure_future(async_book_slot_v2(
                                 start=first_slot,
                                 name=contact["name"],
                                 email="sample@example.com",
@@ -255,15 +681,21 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
                                 event_type_id=event_type_id,
                                 username=os.getenv("CAL_USERNAME"),
                                 debug=True
-                            )
-                            print(f"[agent] Booking confirmation: {booking_confirmation}")
+                            ))
+                            try:
+                                # Shielded: a barge-in cancels the turn, never a booking already sent to Cal.com
+                                with stage("calcom_booking"):
+                                    booking_confirmation = await asyncio.shield(booking_task)
+                            except asyncio.CancelledError:
+                                # booking_pending stays set until the detached booking settles
+                                booking_detached = True
+                                save_session_state(state)
+                                booking_task.add_done_callback(
+                                    lambda task: _record_detached_booking(task, session_id, first_slot, contact)
+                                )
+                                raise
                             slot = first_slot
-                            state["last_booking"] = {
-                                "confirmation": booking_confirmation,
-                                "slot": slot,
-                                "contact": contact["name"]
-                            }
-                            state["cancelled"] = False
+                            record_booking(state, session_id, booking_confirmation, slot, contact)
                             # --- Twilio SMS Notification ---
                             from_number = os.getenv("TWILIO_PHONE_NUMBER")
                             # Placeholder: set user_phone to the user's phone number after a successful call booking
@@ -272,35 +704,44 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
                                 sms_message = f"Your call with {contact['name']} is confirmed for {first_slot} ({os.getenv('TIMEZONE', 'America/New_York')}). Reply to this SMS if you need to reschedule."
                                 try:
                                     sms_sid = send_sms(user_phone, sms_message, from_number)
-                                    print(f"[agent] SMS sent to {user_phone}, SID: {sms_sid}")
+                                    log.info("SMS sent to %s, SID: %s", user_phone, sms_sid)
                                 except Exception as e:
-                                    print(f"[agent] Failed to send SMS: {e}")
-                            response_text = await generate_llm_reply(intent, slot, contact, error=error)
+                                    log.warning("Failed to send SMS: %s", e)
+                            draft = plan_reply(plan, slot) if plan and SLOT_PLACEHOLDER in plan["reply"] else None
+                            response_text = draft or await generate_llm_reply(intent, slot, contact, error=error)
                         else:
                             error = "No available slots"
                             state["errors"].append(error)
+                            ANALYTICS.incr("booking:failure")
                             response_text = await generate_llm_reply(intent, slot, contact, error=error)
+                except CircuitOpenError as e:
+                    state["errors"].append(f"Booking down: {e}")
+                    ANALYTICS.incr("booking:failure")
+                    response_text = BOOKING_UNAVAILABLE_TEXT
                 except Exception as e:
                     error = f"Booking error: {e}"
                     state["errors"].append(error)
-                    print(f"[agent] Booking error: {e}\n{traceback.format_exc()}")
-                    if "401" in str(e):
-                        CAL_API_401_CACHE["last_401"] = now
+                    ANALYTICS.incr("booking:failure")
+                    log.exception("Booking error: %s", e)
                     response_text = await generate_llm_reply(intent, slot, contact, error=error)
                 finally:
-                    state["booking_pending"] = False
+                    if not booking_detached:
+                        state["booking_pending"] = False
             elif intent == "cancel_call":
                 if state.get("last_booking") and not state.get("cancelled"):
                     state["cancelled"] = True
-                    response_text = "No worries, your call has been canceled. If you’d ever like to reconnect, just ping us — we’ll be here."
+                    response_text = CANCEL_CONFIRMED_TEXT
                 elif state.get("cancelled"):
-                    response_text = "Your call was already cancelled."
+                    response_text = ALREADY_CANCELLED_TEXT
                 else:
-                    response_text = "There is no active booking to cancel."
+                    response_text = NO_BOOKING_TO_CANCEL_TEXT
             else:
-                response_text = await generate_llm_reply(intent, slot, contact, error=error)
+                response_text = plan_reply(plan) or await generate_llm_reply(intent, slot, contact, error=error)
         else:
-            if qualification.get("route_to"):
+            draft = plan_reply(plan)
+            if draft:
+                response_text = draft
+            elif qualification.get("route_to"):
                 route_contact = next((c for c in BUSINESS_CONTEXT["contacts"] if c["name"] == qualification["route_to"]), None)
                 if route_contact:
                     response_text = await generate_llm_reply(
@@ -324,12 +765,20 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
                     error=f"User not qualified. Reason: {qualification.get('reason')}"
                 )
         # 5. Convert to TTS with unique filename (async)
-        mock_dir = ensure_mock_dir()
-        tts_filename = os.path.join(mock_dir, f"response_{session_id}_{uuid.uuid4().hex[:8]}.wav")
-        tts_path = await speak(response_text, filename=tts_filename)
-        print(f"[agent] TTS path: {tts_path}")
+        tts_path = None
+        if synthesize:
+            mock_dir = ensure_mock_dir()
+            tts_filename = os.path.join(mock_dir, f"response_{session_id}_{uuid.uuid4().hex[:8]}.wav")
+            tts_path = await speak(response_text, filename=tts_filename)
+            log.debug("TTS path: %s", tts_path)
         # Save last Gemini response for router
         state["last_gemini_response"] = response_text
+        # A lead is a call, not a turn: count it the first time the call qualifies
+        if qualification["qualified"] and not state.get("lead_counted"):
+            state["lead_counted"] = True
+            ANALYTICS.incr("qualified_leads")
+        save_session_state(state)
+        CALL_RECORDER.add_turn(session_id, user_utterance, response_text)
         # 6. Log qualified leads/bookings
         if qualification["qualified"] or (intent == "book_call" and booking_confirmation):
             log_entry = {
@@ -341,8 +790,8 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
                 "qualification": qualification,
                 "session_id": session_id
             }
-            with open("daily_log.jsonl", "a", encoding="utf-8") as f:
-                f.write(json.dumps(log_entry) + "\n")
+            await DAILY_LOG.write(log_entry)
+        ANALYTICS.observe_latency((time.monotonic() - turn_started) * 1000)
         return {
             "text": response_text,
             "tts_path": tts_path,
@@ -354,11 +803,14 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
             "session_id": session_id
         }
     except Exception as e:
-        print(f"[agent] Error: {e}\n{traceback.format_exc()}")
-        fallback_text = await generate_llm_reply("unknown", None, pick_contact(), error=str(e))
-        tts_path = await speak(fallback_text)
+        log.exception("Turn failed: %s", e)
+        fallback_text = await fallback_llm_reply(e)
+        tts_path = await speak(fallback_text) if synthesize else None
         state = get_session_state(session_id)
         state["errors"].append(str(e))
+        save_session_state(state)
+        CALL_RECORDER.add_turn(session_id, user_utterance, fallback_text)
+        ANALYTICS.observe_latency((time.monotonic() - turn_started) * 1000)
         return {
             "text": fallback_text,
             "tts_path": tts_path,
@@ -368,4 +820,7 @@ async def agent_loop(user_utterance: str, session_id: str = 'simulate_call_user_
             "errors": state["errors"],
             "qualification": {"qualified": False, "reason": str(e), "route_to": None},
             "session_id": session_id
-        } 
\ No newline at end of file
+        }
+    finally:
+        if owns_trace:
+            end_turn(trace) 
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime
+from core.logger import get_logger
+
+log = get_logger("analytics")
+
+ANALYTICS_DB = os.getenv("ANALYTICS_DB", "analytics.sqlite3")
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "10"))
+# Upper bounds (ms) of the turn latency histogram buckets; a final +Inf bucket is implied
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+def _today():
+    return datetime.utcnow().date().isoformat()
+
+
+class DailyRollups:
+    """
+    Running per-day counters updated as turns happen.
+    Increments are O(1) dict updates; deltas are flushed periodically to SQLite with
+    additive upserts, so several workers can share one table without overwriting each other.
+    Metric names are flat, e.g. "calls", "intent:book_call", "router_skip:junk_message",
+    "turn_latency_ms:le_500", "turn_latency_ms:sum".
+    """
+
+    def __init__(self, path=ANALYTICS_DB):
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending = {}  # (day, metric) -> delta not yet flushed
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rollups (day TEXT NOT NULL, metric TEXT NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (day, metric))"
+        )
+        self._db.commit()
+
+    def incr(self, metric, n=1, day=None):
+        key = (day or _today(), metric)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + n
+
+    def observe_latency(self, ms, metric="turn_latency_ms", day=None):
+        day = day or _today()
+        bucket = next((f"le_{b}" for b in LATENCY_BUCKETS_MS if ms <= b), "le_inf")
+        with self._lock:
+            for name, n in ((bucket, 1), ("count", 1), ("sum", int(ms))):
+                key = (day, f"{metric}:{name}")
+                self._pending[key] = self._pending.get(key, 0) + n
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        rows = [(day, metric, value) for (day, metric), value in pending.items()]
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT INTO rollups (day, metric, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(day, metric) DO UPDATE SET value = value + excluded.value",
+                    rows
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            # Put the deltas back so they are retried on the next flush
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+            log.warning("Flush failed: %s", e)
+            return 0
+        return len(rows)
+
+    async def run_flusher(self, interval=ANALYTICS_FLUSH_INTERVAL):
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await asyncio.to_thread(self.flush)
+        finally:
+            self.flush()
+
+    def counters(self, day=None):
+        """
+        Flat metric -> value for a day, including this worker's unflushed deltas.
+        """
+        day = day or _today()
+        with self._db_lock:
+            rows = self._db.execute("SELECT metric, value FROM rollups WHERE day = ?", (day,)).fetchall()
+        counters = dict(rows)
+        with self._lock:
+            for (pending_day, metric), value in self._pending.items():
+                if pending_day == day:
+                    counters[metric] = counters.get(metric, 0) + value
+        return counters
+
+    def snapshot(self, day=None):
+        """
+        Structured view of a day's rollups for /stats and the digest.
+        """
+        day = day or _today()
+        counters = self.counters(day)
+        grouped = {}
+        for metric, value in counters.items():
+            if ":" in metric:
+                group, name = metric.split(":", 1)
+                grouped.setdefault(group, {})[name] = value
+        latency = grouped.pop("turn_latency_ms", {})
+        count = latency.get("count", 0)
+        # Stored per bucket; reported cumulatively like Prometheus "le" buckets
+        cumulative, running = {}, 0
+        for name in [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]:
+            running += latency.get(name, 0)
+            cumulative[name] = running
+        bookings = grouped.pop("booking", {})
+        return {
+            "day": day,
+            "calls": counters.get("calls", 0),
+            "turns": counters.get("turns", 0),
+            "qualified_leads": counters.get("qualified_leads", 0),
+            "intents": grouped.pop("intent", {}),
+            "bookings": {"success": bookings.get("success", 0), "failure": bookings.get("failure", 0)},
+            "router_skips": grouped.pop("router_skip", {}),
+            "turn_latency_ms": {
+                "count": count,
+                "avg": round(latency.get("sum", 0) / count, 1) if count else None,
+                "buckets": cumulative,
+            },
+        }
+
+
+ANALYTICS = DailyRollups()
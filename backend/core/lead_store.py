@@ -0,0 +1,140 @@
+import os
+import glob
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from core.logger import get_logger
+
+log = get_logger("lead_store")
+
+LEAD_DB = os.getenv("LEAD_DB", "leads.sqlite3")
+# Pre-SQLite lead log, imported once (by one worker) into an empty table
+LEGACY_LEAD_LOG = "daily_log.jsonl"
+
+
+def _entry_ts(entry):
+    # Timestamps are naive UTC on both the write and query side, so .timestamp() is consistent
+    return datetime.fromisoformat(entry["timestamp"].replace("Z", "")).timestamp()
+
+
+class LeadStore:
+    """
+    Qualified-lead log in a SQLite table indexed by (qualified, ts), so the digest and any
+    time-range query read only the requested window no matter how much history exists.
+    Callable with a list of records, so it can be used as a BatchedLogWriter sink.
+    """
+
+    def __init__(self, path=LEAD_DB, legacy_log=LEGACY_LEAD_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leads ("
+            "id INTEGER PRIMARY KEY, ts REAL NOT NULL, session_id TEXT, qualified INTEGER NOT NULL, entry TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS leads_qualified_ts ON leads (qualified, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS leads_ts ON leads (ts)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS lead_store_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+        if legacy_log:
+            self._import_legacy(legacy_log)
+
+    def _import_legacy(self, legacy_log):
+        """
+        Every worker builds a LeadStore at startup, so the import is claimed with a marker row
+        written in the same transaction as the leads: exactly one worker imports, the rest see
+        the marker and skip.
+        """
+        if self._legacy_imported():
+            return
+        stem, ext = os.path.splitext(legacy_log)
+        paths = sorted(glob.glob(f"{glob.escape(stem)}.*{ext}")) + ([legacy_log] if os.path.exists(legacy_log) else [])
+        records = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except Exception:
+                        continue
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so the check and the import are atomic
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("SELECT 1 FROM lead_store_meta WHERE key = 'legacy_imported'").fetchone():
+                    self._db.rollback()
+                    return
+                # A table that already has rows (imported before the marker existed) is not re-imported
+                imported = 0
+                if not self._db.execute("SELECT 1 FROM leads LIMIT 1").fetchone():
+                    rows = self._rows(records)
+                    self._db.executemany("INSERT INTO leads (ts, session_id, qualified, entry) VALUES (?, ?, ?, ?)", rows)
+                    imported = len(rows)
+                self._db.execute("INSERT INTO lead_store_meta (key, value) VALUES ('legacy_imported', ?)", (str(imported),))
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        if imported:
+            log.info("Imported %d entries from %s", imported, ", ".join(paths))
+
+    def _legacy_imported(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM lead_store_meta WHERE key = 'legacy_imported'").fetchone() is not None
+
+    @staticmethod
+    def _rows(records):
+        rows = []
+        for entry in records:
+            try:
+                ts = _entry_ts(entry)
+            except Exception:
+                continue
+            qualified = bool((entry.get("qualification") or {}).get("qualified"))
+            rows.append((ts, entry.get("session_id"), int(qualified), json.dumps(entry)))
+        return rows
+
+    def __call__(self, records):
+        rows = self._rows(records)
+        with self._lock:
+            self._db.executemany("INSERT INTO leads (ts, session_id, qualified, entry) VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def query(self, start: datetime, end: datetime = None, qualified_only=False, limit=None):
+        """
+        Entries with start < timestamp <= end (UTC naive datetimes), oldest first.
+        """
+        sql = "SELECT entry FROM leads WHERE "
+        params = []
+        if qualified_only:
+            sql += "qualified = 1 AND "
+        sql += "ts > ?"
+        params.append(start.timestamp())
+        if end is not None:
+            sql += " AND ts <= ?"
+            params.append(end.timestamp())
+        sql += " ORDER BY ts"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, start: datetime, end: datetime = None, qualified_only=False):
+        sql = "SELECT COUNT(*) FROM leads WHERE " + ("qualified = 1 AND " if qualified_only else "") + "ts > ?"
+        params = [start.timestamp()]
+        if end is not None:
+            sql += " AND ts <= ?"
+            params.append(end.timestamp())
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()[0]
+
+    def delete_until(self, end: datetime):
+        with self._lock:
+            cur = self._db.execute("DELETE FROM leads WHERE ts <= ?", (end.timestamp(),))
+            self._db.commit()
+            return cur.rowcount
@@ -0,0 +1,207 @@
+import os
+import glob
+import json
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, date
+from core.logger import get_logger
+
+log = get_logger("log_writer")
+
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+LOG_MAX_QUEUE = int(os.getenv("LOG_MAX_QUEUE", "10000"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Every writer created, so the app can flush them all on shutdown
+LOG_WRITERS = []
+
+
+class JsonlFileSink:
+    """
+    Appends batches of records to a JSONL file with size- and day-based rotation.
+    Rotated files are named <stem>.<YYYY-MM-DD>.jsonl (or <stem>.<YYYY-MM-DD>.<HHMMSS>.jsonl
+    when the size limit is hit more than once a day).
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, rotate_daily=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self._day = None
+
+    def _current_day(self):
+        if self._day is None:
+            try:
+                self._day = datetime.utcfromtimestamp(os.path.getmtime(self.path)).date()
+            except OSError:
+                self._day = datetime.utcnow().date()
+        return self._day
+
+    def _rotated_name(self, day):
+        stem, ext = os.path.splitext(self.path)
+        candidate = f"{stem}.{day.isoformat()}{ext}"
+        if os.path.exists(candidate):
+            candidate = f"{stem}.{day.isoformat()}.{datetime.utcnow().strftime('%H%M%S%f')}{ext}"
+        return candidate
+
+    def _maybe_rotate(self, incoming_bytes):
+        if not os.path.exists(self.path):
+            self._day = datetime.utcnow().date()
+            return
+        today = datetime.utcnow().date()
+        day = self._current_day()
+        if self.rotate_daily and today != day:
+            os.replace(self.path, self._rotated_name(day))
+            self._day = today
+        elif os.path.getsize(self.path) + incoming_bytes > self.max_bytes:
+            os.replace(self.path, self._rotated_name(day))
+
+    def __call__(self, records):
+        data = "".join(json.dumps(r) + "\n" for r in records)
+        self._maybe_rotate(len(data))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+    def paths_since(self, since: date):
+        """
+        Current file plus rotated files from `since` onwards, oldest first.
+        """
+        stem, ext = os.path.splitext(self.path)
+        paths = []
+        for path in sorted(glob.glob(f"{glob.escape(stem)}.*{ext}")):
+            day_part = os.path.basename(path)[len(os.path.basename(stem)) + 1:].split(".", 1)[0]
+            try:
+                if date.fromisoformat(day_part) >= since:
+                    paths.append(path)
+            except ValueError:
+                continue
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return paths
+
+
+class BatchedLogWriter:
+    """
+    In-memory queue drained by a background flusher that writes in batches off the
+    event loop. The turn hot path only appends to a deque.
+    - write_nowait(): never waits; drops (and counts) the record if the queue is full
+    - write(): waits up to `timeout` for queue space, so a stalled disk slows producers
+    At most max_queue records plus one batch can be lost on a crash; on cancellation
+    (shutdown, asyncio.run ending) the remaining queue is flushed synchronously.
+    """
+
+    def __init__(self, sink, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, max_queue=LOG_MAX_QUEUE):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._pending = deque()
+        self._write_lock = threading.Lock()
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self._space = None
+        self._closing = False
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        LOG_WRITERS.append(self)
+
+    def _ensure_flusher(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._space = asyncio.Event()
+            self._closing = False
+            self._task = loop.create_task(self._run())
+        return True
+
+    def write_nowait(self, record):
+        if len(self._pending) >= self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+        self._pending.append(record)
+        if not self._ensure_flusher():
+            # No event loop (plain scripts): write through
+            self._flush_sync()
+        elif len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def write(self, record, timeout=0.5):
+        if self._ensure_flusher():
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while len(self._pending) >= self.max_queue:
+                self._space.clear()
+                self._wake.set()
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    await asyncio.wait_for(self._space.wait(), remaining)
+                except asyncio.TimeoutError:
+                    self.stats["dropped"] += 1
+                    return False
+        return self.write_nowait(record)
+
+    def _take(self):
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        return batch
+
+    def _write_batch(self, batch):
+        with self._write_lock:
+            try:
+                self.sink(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.stats["dropped"] += len(batch)
+                log.error("Failed to write %d records: %s", len(batch), e)
+
+    def _flush_sync(self):
+        while self._pending:
+            self._write_batch(self._take())
+
+    async def _run(self):
+        try:
+            # Checked as well as cancellation: wait_for can swallow a cancel that races the wake-up
+            while not self._closing:
+                if len(self._pending) < self.batch_size:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                while self._pending:
+                    await asyncio.to_thread(self._write_batch, self._take())
+                    self._space.set()
+        finally:
+            self._flush_sync()
+
+    async def flush(self):
+        while self._pending:
+            await asyncio.to_thread(self._write_batch, self._take())
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._closing = True
+            self._wake.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._flush_sync()
+
+
+async def close_log_writers():
+    for writer in LOG_WRITERS:
+        await writer.close()
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json | text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Per-frame events log the 1st and then every Nth occurrence per key
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "500"))
+# Records waiting for the writer thread; beyond this they are dropped, never blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# CallSid (or session id) of the call being handled; asyncio tasks inherit it
+CALL_SID = contextvars.ContextVar("call_sid", default=None)
+
+LOG_STATS = {"dropped": 0}
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "call_sid", "call_tag"}
+
+
+class _CallContextFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "call_sid"):
+            record.call_sid = CALL_SID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg, call_sid, any `extra` fields, exc.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.call_sid:
+            entry["call_sid"] = record.call_sid
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s]%(call_tag)s %(message)s")
+
+    def format(self, record):
+        record.call_tag = f" [{record.call_sid}]" if record.call_sid else ""
+        return super().format(record)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_STATS["dropped"] += 1
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread; only resolve the message and traceback here
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    """
+    Route the "chronos" logger tree through a bounded queue to a writer thread, so a
+    slow stdout pipe never blocks the event loop. Idempotent.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(_CallContextFilter())
+        root = logging.getLogger("chronos")
+        root.setLevel(level)
+        root.addHandler(queue_handler)
+        root.propagate = False
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"chronos.{name}")
+
+
+@contextmanager
+def call_context(call_sid):
+    """
+    with call_context(call_sid): ... — every record logged inside carries call_sid.
+    """
+    token = CALL_SID.set(call_sid)
+    try:
+        yield
+    finally:
+        CALL_SID.reset(token)
+
+
+_sample_counts = {}
+
+
+def sampled(key, every=None):
+    """
+    True for the 1st and then every Nth call with this key, for per-frame events:
+    if sampled("twilio.media"): log.debug(...)
+    """
+    count = _sample_counts.get(key, 0)
+    _sample_counts[key] = count + 1
+    return count % (every or LOG_SAMPLE_EVERY) == 0
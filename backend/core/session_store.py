@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from core.log_writer import BatchedLogWriter
+from core.logger import get_logger
+
+log = get_logger("session_store")
+
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "memory")  # memory | sqlite
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_DB = os.getenv("SESSION_DB", "sessions.sqlite3")
+# Write-behind delay for SQLite session rows; short, since the next turn may land on another worker
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.05"))
+
+
+class SessionRecord:
+    """
+    Compact per-call state. Supports the dict-style access the agent uses
+    (state.get("x"), state["x"] = y) but only for the declared fields, so a typo
+    raises KeyError instead of silently growing the record.
+    """
+
+    # Fields written to the shared store; everything else is process-local
+    PERSISTED = (
+        "last_intent", "last_slot", "last_contact", "errors", "last_booking", "cancelled",
+        "qualified", "last_user_utterance", "last_intent_result", "last_intent_time",
+        "last_gemini_response", "last_qualification", "booking_pending", "lead_counted",
+    )
+    TRANSIENT = ("availability_prefetch", "speculation")
+    __slots__ = ("session_id", "created_at", "last_seen") + PERSISTED + TRANSIENT
+
+    def __init__(self, session_id):
+        now = time.time()
+        self.session_id = session_id
+        self.created_at = now
+        self.last_seen = now
+        self.last_intent = None
+        self.last_slot = None
+        self.last_contact = None
+        self.errors = []
+        self.last_booking = None  # Track last booking per session
+        self.cancelled = False
+        self.qualified = None  # Cache qualification result
+        self.last_user_utterance = None  # Cache last user input
+        self.last_intent_result = None  # Cache last intent/slot/duration
+        self.last_intent_time = None
+        self.last_gemini_response = None
+        self.last_qualification = None
+        self.booking_pending = False
+        self.lead_counted = False  # qualified_leads is counted once per call
+        self.availability_prefetch = None  # Speculative Cal.com availability fetch
+        self.speculation = None  # Turn plan started from a stable partial transcript
+
+    def get(self, name, default=None):
+        if name not in self.__slots__:
+            return default
+        value = getattr(self, name)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in self.__slots__
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.PERSISTED}
+        data["created_at"] = self.created_at
+        return data
+
+    def update_from_dict(self, data):
+        for name in self.PERSISTED + ("created_at",):
+            if name in data:
+                setattr(self, name, data[name])
+        if isinstance(self.last_intent_result, list):
+            self.last_intent_result = tuple(self.last_intent_result)
+        return self
+
+
+class InMemorySessionStore:
+    """
+    Process-local store with idle-TTL and LRU eviction, so memory stays flat
+    no matter how many calls the process has handled.
+    """
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, max_sessions=SESSION_MAX):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._records = OrderedDict()  # session_id -> SessionRecord, least recently seen first
+        self.evictions = 0
+
+    def get(self, session_id):
+        return self._records.get(session_id)
+
+    def get_or_create(self, session_id):
+        """
+        Return (record, created). Touches the record and evicts idle ones.
+        """
+        now = time.time()
+        record = self._records.get(session_id)
+        created = record is None
+        if created:
+            record = SessionRecord(session_id)
+            self._records[session_id] = record
+        else:
+            self._records.move_to_end(session_id)
+        record.last_seen = now
+        self.evict_expired(now)
+        return record, created
+
+    async def load(self, session_id):
+        return self.get_or_create(session_id)
+
+    def save(self, record):
+        record.last_seen = time.time()
+
+    def delete(self, session_id):
+        self._records.pop(session_id, None)
+
+    def evict_expired(self, now=None):
+        now = now or time.time()
+        while self._records:
+            session_id, oldest = next(iter(self._records.items()))
+            if now - oldest.last_seen < self.idle_ttl and len(self._records) <= self.max_sessions:
+                break
+            del self._records[session_id]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._records)
+
+
+class SQLiteSessionStore:
+    """
+    Store backed by a SQLite file so several uvicorn workers can serve webhooks
+    for the same CallSid. Turns don't touch the database on the event loop:
+    - load() refreshes persisted fields from the file in a thread at the start of a turn
+    - save() queues the row for a write-behind flusher; rows are upserted newest-wins
+      (by last_seen), so the order batches land in doesn't matter
+    - get_or_create() returns the local record; only the first time this worker sees a
+      session does it read the file (synchronously), so it never saves a blank record
+      over what another worker persisted
+    Transient fields (asyncio tasks) stay in the local record.
+    """
+
+    def __init__(self, db_path=SESSION_DB, idle_ttl=SESSION_IDLE_TTL, max_sessions=SESSION_MAX,
+                 flush_interval=SESSION_FLUSH_INTERVAL):
+        self.idle_ttl = idle_ttl
+        self._local = InMemorySessionStore(idle_ttl, max_sessions)
+        self._lock = threading.Lock()
+        self._writes = 0
+        # session_id -> queued writes not yet in the file; while any are pending the local record is newest
+        self._unflushed = {}
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self._db.commit()
+        self.writer = BatchedLogWriter(self._write_rows, flush_interval=flush_interval)
+
+    @property
+    def evictions(self):
+        return self._local.evictions
+
+    def _fetch(self, session_id):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def _write_rows(self, rows):
+        """
+        Writer sink: rows are (session_id, data, last_seen), data None for a delete.
+        """
+        with self._lock:
+            try:
+                for session_id, data, last_seen in rows:
+                    if data is None:
+                        self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                    else:
+                        self._db.execute(
+                            "INSERT INTO sessions (session_id, data, last_seen) VALUES (?, ?, ?) "
+                            "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, last_seen = excluded.last_seen "
+                            "WHERE excluded.last_seen >= sessions.last_seen",
+                            (session_id, data, last_seen)
+                        )
+                    self._writes += 1
+                    if self._writes % 200 == 0:
+                        self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (time.time() - self.idle_ttl,))
+                self._db.commit()
+            finally:
+                for session_id, _, _ in rows:
+                    remaining = self._unflushed.get(session_id, 0) - 1
+                    if remaining > 0:
+                        self._unflushed[session_id] = remaining
+                    else:
+                        self._unflushed.pop(session_id, None)
+
+    def _queue(self, row):
+        with self._lock:
+            self._unflushed[row[0]] = self._unflushed.get(row[0], 0) + 1
+        if not self.writer.write_nowait(row):
+            # Queue full: session state must not be lost, so write it directly, off the loop
+            # when there is one (newest-wins upserts make the ordering safe)
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write_rows([row])
+            else:
+                loop.run_in_executor(None, self._write_rows, [row]).add_done_callback(self._log_write_failure)
+
+    @staticmethod
+    def _log_write_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.error("Session write failed: %s", future.exception())
+
+    def get(self, session_id):
+        data = self._fetch(session_id)
+        if data is None:
+            return None
+        record = self._local.get(session_id) or SessionRecord(session_id)
+        return record.update_from_dict(json.loads(data))
+
+    def get_or_create(self, session_id):
+        record, created = self._local.get_or_create(session_id)
+        if created:
+            data = self._fetch(session_id)
+            if data is not None:
+                # Another worker already has this call
+                record.update_from_dict(json.loads(data))
+                created = False
+            else:
+                self.save(record)
+        return record, created
+
+    async def load(self, session_id):
+        record, created = self._local.get_or_create(session_id)
+        if self._unflushed.get(session_id):
+            # Our own write hasn't landed yet; the file is older than the local record
+            return record, False
+        data = await asyncio.to_thread(self._fetch, session_id)
+        if data is not None and not self._unflushed.get(session_id):
+            # Another worker may have handled the previous turn
+            record.update_from_dict(json.loads(data))
+            created = False
+        elif created:
+            self.save(record)
+        return record, created
+
+    def save(self, record):
+        record.last_seen = time.time()
+        self._queue((record.session_id, json.dumps(record.to_dict(), default=str), record.last_seen))
+
+    def delete(self, session_id):
+        self._local.delete(session_id)
+        self._queue((session_id, None, time.time()))
+
+    def evict_expired(self, now=None):
+        self._local.evict_expired(now)
+
+    def __len__(self):
+        return len(self._local)
+
+
+def create_session_store(backend=SESSION_STORE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+    return InMemorySessionStore()
@@ -0,0 +1,223 @@
+import os
+import time
+import asyncio
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from core.logger import get_logger, CALL_SID
+
+log = get_logger("tracing")
+
+# Upper bounds (seconds) of the stage histograms; a final +Inf bucket is implied.
+# Dense around the 300 ms first-audio target.
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 4, 8)
+# Finished turn traces kept in memory for /traces
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "200"))
+
+# Trace of the turn the current task is working on
+_CURRENT = contextvars.ContextVar("turn_trace", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        [(upper bound, observations <= bound)], ending with ("+Inf", count).
+        """
+        running, out = 0, []
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            running += n
+            out.append((bound, running))
+        return out
+
+
+class TurnTrace:
+    """
+    Stage timings of one turn, in the order they finished. A stage can repeat
+    (e.g. two Gemini calls).
+    """
+
+    def __init__(self, call_sid, started_at=None):
+        self.call_sid = call_sid
+        self.started_at = started_at or time.monotonic()
+        self.started_wall = time.time() - (time.monotonic() - self.started_at)
+        self.stages = []
+        self.finished = False
+        self._token = None
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def to_dict(self):
+        return {
+            "call_sid": self.call_sid,
+            "started": datetime.utcfromtimestamp(self.started_wall).isoformat() + "Z",
+            "stages": [{"stage": stage, "ms": round(seconds * 1000, 1)} for stage, seconds in self.stages],
+        }
+
+
+class TurnTracer:
+    """
+    Per-process stage histograms plus the last TRACE_HISTORY turn traces.
+    Stages recorded outside a turn (speculative work, cache warmers) still count
+    towards the histograms.
+    """
+
+    def __init__(self, history=TRACE_HISTORY):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.recent = deque(maxlen=history)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def finish(self, trace):
+        entry = trace.to_dict()
+        with self._lock:
+            self.recent.append(entry)
+        log.info("Turn trace", extra={"call_sid": trace.call_sid, "stages": entry["stages"]})
+
+    def traces(self, call_sid=None):
+        with self._lock:
+            recent = list(self.recent)
+        return [t for t in recent if call_sid is None or t["call_sid"] == call_sid]
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: (h.cumulative(), h.sum, h.count) for stage, h in self.histograms.items()}
+
+
+TRACER = TurnTracer()
+
+
+def begin_turn(call_sid=None, started_at=None):
+    """
+    Start tracing a turn in the current task. started_at (monotonic) backdates the
+    start, e.g. to when the final transcript arrived.
+    """
+    trace = TurnTrace(call_sid or CALL_SID.get(), started_at)
+    trace._token = _CURRENT.set(trace)
+    return trace
+
+
+def current_trace():
+    trace = _CURRENT.get()
+    return None if trace is None or trace.finished else trace
+
+
+def end_turn(trace):
+    if trace.finished:
+        return
+    trace.finished = True
+    try:
+        _CURRENT.reset(trace._token)
+    except ValueError:
+        # Ended from another context; it is marked finished, which is enough
+        pass
+    TRACER.finish(trace)
+
+
+def record_stage(stage, seconds):
+    TRACER.observe(stage, seconds)
+    trace = current_trace()
+    if trace is not None:
+        trace.stages.append((stage, seconds))
+
+
+def mark(stage):
+    """
+    Record a stage as the time since the current turn started (e.g. first audio byte).
+    No-op outside a turn or if the stage was already marked.
+    """
+    trace = current_trace()
+    if trace is not None and all(name != stage for name, _ in trace.stages):
+        record_stage(stage, trace.elapsed())
+
+
+@contextmanager
+def stage(name):
+    """
+    with stage("calcom_booking"): ... — times the block. Cancelled blocks (barge-in)
+    are not recorded; they say nothing about upstream latency.
+    """
+    started = time.monotonic()
+    try:
+        yield
+    except asyncio.CancelledError:
+        raise
+    except BaseException:
+        record_stage(name, time.monotonic() - started)
+        raise
+    record_stage(name, time.monotonic() - started)
+
+
+def traced(name):
+    """
+    Decorator timing every call of an async function as a stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(caches=None, counters=None):
+    """
+    Stage histograms and cache counters in the Prometheus text exposition format.
+    caches: {name: (hits, misses)}.
+    counters: {metric name: (help text, value)}, rendered as plain counters.
+    """
+    lines = [
+        "# HELP chronos_stage_duration_seconds Time spent in each stage of a turn.",
+        "# TYPE chronos_stage_duration_seconds histogram",
+    ]
+    for stage_name, (buckets, total, count) in sorted(TRACER.snapshot().items()):
+        label = f'stage="{_label(stage_name)}"'
+        for bound, n in buckets:
+            lines.append(f'chronos_stage_duration_seconds_bucket{{{label},le="{bound}"}} {n}')
+        lines.append(f"chronos_stage_duration_seconds_sum{{{label}}} {total:.6f}")
+        lines.append(f"chronos_stage_duration_seconds_count{{{label}}} {count}")
+    caches = caches or {}
+    for metric, kind, help_text, index in (
+        ("chronos_cache_hits_total", "counter", "Lookups served from the cache.", 0),
+        ("chronos_cache_misses_total", "counter", "Lookups that went upstream.", 1),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, counts in sorted(caches.items()):
+            lines.append(f'{metric}{{cache="{_label(name)}"}} {counts[index]}')
+    lines.append("# HELP chronos_cache_hit_ratio Hits / (hits + misses) since the process started.")
+    lines.append("# TYPE chronos_cache_hit_ratio gauge")
+    for name, (hits, misses) in sorted(caches.items()):
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'chronos_cache_hit_ratio{{cache="{_label(name)}"}} {ratio:.4f}')
+    for metric, (help_text, value) in sorted((counters or {}).items()):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
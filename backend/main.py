@@ -1,9 +1,169 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from routes.voice import router as voice_router
+import os
+from services.caldotcom import aclose_async_client, refresh_event_type_index, refresh_available_slots, EVENT_TYPE_REFRESH_INTERVAL, CAL_AVAILABILITY_TTL
+from services import tts
+from services.twilio_media import TWILIO_TTS_FORMAT
+from services.assembly import STT_SESSIONS
+from core.agent import static_responses, default_event_type_id, cleanup_mock_wavs
+from core.log_writer import close_log_writers
+from core.analytics import ANALYTICS
+from supabase_client import CALL_RECORDER
+from scheduler import SCHEDULER, SCHEDULER_ENABLED
+from core.logger import get_logger
+from core.tracing import TRACER, render_prometheus
 
 app = FastAPI()
+log = get_logger("main")
 app.include_router(voice_router)
 
+# Long-lived background tasks started with the app
+BACKGROUND_TASKS = []
+
+# Scheduled jobs
+DIGEST_CRON = os.getenv("DIGEST_CRON", "0 22 * * *")
+DIGEST_TIMEZONE = os.getenv("DIGEST_TIMEZONE", "Asia/Kolkata")
+# Re-fetch default availability a little before the cache entry expires (0 disables).
+# Only while this worker has calls in progress; the session-start prefetch covers the first turn
+AVAILABILITY_WARM_INTERVAL = float(os.getenv("AVAILABILITY_WARM_INTERVAL", str(CAL_AVAILABILITY_TTL * 0.8)))
+MOCK_GC_INTERVAL = float(os.getenv("MOCK_GC_INTERVAL", "3600"))
+MOCK_WAV_MAX_AGE = float(os.getenv("MOCK_WAV_MAX_AGE", "86400"))
+
+async def send_daily_digest_job():
+    from routes.voice import send_daily_digest
+    # SMTP is blocking
+    await asyncio.to_thread(send_daily_digest)
+
+async def warm_availability_job():
+    # An idle worker would otherwise be Cal.com's busiest client (~3.6k requests a day)
+    if default_event_type_id() and CALL_RECORDER.in_progress():
+        await refresh_available_slots(event_type_id=default_event_type_id())
+
+async def mock_gc_job():
+    removed = await asyncio.to_thread(cleanup_mock_wavs, MOCK_WAV_MAX_AGE)
+    log.info("Removed %d old WAVs from mock/", removed)
+
+def register_jobs():
+    SCHEDULER.cron("daily_digest", DIGEST_CRON, send_daily_digest_job, tz=DIGEST_TIMEZONE)
+    # Caches are per process, so warmers run in every worker
+    SCHEDULER.every("event_type_refresh", EVENT_TYPE_REFRESH_INTERVAL, refresh_event_type_index, exclusive=False)
+    if AVAILABILITY_WARM_INTERVAL > 0:
+        SCHEDULER.every("availability_warm", AVAILABILITY_WARM_INTERVAL, warm_availability_job, exclusive=False)
+    SCHEDULER.every("mock_gc", MOCK_GC_INTERVAL, mock_gc_job)
+
+register_jobs()
+
+@app.on_event("startup")
+async def startup():
+    if SCHEDULER_ENABLED:
+        SCHEDULER.start()
+    # Built once here whether or not the scheduler runs; the scheduler only keeps it fresh
+    BACKGROUND_TASKS.append(asyncio.create_task(refresh_event_type_index()))
+    BACKGROUND_TASKS.append(asyncio.create_task(tts.prewarm_tts_cache(static_responses(), formats=[{}, TWILIO_TTS_FORMAT])))
+    BACKGROUND_TASKS.append(asyncio.create_task(ANALYTICS.run_flusher()))
+    BACKGROUND_TASKS.append(asyncio.create_task(CALL_RECORDER.run_retry_worker()))
+    BACKGROUND_TASKS.append(asyncio.create_task(STT_SESSIONS.run()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    await asyncio.gather(*BACKGROUND_TASKS, return_exceptions=True)
+    BACKGROUND_TASKS.clear()
+    await SCHEDULER.stop()
+    await aclose_async_client()
+    await tts.aclose_async_client()
+    await STT_SESSIONS.close()
+    # Calls still in progress are written before the writers are drained
+    CALL_RECORDER.finish_idle(0, status="interrupted")
+    await close_log_writers()
+
 @app.get("/")
 def home():
-    return {"status": "Chronos Backend Live"}
\ No newline at end of file
+    return {"status": "Chronos Backend Live"}
+
+@app.get("/cache_stats")
+def cache_stats():
+    from services.gpt import GEMINI_CACHE
+    from services.tts_cache import TTS_CACHE
+    from services.caldotcom import AVAILABILITY_CACHE_STATS
+    return {
+        "gemini": GEMINI_CACHE.snapshot(),
+        "tts": TTS_CACHE.snapshot() if TTS_CACHE is not None else None,
+        "availability": dict(AVAILABILITY_CACHE_STATS),
+    }
+
+@app.get("/stats")
+def stats(day: str = None):
+    """
+    Per-day rollups (UTC day, YYYY-MM-DD; defaults to today).
+    """
+    return ANALYTICS.snapshot(day)
+
+@app.get("/calls_stats")
+def calls_stats():
+    return CALL_RECORDER.snapshot()
+
+@app.get("/stt_stats")
+def stt_stats():
+    return STT_SESSIONS.snapshot()
+
+@app.get("/jobs")
+def jobs():
+    return SCHEDULER.snapshot()
+
+def cache_hit_counts():
+    """
+    (hits, misses) for every cache, for /metrics. Coalesced lookups waited on someone
+    else's upstream request, so they count as hits.
+    """
+    from services.gpt import GEMINI_CACHE
+    from services.tts_cache import TTS_CACHE
+    from services.caldotcom import AVAILABILITY_CACHE_STATS
+    gemini = GEMINI_CACHE.snapshot()
+    counts = {
+        "gemini": (gemini["hits"] + gemini["disk_hits"], gemini["misses"]),
+        "availability": (AVAILABILITY_CACHE_STATS["hits"] + AVAILABILITY_CACHE_STATS["coalesced"], AVAILABILITY_CACHE_STATS["misses"]),
+        "stt_token": (STT_SESSIONS.stats["token_hits"], STT_SESSIONS.stats["token_misses"]),
+        "stt_warm_session": (STT_SESSIONS.stats["warm_hits"], STT_SESSIONS.stats["cold_opens"]),
+    }
+    if TTS_CACHE is not None:
+        tts_stats = TTS_CACHE.snapshot()
+        counts["tts"] = (tts_stats["memory_hits"] + tts_stats["disk_hits"], tts_stats["misses"])
+    return counts
+
+def gateway_counters():
+    """
+    Gemini gateway outcomes for /metrics. Only upstream requests are timed (the "gemini"
+    stage); cache hits and calls joined to an in-flight request are counted here.
+    """
+    from services.llm_gateway import GATEWAY_STATS
+    return {
+        "chronos_gemini_requests_total": ("Gemini requests sent upstream.", GATEWAY_STATS["requests"]),
+        "chronos_gemini_cache_hits_total": ("Gemini calls answered from the prompt cache.", GATEWAY_STATS["cache_hits"]),
+        "chronos_gemini_coalesced_total": ("Gemini calls that joined an identical in-flight request.", GATEWAY_STATS["coalesced"]),
+        "chronos_gemini_timeouts_total": ("Gemini requests that hit GEMINI_TIMEOUT.", GATEWAY_STATS["timeouts"]),
+        "chronos_gemini_errors_total": ("Gemini requests that failed.", GATEWAY_STATS["errors"]),
+        "chronos_gemini_abandoned_total": ("Gemini requests cancelled because every caller went away.", GATEWAY_STATS["abandoned"]),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint: per-stage latency histograms and cache hit rates (this worker).
+    """
+    return PlainTextResponse(render_prometheus(cache_hit_counts(), gateway_counters()), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+def traces(call_sid: str = None):
+    """
+    Stage timings of the most recent turns, optionally for one CallSid.
+    """
+    return TRACER.traces(call_sid)
+
+@app.get("/breakers")
+def breakers():
+    from services.circuit_breaker import BREAKERS
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
\ No newline at end of file
@@ -0,0 +1,54 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import argparse
+import numpy as np
+from services.audio import TwilioAudioFrontend, pcm16_to_ulaw
+
+PACKET_MS = 20
+PACKET_BYTES = 160  # 20 ms of 8 kHz μ-law
+
+
+def make_call_audio(seconds):
+    """
+    Synthetic caller audio: a few tones plus noise, μ-law encoded like Twilio sends it.
+    """
+    t = np.arange(int(seconds * 8000)) / 8000
+    signal = 4000 * np.sin(2 * np.pi * 220 * t) + 2000 * np.sin(2 * np.pi * 1250 * t) + 500 * np.random.randn(len(t))
+    return pcm16_to_ulaw(np.clip(signal, -32768, 32767).astype(np.int16))
+
+
+def packets(ulaw):
+    return [ulaw[i:i + PACKET_BYTES] for i in range(0, len(ulaw), PACKET_BYTES)]
+
+
+def bench(name, process_packet, call_packets, seconds):
+    started = time.process_time()
+    for packet in call_packets:
+        process_packet(packet)
+    cpu = time.process_time() - started
+    per_call_second = cpu / seconds
+    print(f"{name:<34} {per_call_second * 1000:8.3f} ms CPU per call-second   ~{1 / per_call_second:8.0f} calls/core")
+
+
+def legacy_process(packet):
+    # What /twilio/stream used to do: μ-law read as int16 and a whole-block FFT resample per packet
+    from scipy.signal import resample
+    pcm = np.frombuffer(packet, dtype=np.int16)
+    return resample(pcm, int(len(pcm) * 16000 / 8000)).astype(np.int16).tobytes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU cost of the inbound Twilio audio path")
+    parser.add_argument("--seconds", type=float, default=60, help="call audio to process")
+    args = parser.parse_args()
+    call_packets = packets(make_call_audio(args.seconds))
+    print(f"=== {args.seconds:.0f}s of call audio, {len(call_packets)} x {PACKET_MS}ms packets ===")
+    frontend = TwilioAudioFrontend()
+    bench("μ-law LUT + polyphase 8k->16k", frontend.process, call_packets, args.seconds)
+    try:
+        import scipy  # noqa: F401
+        bench("legacy int16 + scipy resample", legacy_process, call_packets, args.seconds)
+    except ImportError:
+        print("legacy int16 + scipy resample      skipped (scipy not installed)")
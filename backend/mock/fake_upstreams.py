@@ -0,0 +1,347 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import re
+import json
+import math
+import time
+import uuid
+import wave
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated callers speak this fast; the fake STT turns speech time back into words at the same rate
+WORD_SECONDS = 0.25
+# Every simulated call runs this conversation (the fake STT transcribes its Nth utterance as line N)
+CONVERSATION = [
+    "Hi, I'm the founder of a B2B SaaS doing about 40k a month and our lead flow has stalled.",
+    "Can I book a 30 minute strategy call for Thursday afternoon?",
+    "What will we actually cover on the call?",
+    "Thanks!",
+]
+# PCM16 peak above which the fake STT counts a frame as speech
+SPEECH_LEVEL = 500
+
+DEFAULT_PROFILES = {
+    "gemini": "350,0.4,0",
+    "calcom": "250,0.5,0",
+    "deepgram": "150,0.3,0",
+    # median/sigma: end-of-turn silence before the final transcript; error rate: token requests
+    "assemblyai": "400,0.2,0",
+}
+
+
+class UpstreamProfile:
+    """
+    Latency and failure model for one fake upstream: lognormal latency with the given
+    median and sigma, and a probability of answering with an error status instead.
+    Spec strings are "median_ms[,sigma[,error_rate]]", e.g. "400,0.5,0.02".
+    """
+
+    def __init__(self, median_ms, sigma=0.4, error_rate=0.0, error_status=503):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = {"requests": 0, "errors": 0}
+
+    @classmethod
+    def parse(cls, spec):
+        parts = [float(p) for p in spec.split(",")]
+        return cls(*parts[:3])
+
+    def latency(self):
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms / 1000), self.sigma)
+
+    async def respond(self):
+        """
+        Count a request, wait out its latency and return True if it should fail.
+        """
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency())
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return True
+        return False
+
+    def __repr__(self):
+        return f"median {self.median_ms:.0f}ms sigma {self.sigma} errors {self.error_rate:.1%}"
+
+
+def parse_profiles(overrides=None):
+    specs = {**DEFAULT_PROFILES, **{k: v for k, v in (overrides or {}).items() if v}}
+    return {name: UpstreamProfile.parse(spec) for name, spec in specs.items()}
+
+
+# --- Gemini ---
+def _user_text(prompt):
+    match = re.search(r'User message: "(.*)"', prompt) or re.search(r"Here's the user input:\n(.*)\n", prompt)
+    return match.group(1) if match else ""
+
+def _intent(text):
+    lowered = text.lower()
+    if "cancel" in lowered:
+        return "cancel_call"
+    if re.search(r"\b(book|schedule|meeting|consultation)\b", lowered):
+        return "book_call"
+    if "?" in text:
+        return "ask_question"
+    return "other"
+
+def _duration(text):
+    match = re.search(r"(\d+)\s*(minutes?|mins?|m|hours?|h)\b", text.lower())
+    if not match:
+        return None
+    return f"{match.group(1)}{'h' if match.group(2).startswith('h') else 'm'}"
+
+def _qualified(text):
+    return bool(re.search(r"\b(founder|saas|agency|b2b)\b", text.lower())) or _intent(text) == "book_call"
+
+def fake_gemini_text(prompt):
+    """
+    A plausible answer to each of the agent's prompt shapes (turn plan, qualification,
+    intent, reply), derived from the caller's words with keyword rules.
+    """
+    text = _user_text(prompt)
+    intent = _intent(text)
+    qualified = _qualified(text)
+    if '"reply"' in prompt and '"intent"' in prompt:
+        reply = "You're booked for {slot}, talk soon." if intent == "book_call" else "Happy to help. What's your biggest growth bottleneck right now?"
+        return json.dumps({
+            "qualified": qualified, "reason": "keyword match", "route_to": None if qualified else "Aryan",
+            "intent": intent, "datetime": "Thursday afternoon" if intent == "book_call" else None,
+            "duration": _duration(text), "reply": reply,
+        })
+    if '"qualified"' in prompt:
+        return json.dumps({"qualified": qualified, "reason": "keyword match", "route_to": None if qualified else "Aryan"})
+    if '"intent"' in prompt:
+        return json.dumps({"intent": intent, "datetime": None, "duration": _duration(text)})
+    return "Sounds good, I'll make sure the call covers exactly that."
+
+
+# --- Cal.com ---
+def fake_date_ranges(days=7):
+    today = datetime.utcnow().date()
+    ranges = []
+    for offset in range(1, days + 1):
+        day = datetime(today.year, today.month, today.day) + timedelta(days=offset)
+        for start_hour, end_hour in ((9, 12), (14, 17)):
+            ranges.append({
+                "start": (day + timedelta(hours=start_hour)).isoformat() + "Z",
+                "end": (day + timedelta(hours=end_hour)).isoformat() + "Z",
+            })
+    return ranges
+
+FAKE_EVENT_TYPES = [
+    {"id": 1001, "length": 30, "slug": "30min", "title": "30 Min Strategy Call"},
+    {"id": 1002, "length": 15, "slug": "15min", "title": "15 Min Intro"},
+    {"id": 1003, "length": 60, "slug": "60min", "title": "1 Hour Consultation"},
+]
+
+
+# --- Deepgram ---
+def fake_tts_audio(text, encoding, sample_rate, container):
+    """
+    Silence as long as the text would take to say, in the requested format.
+    """
+    seconds = max(0.5, len(text.split()) * 0.35)
+    samples = int(seconds * sample_rate)
+    if encoding == "mulaw":
+        return b"\xff" * samples
+    pcm = b"\x00\x00" * samples
+    if container == "none":
+        return pcm
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+def create_app(profiles=None):
+    """
+    One app standing in for every upstream:
+    /gemini (generateContent REST), /cal/v1 + /cal/v2, /deepgram/v1/speak,
+    /assemblyai/v3/token and the /assemblyai/v3/ws streaming socket.
+    """
+    profiles = profiles or parse_profiles()
+    app = FastAPI()
+    app.state.profiles = profiles
+
+    def error(profile):
+        return JSONResponse({"error": "injected failure"}, status_code=profile.error_status)
+
+    @app.post("/gemini/v1beta/models/{model_call}")
+    async def gemini_generate(model_call: str, request: Request):
+        body = await request.json()
+        if await profiles["gemini"].respond():
+            return error(profiles["gemini"])
+        prompt = "".join(part.get("text", "") for part in body["contents"][0]["parts"])
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": fake_gemini_text(prompt)}]}}]}
+
+    @app.get("/cal/v1/availability")
+    async def cal_availability():
+        if await profiles["calcom"].respond():
+            return error(profiles["calcom"])
+        return {"busy": [], "dateRanges": fake_date_ranges(), "workingHours": []}
+
+    @app.get("/cal/v2/event-types")
+    async def cal_event_types():
+        if await profiles["calcom"].respond():
+            return error(profiles["calcom"])
+        return {"status": "success", "data": FAKE_EVENT_TYPES}
+
+    @app.post("/cal/v2/bookings")
+    async def cal_book(request: Request):
+        payload = await request.json()
+        if await profiles["calcom"].respond():
+            return error(profiles["calcom"])
+        return {"status": "success", "data": {
+            "id": random.randint(1, 10 ** 6), "uid": uuid.uuid4().hex, "start": payload.get("start"), "status": "accepted",
+        }}
+
+    @app.post("/deepgram/v1/speak")
+    async def deepgram_speak(request: Request):
+        body = await request.json()
+        params = request.query_params
+        # Latency is time to first byte; the rest streams faster than real time like the real API
+        if await profiles["deepgram"].respond():
+            return error(profiles["deepgram"])
+        audio = fake_tts_audio(body.get("text", ""), params.get("encoding", "linear16"),
+                               int(params.get("sample_rate", 16000)), params.get("container"))
+
+        async def chunks():
+            for i in range(0, len(audio), 4096):
+                yield audio[i:i + 4096]
+                await asyncio.sleep(0)
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    @app.get("/assemblyai/v3/token")
+    async def assemblyai_token(expires_in_seconds: int = 600):
+        profile = profiles["assemblyai"]
+        profile.stats["requests"] += 1
+        if random.random() < profile.error_rate:
+            profile.stats["errors"] += 1
+            return error(profile)
+        return {"token": uuid.uuid4().hex, "expires_in_seconds": expires_in_seconds}
+
+    @app.websocket("/assemblyai/v3/ws")
+    async def assemblyai_stream(websocket: WebSocket):
+        """
+        Universal Streaming stand-in. Frames louder than SPEECH_LEVEL are speech; the
+        Nth stretch of speech is transcribed as CONVERSATION[N], one more word per
+        WORD_SECONDS as partials, and a formatted final follows once the caller has been
+        silent for the profile's end-of-turn delay.
+        """
+        profile = profiles["assemblyai"]
+        await websocket.accept()
+        await websocket.send_json({"type": "Begin", "id": uuid.uuid4().hex, "expires_at": int(time.time()) + 3600})
+        turn, speech, silence, emitted, speaking, endpoint = 0, 0.0, 0.0, 0, False, 0.0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                if '"Terminate"' in message["text"]:
+                    await websocket.send_json({"type": "Termination"})
+                    await websocket.close()
+                    return
+                continue
+            frame = message.get("bytes") or b""
+            pcm = np.frombuffer(frame[:len(frame) // 2 * 2], dtype=np.int16)
+            seconds = len(pcm) / 16000
+            words = CONVERSATION[turn % len(CONVERSATION)].split()
+            if len(pcm) and np.abs(pcm.astype(np.int32)).max() > SPEECH_LEVEL:
+                if not speaking:
+                    speaking, speech, emitted, endpoint = True, 0.0, 0, profile.latency()
+                speech += seconds
+                silence = 0.0
+                heard = min(len(words), 1 + int(speech / WORD_SECONDS))
+                if heard > emitted:
+                    emitted = heard
+                    await websocket.send_json({"type": "Turn", "turn_order": turn, "end_of_turn": False,
+                                               "turn_is_formatted": False, "transcript": " ".join(words[:heard]).lower()})
+            elif speaking:
+                silence += seconds
+                if silence >= endpoint:
+                    await websocket.send_json({"type": "Turn", "turn_order": turn, "end_of_turn": True,
+                                               "turn_is_formatted": True, "transcript": " ".join(words)})
+                    speaking = False
+                    turn += 1
+
+    return app
+
+
+def upstream_env(base_url):
+    """
+    Environment that points the backend at fakes served from base_url (e.g. http://127.0.0.1:9100).
+    """
+    ws_base = re.sub(r"^http", "ws", base_url)
+    return {
+        "GEMINI_BASE_URL": f"{base_url}/gemini",
+        "CAL_BASE_URL": f"{base_url}/cal/v2",
+        "CAL_V1_BASE_URL": f"{base_url}/cal/v1",
+        "DEEPGRAM_SPEAK_URL": f"{base_url}/deepgram/v1/speak",
+        "ASSEMBLYAI_TOKEN_URL": f"{base_url}/assemblyai/v3/token",
+        "ASSEMBLYAI_WS_URL": f"{ws_base}/assemblyai/v3/ws",
+        "GEMINI_API_KEY": "fake",
+        "CAL_API_KEY": "fake",
+        "DEEPGRAM_API_KEY": "fake",
+        "ASSEMBLYAI_API_KEY": "fake",
+        "CAL_USERNAME": "loadtest",
+        "CAL_EVENT_TYPE_ID": str(FAKE_EVENT_TYPES[0]["id"]),
+        "CALLS_BACKEND": "sqlite",
+        "SCHEDULER_ENABLED": "0",
+    }
+
+
+def add_profile_args(parser):
+    for name, spec in DEFAULT_PROFILES.items():
+        parser.add_argument(f"--{name}", metavar="MEDIAN_MS,SIGMA,ERROR_RATE", help=f"latency/error model (default {spec})")
+
+
+def profiles_from_args(args):
+    return parse_profiles({name: getattr(args, name) for name in DEFAULT_PROFILES})
+
+
+async def serve(app, port, host="127.0.0.1"):
+    """
+    Start a uvicorn server for app on this event loop; returns (server, task).
+    """
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-ins for Gemini, Cal.com, Deepgram and AssemblyAI")
+    parser.add_argument("--port", type=int, default=9100)
+    add_profile_args(parser)
+    args = parser.parse_args()
+    profiles = profiles_from_args(args)
+    print("=== Fake upstreams ===")
+    for name, profile in profiles.items():
+        print(f"  {name:<11} {profile}")
+    print("\nStart the backend with:")
+    for key, value in upstream_env(f"http://127.0.0.1:{args.port}").items():
+        print(f"  export {key}={value}")
+
+    async def main():
+        _, task = await serve(create_app(profiles), args.port)
+        await task
+    asyncio.run(main())
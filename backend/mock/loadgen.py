@@ -0,0 +1,281 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import re
+import json
+import math
+import time
+import glob
+import base64
+import socket
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+from fake_upstreams import (
+    CONVERSATION, WORD_SECONDS, create_app, upstream_env, serve, add_profile_args, profiles_from_args,
+)
+
+MOCK_DIR = os.path.dirname(os.path.abspath(__file__))
+FRAME_SECONDS = 0.02
+SILENCE_FRAME = b"\xff" * 160
+
+
+def speech_frame():
+    """
+    20 ms of a 300 Hz tone as Twilio μ-law: loud enough for the fake STT to hear.
+    """
+    from services.audio import pcm16_to_ulaw
+    t = np.arange(160) / 8000
+    return pcm16_to_ulaw((8000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16))
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.degraded = 0
+        self.timeouts = 0
+        self.failed_calls = 0
+        self.completed_calls = 0
+
+    def turn(self, seconds, degraded=False):
+        self.latencies.append(seconds)
+        self.degraded += degraded
+
+
+# --- Drivers: one simulated call each ---
+async def agent_call(i, args, results):
+    """
+    Turns straight through agent_loop, in this process.
+    """
+    from core.agent import agent_loop
+    from supabase_client import CALL_RECORDER
+    session_id = f"load-{i}"
+    CALL_RECORDER.start_call(session_id, f"+1555{i:07d}")
+    for text in CONVERSATION:
+        started = time.monotonic()
+        result = await agent_loop(text, session_id=session_id, synthesize=args.synthesize)
+        results.turn(time.monotonic() - started, degraded=bool(result.get("errors")) or result.get("intent") == "unknown")
+        await asyncio.sleep(args.think)
+    CALL_RECORDER.finish_call(session_id)
+
+
+async def voice_call(i, args, results, client):
+    """
+    The <Gather> webhook loop: one POST /twilio/voice per utterance, timed to the TwiML response.
+    """
+    call_sid = f"CAload{i:08d}"
+    form = {"CallSid": call_sid, "From": f"+1555{i:07d}"}
+    for text in CONVERSATION:
+        started = time.monotonic()
+        response = await client.post(f"{args.target}/twilio/voice", data={**form, "SpeechResult": text})
+        results.turn(time.monotonic() - started, degraded=response.status_code != 200)
+        await asyncio.sleep(args.think)
+    await client.post(f"{args.target}/twilio/status", data={**form, "CallStatus": "completed"})
+
+
+async def stream_call(i, args, results, speech):
+    """
+    A Twilio Media Streams call: 20 ms μ-law frames in real time (speech tone while
+    talking, silence otherwise), marks echoed back as if played. A turn's latency is
+    the end of the caller's speech to the first reply frame, so it includes endpointing.
+    """
+    import websockets
+    call_sid, stream_sid = f"CAload{i:08d}", f"MZload{i:08d}"
+    ws_url = re.sub(r"^http", "ws", args.target) + "/twilio/stream"
+    async with websockets.connect(ws_url) as ws:
+        idle = asyncio.Event()  # set once everything the agent said has been "played"
+        waiting_since = None
+        chunk = 0
+
+        async def receive():
+            nonlocal waiting_since
+            async for message in ws:
+                data = json.loads(message)
+                if data.get("event") == "media" and waiting_since is not None:
+                    results.turn(time.monotonic() - waiting_since)
+                    waiting_since = None
+                elif data.get("event") == "mark":
+                    await ws.send(json.dumps({"event": "mark", "streamSid": stream_sid, "mark": data["mark"]}))
+                    idle.set()
+
+        next_frame = time.monotonic()
+
+        async def send(payload):
+            nonlocal next_frame, chunk
+            chunk += 1
+            await ws.send(json.dumps({
+                "event": "media", "streamSid": stream_sid,
+                "media": {"track": "inbound", "chunk": str(chunk), "payload": base64.b64encode(payload).decode("ascii")},
+            }))
+            next_frame += FRAME_SECONDS
+            await asyncio.sleep(max(0.0, next_frame - time.monotonic()))
+
+        async def silence_until_idle():
+            deadline = time.monotonic() + args.turn_timeout
+            while not idle.is_set():
+                if time.monotonic() > deadline:
+                    return False
+                await send(SILENCE_FRAME)
+            return True
+
+        receiver = asyncio.create_task(receive())
+        try:
+            await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            await ws.send(json.dumps({"event": "start", "streamSid": stream_sid, "start": {
+                "callSid": call_sid, "streamSid": stream_sid, "customParameters": {"from": f"+1555{i:07d}"},
+            }}))
+            # Greeting first
+            if not await silence_until_idle():
+                results.timeouts += 1
+            for text in CONVERSATION:
+                idle.clear()
+                for _ in range(int(len(text.split()) * WORD_SECONDS / FRAME_SECONDS)):
+                    await send(speech)
+                waiting_since = time.monotonic()
+                if not await silence_until_idle():
+                    results.timeouts += 1
+                    waiting_since = None
+                    break
+                await asyncio.sleep(args.think)
+            await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+        finally:
+            receiver.cancel()
+
+
+async def run_calls(args, results):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    client = None
+    speech = speech_frame() if args.mode == "stream" else None
+    if args.mode == "voice":
+        import httpx
+        client = httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.concurrency))
+
+    async def one(i):
+        async with semaphore:
+            try:
+                if args.mode == "agent":
+                    await agent_call(i, args, results)
+                elif args.mode == "voice":
+                    await voice_call(i, args, results, client)
+                else:
+                    await stream_call(i, args, results, speech)
+                results.completed_calls += 1
+            except Exception as e:
+                results.failed_calls += 1
+                print(f"[loadgen] call {i} failed: {e!r}")
+
+    try:
+        await asyncio.gather(*(one(i) for i in range(args.calls)))
+    finally:
+        if client is not None:
+            await client.aclose()
+
+
+# --- Report ---
+def stage_percentiles():
+    from core.tracing import TRACER
+    samples = {}
+    for trace in TRACER.traces():
+        for entry in trace["stages"]:
+            samples.setdefault(entry["stage"], []).append(entry["ms"])
+    return samples
+
+
+def report(args, results, wall, profiles, in_process):
+    turns = len(results.latencies)
+    ms = [s * 1000 for s in results.latencies]
+    print(f"\n=== mode={args.mode} calls={args.calls} concurrency={args.concurrency} ===")
+    print(f"Calls: {results.completed_calls} completed, {results.failed_calls} failed")
+    print(f"Turns: {turns} ({results.degraded} degraded, {results.timeouts} timed out)")
+    print(f"Wall time: {wall:.1f}s   throughput: {turns / wall:.2f} turns/s, {results.completed_calls / wall:.2f} calls/s")
+    print(f"Turn latency (ms): p50 {percentile(ms, 50):.0f}  p95 {percentile(ms, 95):.0f}  "
+          f"p99 {percentile(ms, 99):.0f}  max {max(ms, default=float('nan')):.0f}")
+    if in_process:
+        print("\nServer stages (ms)        p50      p95      p99        n")
+        for stage, values in sorted(stage_percentiles().items()):
+            print(f"  {stage:<20} {percentile(values, 50):8.1f} {percentile(values, 95):8.1f} {percentile(values, 99):8.1f} {len(values):8d}")
+        from main import cache_hit_counts
+        print("\nCache hit rates")
+        for name, (hits, misses) in sorted(cache_hit_counts().items()):
+            print(f"  {name:<20} {hits / (hits + misses) if hits + misses else 0:6.1%}  ({hits} hits, {misses} misses)")
+    if profiles:
+        print("\nFake upstreams")
+        for name, profile in profiles.items():
+            print(f"  {name:<11} {profile.stats['requests']:6d} requests  {profile.stats['errors']:5d} injected errors  ({profile})")
+
+
+async def main(args):
+    profiles = None
+    app_server = None
+    fakes = None
+    in_process = args.target is None
+    # TTS cache files and voice-mode replies land in mock/ (served by /audio); only this run's are removed
+    existing = set(glob.glob(os.path.join(MOCK_DIR, "*.wav")) + glob.glob(os.path.join(MOCK_DIR, "*.raw")))
+    if in_process:
+        # Keep this run's SQLite files, logs and lock files out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix="chronos-load-"))
+        profiles = profiles_from_args(args)
+        fake_port = free_port()
+        fakes = await serve(create_app(profiles), fake_port)
+        # Overrides any real endpoints or keys in the environment: a load test never reaches the real APIs
+        os.environ.update(upstream_env(f"http://127.0.0.1:{fake_port}"))
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("TRACE_HISTORY", "1000000")
+        if args.mode != "agent":
+            from main import app
+            port = free_port()
+            app_server = await serve(app, port)
+            args.target = f"http://127.0.0.1:{port}"
+        else:
+            from services.caldotcom import refresh_event_type_index
+            await refresh_event_type_index()
+        print(f"[loadgen] fakes on :{fake_port}" + (f", backend on {args.target}" if args.target else ""))
+    results = Results()
+    started = time.monotonic()
+    try:
+        await run_calls(args, results)
+    finally:
+        wall = time.monotonic() - started
+        for server in (app_server, fakes):
+            if server is not None:
+                server[0].should_exit = True
+                await server[1]
+        if in_process:
+            for path in set(glob.glob(os.path.join(MOCK_DIR, "*.wav")) + glob.glob(os.path.join(MOCK_DIR, "*.raw"))) - existing:
+                os.remove(path)
+    report(args, results, wall, profiles, in_process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Concurrent simulated calls against local stand-ins for every upstream",
+        epilog="With --target, start fake_upstreams.py and the backend (with the env it prints) yourself; "
+               "otherwise both run in this process, which also lets the report include server stage timings.",
+    )
+    parser.add_argument("--mode", choices=("agent", "voice", "stream"), default="agent",
+                        help="agent_loop directly, the /twilio/voice webhook loop, or /twilio/stream media streams")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10, help="calls in flight at once")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds the caller pauses between turns")
+    parser.add_argument("--turn-timeout", type=float, default=20.0, help="stream mode: give up on a reply after this long")
+    parser.add_argument("--synthesize", action="store_true", help="agent mode: also write TTS files")
+    parser.add_argument("--target", help="backend base URL (voice/stream modes), e.g. http://127.0.0.1:8000")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    if args.mode == "agent" and args.target:
+        parser.error("agent mode runs agent_loop in-process; --target needs --mode voice or stream")
+    asyncio.run(main(args))
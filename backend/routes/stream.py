@@ -2,13 +2,17 @@ from fastapi import APIRouter, WebSocket
 import asyncio
 from services.assembly import stream_transcribe
 from core.agent import agent_loop
+from services.tts import speak_stream
+from core.logger import get_logger
+
+log = get_logger("stream")
 
 router = APIRouter()
 
 @router.websocket("/stream")
 async def websocket_stream(websocket: WebSocket):
     await websocket.accept()
-    print("🟢 WebSocket client connected")
+    log.info("WebSocket client connected")
 
     async def audio_chunk_iter():
         while True:
@@ -19,18 +23,16 @@ async def websocket_stream(websocket: WebSocket):
 
     try:
         async for final_text in stream_transcribe(audio_chunk_iter()):
-            print(f"📝 Final transcript: {final_text}")
-            # Pass to agent loop for processing
-            result = await agent_loop(final_text)
-            # result: {"text": ..., "tts_path": ...}
-            # Send both text and TTS audio path (or stream audio if desired)
-            await websocket.send_json({"text": result["text"], "tts_path": result["tts_path"]})
-            # Optionally, stream the TTS audio file back as bytes
-            with open(result["tts_path"], "rb") as f:
-                audio_bytes = f.read()
-            await websocket.send_bytes(audio_bytes)
+            log.info("Final transcript: %s", final_text)
+            # Pass to agent loop for processing (audio is streamed below, not written to disk)
+            result = await agent_loop(final_text, synthesize=False)
+            await websocket.send_json({"text": result["text"], "tts_path": None, "streaming": True})
+            # Forward TTS audio chunks as soon as Deepgram produces them
+            async for audio_chunk in speak_stream(result["text"]):
+                await websocket.send_bytes(audio_chunk)
+            await websocket.send_json({"event": "audio_end"})
     except Exception as e:
-        print(f"❌ Error in stream: {e}")
+        log.exception("Error in stream: %s", e)
     finally:
         await websocket.close()
-        print("�� WebSocket closed") 
\ No newline at end of file
+        log.info("WebSocket closed")
\ No newline at end of file
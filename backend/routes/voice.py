@@ -1,157 +1,228 @@
 from fastapi import APIRouter, WebSocket, Request, Response, WebSocketDisconnect
 from fastapi.responses import PlainTextResponse, FileResponse
-from xml.etree.ElementTree import Element, tostring
+from xml.etree.ElementTree import Element, SubElement, tostring
 import asyncio
-from services.assembly import stream_transcribe
-from core.agent import agent_loop
+from services.assembly import stream_transcribe, parse_message, SpeechStartDetector, STT_SESSIONS
+from core.agent import agent_loop, load_session_state, LEAD_STORE, GREETING_TEXT, PartialSpeculator, DEFAULT_SESSION_ID
+from core.analytics import ANALYTICS
+from supabase_client import CALL_RECORDER
+from services.tts import speak_stream
+from services.audio import TwilioAudioFrontend, FrameRingBuffer, frame_bytes
+from core.logger import get_logger, sampled, CALL_SID
+from services.twilio_media import TwilioMediaPlayer, TWILIO_TTS_FORMAT
+from core.tracing import begin_turn, end_turn, mark, record_stage
 import os
+import re
 import json
+import time
 from datetime import datetime, timedelta
 from services.gmail import send_email
+from services.twilio_sms import hangup_call
 from dotenv import load_dotenv
 load_dotenv()
 import base64
-import httpx
-import websockets
-import numpy as np
-from scipy.signal import resample
 from fastapi import Form
 
 router = APIRouter()
+log = get_logger("voice")
+
+# Real-time media stream is the production path; TWILIO_MEDIA_STREAMS=0 falls back to the <Gather>/<Play> loop
+TWILIO_MEDIA_STREAMS = os.getenv("TWILIO_MEDIA_STREAMS", "1") != "0"
+# Longest wait for the caller to hear a goodbye before the media stream hangs up
+TWILIO_HANGUP_GRACE = float(os.getenv("TWILIO_HANGUP_GRACE", "10"))
+
+
+def ends_call(result):
+    """
+    True when a turn's reply is the last one: the caller cancelled or isn't qualified.
+    """
+    return result.get("intent") == "cancel_call" or bool(result.get("qualification") and not result["qualification"].get("qualified"))
 
 @router.websocket("/stream")
 async def handle_stream(websocket: WebSocket):
     await websocket.accept()
-    print("🟢 WebSocket connected")
+    log.info("WebSocket connected")
     async def audio_chunk_iter():
         while True:
             chunk = await websocket.receive_bytes()
             if not chunk:
                 break
             yield chunk
+    # Start planning on stable partials so the final transcript finds the turn half done
+    speculator = PartialSpeculator(DEFAULT_SESSION_ID)
     try:
-        async for final_text in stream_transcribe(audio_chunk_iter()):
-            print(f"📝 Final transcript: {final_text}")
-            result = await agent_loop(final_text)
-            await websocket.send_json({"text": result["text"], "tts_path": result["tts_path"]})
-            with open(result["tts_path"], "rb") as f:
-                audio_bytes = f.read()
-            await websocket.send_bytes(audio_bytes)
+        async for final_text in stream_transcribe(audio_chunk_iter(), on_transcript=speculator.update):
+            log.info("Final transcript: %s", final_text)
+            trace = begin_turn(DEFAULT_SESSION_ID)
+            try:
+                result = await agent_loop(final_text, session_id=DEFAULT_SESSION_ID, synthesize=False)
+                await websocket.send_json({"text": result["text"], "tts_path": None, "streaming": True})
+                async for audio_chunk in speak_stream(result["text"]):
+                    await websocket.send_bytes(audio_chunk)
+                    mark("first_audio_byte")
+                await websocket.send_json({"event": "audio_end"})
+            finally:
+                end_turn(trace)
     except Exception as e:
-        print(f"❌ Error in stream: {e}")
+        log.exception("Error in stream: %s", e)
     finally:
+        speculator.cancel()
         await websocket.close()
-        print("🔴 WebSocket closed")
+        log.info("WebSocket closed")
 
 @router.websocket("/twilio/stream")
 async def twilio_stream(websocket: WebSocket):
+    """
+    Full-duplex call over Twilio Media Streams: caller audio goes to AssemblyAI,
+    each final transcript runs a turn, and the reply is streamed back as μ-law media.
+    """
     await websocket.accept()
-    print("[twilio] WebSocket connection accepted")
+    log.info("Twilio WebSocket connection accepted")
+    call_sid = None
+    tasks = []
     try:
-        # 1. Get AssemblyAI temporary token
-        token_resp = httpx.post(
-            "https://streaming.assemblyai.com/v3/token?expires_in_seconds=600",
-            headers={"authorization": os.getenv("ASSEMBLYAI_API_KEY")}
-        )
-        print("[assemblyai] Token response:", token_resp.status_code, token_resp.text)
-        token_json = token_resp.json()
-        token = token_json.get("token")
-        if not token:
-            raise Exception(f"Failed to get AssemblyAI token: {token_json}")
-        print(f"[assemblyai] Got streaming token: {token}")
-        # 2. Connect to AssemblyAI streaming API
-        aai_ws_url = f"wss://streaming.assemblyai.com/v3/ws?sample_rate=16000&formatted_finals=true&token={token}"
-        async with websockets.connect(aai_ws_url) as aai_ws:
-            print("[assemblyai] Connected to streaming API")
-            try:
-                async def recv_aai():
-                    from services.gpt import parse_intent, generate_llm_reply
-                    from services.tts import speak
-                    business_context = {
-                        "offer": "30-minute growth strategy call",
-                        "offer_value": "Diagnose your bottlenecks + outline 3 ways to grow revenue",
-                        "seller": "Obelisk Acquisitions",
-                        "contacts": [
-                            {"name": "Vaishakh", "role": "Closer / Strategy Head"},
-                            {"name": "Aryan", "role": "Fulfillment / Onboarding"}
-                        ]
-                    }
-                    contact = business_context["contacts"][0]
-                    async for msg in aai_ws:
-                        data = json.loads(msg)
-                        if data.get("message_type") == "FinalTranscript" and data.get("text"):
-                            transcript = data["text"]
-                            print(f"[assemblyai] Final transcript: {transcript}")
-                            # Pass transcript to Gemini for intent/slot extraction
-                            intent, slot, duration = await parse_intent(transcript)
-                            print(f"[gemini] Parsed intent: {intent}, slot: {slot}, duration: {duration}")
-                            # Generate reply using Gemini
-                            reply = await generate_llm_reply(
-                                intent=intent,
-                                slot=slot,
-                                contact=contact,
-                                business_context=business_context,
-                                error=None
-                            )
-                            print(f"[gemini] Reply: {reply}")
-                            # Synthesize reply with Deepgram TTS
-                            tts_path = await speak(reply)
-                            print(f"[tts] Deepgram TTS file: {tts_path}")
-                recv_task = asyncio.create_task(recv_aai())
-                audio_buffer = b""
-                MIN_CHUNK_SIZE = 1600  # 50ms at 16kHz, 16-bit mono
-                while True:
-                    msg = await websocket.receive_text()
-                    print("[twilio] Received message:", msg)  # Log every incoming message
-                    data = json.loads(msg)
-                    if data.get("event") == "media":
-                        # Twilio sends base64-encoded mulaw or PCM audio
-                        audio_b64 = data["media"]["payload"]
-                        audio_bytes = base64.b64decode(audio_b64)
-                        # --- BEGIN RESAMPLING LOGIC ---
-                        input_sample_rate = 8000  # <-- set this to actual rate if different
-                        if input_sample_rate != 16000:
-                            import numpy as np
-                            from scipy.signal import resample
-                            input_pcm = np.frombuffer(audio_bytes, dtype=np.int16)
-                            output_pcm = resample(input_pcm, int(len(input_pcm) * 16000 / input_sample_rate)).astype(np.int16)
-                            audio_bytes_16k = output_pcm.tobytes()
-                        else:
-                            audio_bytes_16k = audio_bytes
-                        # --- END RESAMPLING LOGIC ---
-                        # Buffer and send only >=50ms chunks
-                        audio_buffer += audio_bytes_16k
-                        while len(audio_buffer) >= MIN_CHUNK_SIZE:
-                            chunk = audio_buffer[:MIN_CHUNK_SIZE]
-                            await aai_ws.send(chunk)
-                            audio_buffer = audio_buffer[MIN_CHUNK_SIZE:]
-                    elif data.get("event") == "stop":
-                        print("[twilio] Stream stopped by Twilio")
-                        # Send any remaining audio in the buffer
-                        if audio_buffer:
-                            await aai_ws.send(audio_buffer)
-                            audio_buffer = b""
-                        break
-            except WebSocketDisconnect:
-                print("[twilio] WebSocket disconnected")
-            except Exception as e:
-                print("[twilio/stream] Exception:", e)
-                import traceback; traceback.print_exc()
-            finally:
+        # Pre-opened AssemblyAI session (or a fresh one from a cached token)
+        async with STT_SESSIONS.session() as aai_ws:
+            log.info("Connected to AssemblyAI streaming API")
+            transcripts = asyncio.Queue()
+            player = None
+            current_turn = None
+            speech = SpeechStartDetector()
+            speculator = None
+            # Set by a turn whose reply ends the call; run_turns hangs up once it has been played
+            call_ending = False
+
+            def turn_active():
+                return (current_turn is not None and not current_turn.done()) or player.is_playing
+
+            async def barge_in():
+                # The caller talked over us: stop thinking and speaking, keep listening
+                if current_turn is not None and not current_turn.done():
+                    current_turn.cancel()
+                await player.clear()
+                ANALYTICS.incr("barge_ins")
+
+            async def recv_aai():
+                last_partial_at = None
+                async for msg in aai_ws:
+                    kind, text = parse_message(json.loads(msg))
+                    if speech.update(kind, text) and turn_active():
+                        log.info("Barge-in: %s", text)
+                        await barge_in()
+                    speculator.update(kind, text)
+                    if kind == "partial":
+                        last_partial_at = time.monotonic()
+                    elif kind == "final" and text:
+                        log.info("Final transcript: %s", text)
+                        final_at = time.monotonic()
+                        # Endpointing delay: caller's last words to the final transcript
+                        stt_seconds = final_at - last_partial_at if last_partial_at is not None else None
+                        last_partial_at = None
+                        transcripts.put_nowait((text, final_at, stt_seconds))
+
+            async def respond(text, final_at, stt_seconds):
+                nonlocal call_ending
+                # The turn's clock starts when the final transcript arrived
+                trace = begin_turn(call_sid, started_at=final_at)
+                try:
+                    if stt_seconds is not None:
+                        record_stage("stt_final", stt_seconds)
+                    result = await agent_loop(text, session_id=call_sid, synthesize=False)
+                    if ends_call(result):
+                        call_ending = True
+                    await player.play(speak_stream(result["text"], **TWILIO_TTS_FORMAT))
+                finally:
+                    end_turn(trace)
+
+            async def hang_up():
+                # Same as the <Gather> path's <Hangup>: let the goodbye finish, end the call, close the stream
+                try:
+                    await asyncio.wait_for(player.wait_idle(), TWILIO_HANGUP_GRACE)
+                except asyncio.TimeoutError:
+                    pass
+                log.info("Hanging up")
+                try:
+                    await asyncio.to_thread(hangup_call, call_sid)
+                except Exception as e:
+                    log.warning("Hangup via Twilio REST failed: %s", e)
                 await websocket.close()
-                if 'recv_task' in locals():
-                    recv_task.cancel()
-                    try:
-                        await recv_task
-                    except Exception:
-                        pass
-                print("[twilio/stream] WebSocket closed")
-        print("[twilio] WebSocket closed")
+
+            async def run_turns():
+                # One turn at a time; a barge-in cancels the running one and the worker moves on
+                nonlocal current_turn
+                current_turn = asyncio.create_task(player.play(speak_stream(GREETING_TEXT, **TWILIO_TTS_FORMAT), name="greeting"))
+                try:
+                    while True:
+                        await asyncio.wait({current_turn})
+                        if not current_turn.cancelled() and current_turn.exception() is not None:
+                            log.error("Turn failed: %s", current_turn.exception())
+                        if call_ending:
+                            await hang_up()
+                            return
+                        text, final_at, stt_seconds = await transcripts.get()
+                        # Anything else the caller said meanwhile is answered as one utterance
+                        while not transcripts.empty():
+                            more, final_at, stt_seconds = transcripts.get_nowait()
+                            text = f"{text} {more}"
+                        current_turn = asyncio.create_task(respond(text, final_at, stt_seconds))
+                finally:
+                    current_turn.cancel()
+
+            # μ-law 8 kHz -> PCM16 16 kHz, resampler state carried across packets
+            frontend = TwilioAudioFrontend()
+            # Fixed 50 ms frames (1600 bytes at 16 kHz PCM16) without re-slicing a bytes buffer
+            ring = FrameRingBuffer(frame_bytes(50))
+            while True:
+                msg = await websocket.receive_text()
+                data = json.loads(msg)
+                event = data.get("event")
+                if event != "media":
+                    log.info("Twilio %s event", event)
+                elif sampled("twilio.media"):
+                    # ~50 media frames per second per call; log a sample only
+                    log.debug("Twilio media frame", extra={"chunk": data["media"].get("chunk")})
+                if event == "start":
+                    start = data["start"]
+                    call_sid = start.get("callSid")
+                    # Set before the tasks are created so they inherit it
+                    CALL_SID.set(call_sid)
+                    # Creating the session starts the speculative availability prefetch
+                    await load_session_state(call_sid)
+                    CALL_RECORDER.start_call(call_sid, (start.get("customParameters") or {}).get("from"))
+                    player = TwilioMediaPlayer(websocket, data.get("streamSid") or start.get("streamSid"))
+                    speculator = PartialSpeculator(call_sid)
+                    tasks = [asyncio.create_task(recv_aai()), asyncio.create_task(run_turns())]
+                elif event == "media":
+                    # Twilio sends base64-encoded 8 kHz μ-law
+                    ring.write(frontend.process(base64.b64decode(data["media"]["payload"])))
+                    for frame in ring.frames():
+                        await aai_ws.send(frame)
+                elif event == "mark" and player is not None:
+                    player.on_mark(data["mark"]["name"])
+                elif event == "stop":
+                    log.info("Stream stopped by Twilio")
+                    if speculator is not None:
+                        speculator.cancel()
+                    # Send any remaining audio in the buffer
+                    tail = ring.drain()
+                    if tail:
+                        await aai_ws.send(tail)
+                    break
+    except WebSocketDisconnect:
+        log.info("Twilio WebSocket disconnected")
     except Exception as e:
-        print("[twilio/stream] Outer exception:", e)
-        import traceback; traceback.print_exc()
-        await websocket.close()
-        print("[twilio/stream] WebSocket closed (outer)")
+        log.exception("twilio/stream exception: %s", e)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if call_sid:
+            CALL_RECORDER.finish_call(call_sid)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+        log.info("twilio/stream WebSocket closed")
 
 # Serve TTS audio files from the mock/ directory
 @router.get("/audio/{filename}")
@@ -172,8 +243,19 @@ async def twilio_voice(request: Request):
     response = Element("Response")
     mock_dir = os.path.join(os.path.dirname(__file__), "..", "mock")
 
+    if not user_speech and TWILIO_MEDIA_STREAMS:
+        # Hand the call to the real-time media stream for the rest of the conversation
+        await load_session_state(call_sid)
+        CALL_RECORDER.start_call(call_sid, form.get("From"))
+        ws_base = re.sub(r"^http", "ws", os.getenv("SERVER_URL", "https://your-ngrok-or-server-url"))
+        connect = SubElement(response, "Connect")
+        stream = SubElement(connect, "Stream", {"url": f"{ws_base}/twilio/stream"})
+        SubElement(stream, "Parameter", {"name": "from", "value": form.get("From") or ""})
     # If this is the first turn, play the latest TTS or a welcome message
-    if not user_speech:
+    elif not user_speech:
+        # Creating the session starts the speculative availability prefetch
+        await load_session_state(call_sid)
+        CALL_RECORDER.start_call(call_sid, form.get("From"))
         tts_files = sorted(glob(os.path.join(mock_dir, "response_*.wav")), key=os.path.getmtime, reverse=True)
         if tts_files:
             latest_tts = os.path.basename(tts_files[0])
@@ -201,10 +283,8 @@ async def twilio_voice(request: Request):
         from core.agent import agent_loop
         result = await agent_loop(user_speech, session_id=call_sid)
         tts_path = result.get("tts_path")
-        should_hangup = False
         # If the agent determines the conversation is over or user is disqualified, hang up
-        if result.get("intent") == "cancel_call" or (result.get("qualification") and not result["qualification"].get("qualified")):
-            should_hangup = True
+        should_hangup = ends_call(result)
         if tts_path:
             play = Element("Play")
             base_url = os.getenv("SERVER_URL", "https://your-ngrok-or-server-url")
@@ -233,45 +313,53 @@ async def twilio_voice(request: Request):
             gather.append(gather_say)
             response.append(gather)
 
-    print("=== /twilio/voice endpoint hit ===")
     xml_str = tostring(response, encoding="unicode")
-    print("[twilio] TwiML response:\n", xml_str)
+    log.debug("TwiML response: %s", xml_str, extra={"call_sid": call_sid})
     return PlainTextResponse(xml_str, media_type="application/xml")
 
+# Twilio call status callback: write the call's row once it has ended
+TERMINAL_CALL_STATUSES = {"completed", "busy", "failed", "no-answer", "canceled"}
+
+@router.post("/twilio/status")
+async def twilio_status(request: Request):
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    call_status = form.get("CallStatus")
+    if call_sid and call_status in TERMINAL_CALL_STATUSES:
+        # A call the media stream already finished is not written again; one that never
+        # reached the webhook (busy, no-answer, ...) still gets its row
+        CALL_RECORDER.finish_call(call_sid, status=call_status, phone_number=form.get("From"), create=call_status != "completed")
+        log.info("Call ended (%s)", call_status, extra={"call_sid": call_sid})
+    return PlainTextResponse("", status_code=204)
+
 @router.post("/twilio/voice/recording", name="twilio_voice_recording")
 async def twilio_voice_recording(request: Request):
     form = await request.form()
     recording_url = form.get("RecordingUrl")
     caller = form.get("From")
     # TODO: Send recording_url to AssemblyAI for transcription
-    print(f"[twilio] Received recording from {caller}: {recording_url}")
+    log.info("Received recording from %s: %s", caller, recording_url)
     return PlainTextResponse("<Response><Say>Thank you. Your message has been received.</Say></Response>", media_type="application/xml")
 
 @router.post("/send_daily_digest")
 def send_daily_digest(clear_log: bool = False):
-    log_path = "daily_log.jsonl"
-    if not os.path.exists(log_path):
-        return {"status": "no log file"}
     now = datetime.utcnow()
     yesterday = now - timedelta(days=1)
-    entries = []
-    with open(log_path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                entry = json.loads(line)
-                ts = datetime.fromisoformat(entry["timestamp"].replace("Z", ""))
-                if ts > yesterday:
-                    entries.append(entry)
-            except Exception:
-                continue
-    qualified = [e for e in entries if e["qualification"].get("qualified")]
+    # Index range scan over the last 24h only; cost doesn't grow with history
+    qualified = LEAD_STORE.query(yesterday, now, qualified_only=True)
     if not qualified:
-        print("[digest] No qualified leads for the day. No email sent.")
+        log.info("No qualified leads for the day. No email sent.")
         return {"status": "no qualified leads"}
     # Format digest
     date_str = now.strftime("%B %d")
     subject = f"[DAILY DIGEST] {len(qualified)} Qualified Conversations - {date_str}"
-    body = f"[DAILY DIGEST] {len(qualified)} Qualified Conversations - {date_str}\n\n"
+    body = f"[DAILY DIGEST] {len(qualified)} Qualified Conversations - {date_str}\n"
+    # Rollups are per UTC day, so this line covers today since 00:00 UTC, not the 24h of leads below
+    rollup = ANALYTICS.snapshot()
+    body += (
+        f"Today so far ({rollup['day']} UTC) - Calls: {rollup['calls']} | Turns: {rollup['turns']} | Qualified: {rollup['qualified_leads']} | "
+        f"Bookings: {rollup['bookings']['success']} booked, {rollup['bookings']['failure']} failed\n\n"
+    )
     for i, e in enumerate(qualified, 1):
         body += f"{i}. User: \"{e['user_utterance']}\"\n"
         body += f"   → Qualified: {'✅' if e['qualification']['qualified'] else '❌'}\n"
@@ -280,11 +368,11 @@ def send_daily_digest(clear_log: bool = False):
         body += f"   → Routed to: {e['contact']}\n\n"
     to_email = os.getenv("DAILY_DIGEST_EMAIL")
     if not to_email:
-        print("[digest] DAILY_DIGEST_EMAIL not set in .env")
+        log.warning("DAILY_DIGEST_EMAIL not set in .env")
         return {"status": "no email configured"}
     send_email(subject, body, to_email)
-    print(f"[digest] Sent daily digest to {to_email}")
+    log.info("Sent daily digest to %s", to_email)
     if clear_log:
-        open(log_path, "w").close()
-        print("[digest] Cleared daily_log.jsonl after sending.")
+        removed = LEAD_STORE.delete_until(now)
+        log.info("Cleared %d lead log entries after sending.", removed)
     return {"status": "sent", "to": to_email, "count": len(qualified)}
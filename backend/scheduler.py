@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from core.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker locking, every worker runs exclusive jobs
+    fcntl = None
+
+# Lock files that make exclusive jobs run once per fire time across workers
+SCHEDULER_LOCK_DIR = os.getenv("SCHEDULER_LOCK_DIR", "scheduler_locks")
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+
+log = get_logger("scheduler")
+
+
+def _parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field {field!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class IntervalTrigger:
+    """
+    Fires every `seconds`. Fire times are aligned to the epoch, so every worker
+    computes the same slots and the lock file can tell them apart.
+    """
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+
+    def next_fire(self, now):
+        return (int(now // self.seconds) + 1) * self.seconds
+
+    def __repr__(self):
+        return f"every {self.seconds}s"
+
+
+class CronTrigger:
+    """
+    Five-field crontab expression ("minute hour day-of-month month day-of-week",
+    Sunday = 0) evaluated in the given timezone, e.g. CronTrigger("0 22 * * *", "Asia/Kolkata").
+    """
+
+    def __init__(self, expression, tz="UTC"):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {expression!r}")
+        self.expression = expression
+        self.tz = ZoneInfo(tz)
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = set(_parse_cron_field(fields[2], 1, 31))
+        self.months = set(_parse_cron_field(fields[3], 1, 12))
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both are restricted, either one matching is enough
+        if not self._any_day and not self._any_weekday:
+            return dom or dow
+        return dom and dow
+
+    def next_fire(self, now):
+        start = datetime.fromtimestamp(now, self.tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz)
+                        if candidate >= start:
+                            return candidate.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
+
+    def __repr__(self):
+        return f"cron {self.expression!r} {self.tz.key}"
+
+
+class Job:
+    def __init__(self, name, func, trigger, *, exclusive=True, run_at_start=False):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.exclusive = exclusive
+        self.run_at_start = run_at_start
+        self.stats = {
+            "runs": 0, "failures": 0, "skipped": 0,
+            "last_run": None, "last_duration_ms": None, "max_duration_ms": 0, "last_error": None, "next_run": None,
+        }
+
+
+class Scheduler:
+    """
+    Runs async jobs on cron or interval triggers inside the app's event loop.
+    - exclusive jobs (digests, file GC) run once per fire time across all workers on
+      the host: a worker takes a non-blocking flock on the job's lock file and records
+      the fire time in it; workers that lose the lock or see the time already taken skip
+    - non-exclusive jobs (per-process cache warmers) run in every worker
+    Each run's duration and outcome is kept in job.stats.
+    """
+
+    def __init__(self, lock_dir=SCHEDULER_LOCK_DIR):
+        self.lock_dir = lock_dir
+        self.jobs = {}
+        self._tasks = []
+
+    def add_job(self, name, func, trigger, *, exclusive=True, run_at_start=False):
+        if name in self.jobs:
+            raise ValueError(f"Job {name!r} already registered")
+        self.jobs[name] = Job(name, func, trigger, exclusive=exclusive, run_at_start=run_at_start)
+        return self.jobs[name]
+
+    def cron(self, name, expression, func, tz="UTC", **kwargs):
+        return self.add_job(name, func, CronTrigger(expression, tz), **kwargs)
+
+    def every(self, name, seconds, func, **kwargs):
+        return self.add_job(name, func, IntervalTrigger(seconds), **kwargs)
+
+    def _claim(self, job, fire_time):
+        """
+        Returns an open lock file if this worker should run the job for fire_time, else None.
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        f = open(os.path.join(self.lock_dir, f"{job.name}.lock"), "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        f.seek(0)
+        try:
+            last = float(f.read().strip() or 0)
+        except ValueError:
+            last = 0.0
+        if last >= fire_time:
+            f.close()
+            return None
+        f.seek(0)
+        f.truncate()
+        f.write(str(fire_time))
+        f.flush()
+        return f
+
+    async def run_job(self, job, fire_time=None):
+        lock = None
+        if job.exclusive and fcntl is not None and fire_time is not None:
+            lock = self._claim(job, fire_time)
+            if lock is None:
+                job.stats["skipped"] += 1
+                return False
+        started = time.monotonic()
+        job.stats["last_run"] = datetime.utcnow().isoformat() + "Z"
+        try:
+            await job.func()
+            job.stats["last_error"] = None
+        except Exception as e:
+            job.stats["failures"] += 1
+            job.stats["last_error"] = str(e)
+            log.exception("Job %s failed: %s", job.name, e)
+        finally:
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+            job.stats["runs"] += 1
+            job.stats["last_duration_ms"] = duration_ms
+            job.stats["max_duration_ms"] = max(job.stats["max_duration_ms"], duration_ms)
+            if lock is not None:
+                lock.close()
+        log.info("Job %s finished in %sms", job.name, duration_ms, extra={"job": job.name, "duration_ms": duration_ms})
+        return True
+
+    async def _loop(self, job):
+        if job.run_at_start:
+            await self.run_job(job)
+        while True:
+            fire_time = job.trigger.next_fire(time.time())
+            job.stats["next_run"] = datetime.utcfromtimestamp(fire_time).isoformat() + "Z"
+            await asyncio.sleep(max(0.0, fire_time - time.time()))
+            await self.run_job(job, fire_time)
+
+    def start(self):
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+            log.info("Scheduled %s (%s)", job.name, job.trigger)
+        return list(self._tasks)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def snapshot(self):
+        return {name: {**job.stats, "trigger": repr(job.trigger), "exclusive": job.exclusive} for name, job in self.jobs.items()}
+
+
+SCHEDULER = Scheduler()
@@ -1,44 +1,327 @@
 import os
+import time
 import asyncio
 import websockets
 import json
+import httpx
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
 from dotenv import load_dotenv
+from services.audio import FrameRingBuffer, frame_bytes, STT_SAMPLE_RATE
+from core.logger import get_logger
+from core.tracing import record_stage
 load_dotenv()
 
+log = get_logger("assembly")
+
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
-ASSEMBLYAI_URL = "wss://api.assemblyai.com/v2/realtime/ws?sample_rate=16000"
+# Universal Streaming (v3); overridable to point at a local stand-in
+ASSEMBLYAI_TOKEN_URL = os.getenv("ASSEMBLYAI_TOKEN_URL", "https://streaming.assemblyai.com/v3/token")
+ASSEMBLYAI_WS_URL = os.getenv("ASSEMBLYAI_WS_URL", "wss://streaming.assemblyai.com/v3/ws")
+# Temporary token lifetime (AssemblyAI allows up to 600s); tokens are dropped this many seconds early
+ASSEMBLYAI_TOKEN_TTL = int(os.getenv("ASSEMBLYAI_TOKEN_TTL", "600"))
+ASSEMBLYAI_TOKEN_MARGIN = float(os.getenv("ASSEMBLYAI_TOKEN_MARGIN", "30"))
+# Pre-opened sessions waiting for the next call; opt-in. AssemblyAI bills an open session
+# by the second whether or not audio flows, so each pooled session costs up to one
+# session-hour per hour. It is only kept while this worker took a session in the last
+# STT_WARM_IDLE_TIMEOUT seconds, so an idle worker holds none (and its next call opens cold).
+STT_WARM_POOL_SIZE = int(os.getenv("STT_WARM_POOL_SIZE", "0"))
+STT_WARM_MAX_AGE = float(os.getenv("STT_WARM_MAX_AGE", "60"))
+STT_WARM_IDLE_TIMEOUT = float(os.getenv("STT_WARM_IDLE_TIMEOUT", "300"))
+STT_POOL_CHECK_INTERVAL = float(os.getenv("STT_POOL_CHECK_INTERVAL", "5"))
+
+# Partial transcripts with fewer words than this don't count as the caller starting to speak
+BARGE_IN_MIN_WORDS = int(os.getenv("BARGE_IN_MIN_WORDS", "1"))
+
+def parse_message(data):
+    """
+    Normalise an AssemblyAI realtime message (v2 `message_type` or v3 `type`) to
+    (kind, text) with kind one of "partial", "final", "end" or None for anything else.
+    With formatted_finals, a v3 turn is final only once its formatted version arrives.
+    """
+    message_type = data.get("message_type")
+    if message_type == "PartialTranscript":
+        return "partial", data.get("text") or ""
+    if message_type == "FinalTranscript":
+        return "final", data.get("text") or ""
+    if message_type == "SessionTerminated":
+        return "end", ""
+    kind = data.get("type")
+    if kind == "Turn":
+        if data.get("end_of_turn") and data.get("turn_is_formatted"):
+            return "final", data.get("transcript") or ""
+        return "partial", data.get("transcript") or ""
+    if kind == "Termination":
+        return "end", ""
+    return None, ""
+
+class SpeechStartDetector:
+    """
+    Turns the transcript stream into one speech-start signal per caller utterance:
+    the first partial with at least BARGE_IN_MIN_WORDS words after a final (or the start).
+    """
+
+    def __init__(self, min_words=BARGE_IN_MIN_WORDS):
+        self.min_words = min_words
+        self._speaking = False
+
+    def update(self, kind, text):
+        if kind == "final":
+            self._speaking = False
+            return False
+        if kind == "partial" and not self._speaking and len(text.split()) >= self.min_words:
+            self._speaking = True
+            return True
+        return False
 
-async def stream_transcribe(audio_chunk_iter):
+class STTSessionManager:
+    """
+    Opens AssemblyAI v3 streaming sessions off the call path.
+    - Temporary tokens are fetched with an async client and kept until shortly before
+      they expire. A token starts one session only, so the cache holds spares fetched
+      ahead of time rather than a single shared token.
+    - Up to pool_size sessions are pre-opened, so a new call attaches to a connected
+      websocket instead of waiting for a token round trip and a TLS + websocket handshake.
+      Sessions older than max_age (or closed by the server) are replaced, and the pool
+      is emptied once no session has been taken for idle_timeout.
+    Loop-aware like the other lazy clients: state from a previous event loop is dropped.
+    """
+
+    def __init__(self, pool_size=STT_WARM_POOL_SIZE, max_age=STT_WARM_MAX_AGE, spare_tokens=1,
+                 idle_timeout=STT_WARM_IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self._last_acquired = None  # monotonic time a call last took a session
+        self.spare_tokens = spare_tokens
+        self._tokens = []  # (token, expires_at)
+        self._pool = []  # (websocket, opened_at)
+        self._opening = 0
+        self._token_task = None
+        self._maintain_task = None
+        self._client = None
+        self._loop = None
+        self.stats = {
+            "tokens_fetched": 0, "token_hits": 0, "token_misses": 0, "token_failures": 0,
+            "warm_hits": 0, "cold_opens": 0, "recycled": 0, "open_failures": 0,
+        }
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections and tasks from another loop can't be used (or awaited) here
+            self._tokens, self._pool, self._opening = [], [], 0
+            self._token_task = self._maintain_task = self._client = None
+            self._loop = loop
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=3.0))
+        return self._client
+
+    async def _fetch_token(self):
+        resp = await self._get_client().get(
+            ASSEMBLYAI_TOKEN_URL,
+            params={"expires_in_seconds": ASSEMBLYAI_TOKEN_TTL},
+            headers={"authorization": ASSEMBLYAI_API_KEY or ""},
+        )
+        resp.raise_for_status()
+        token = resp.json().get("token")
+        if not token:
+            raise RuntimeError(f"AssemblyAI token response had no token: {resp.text[:200]}")
+        self.stats["tokens_fetched"] += 1
+        return token, time.monotonic() + ASSEMBLYAI_TOKEN_TTL - ASSEMBLYAI_TOKEN_MARGIN
+
+    async def _refill_tokens(self):
+        while len(self._tokens) < self.spare_tokens:
+            self._tokens.append(await self._fetch_token())
+
+    async def get_token(self):
+        """
+        A token nobody else will use: a cached spare if one is still fresh, else a new one.
+        """
+        self._check_loop()
+        now = time.monotonic()
+        self._tokens = [entry for entry in self._tokens if entry[1] > now]
+        if self._tokens:
+            self.stats["token_hits"] += 1
+            token = self._tokens.pop(0)[0]
+        else:
+            self.stats["token_misses"] += 1
+            try:
+                token = (await self._fetch_token())[0]
+            except Exception:
+                self.stats["token_failures"] += 1
+                raise
+        # Fetch the next spare in the background
+        if self.spare_tokens and (self._token_task is None or self._token_task.done()):
+            self._token_task = asyncio.create_task(self._refill_tokens())
+            self._token_task.add_done_callback(self._log_task_failure)
+        return token
+
+    def session_url(self, token, sample_rate=STT_SAMPLE_RATE):
+        query = urlencode({"sample_rate": sample_rate, "formatted_finals": "true", "token": token})
+        return f"{ASSEMBLYAI_WS_URL}?{query}"
+
+    async def _open(self):
+        token = await self.get_token()
+        try:
+            return await websockets.connect(self.session_url(token), max_size=10 * 1024 * 1024)
+        except Exception:
+            self.stats["open_failures"] += 1
+            raise
+
+    def _usable(self, ws, opened_at, now):
+        return ws.close_code is None and now - opened_at < self.max_age
+
+    def _discard(self, ws):
+        self.stats["recycled"] += 1
+        task = asyncio.create_task(ws.close())
+        task.add_done_callback(self._log_task_failure)
+
+    async def acquire(self):
+        """
+        A connected session for one call: warm from the pool if possible, else opened now.
+        The caller owns it and closes it (see session()).
+        """
+        self._check_loop()
+        now = time.monotonic()
+        self._last_acquired = now
+        ws = None
+        while self._pool:
+            candidate, opened_at = self._pool.pop()
+            if self._usable(candidate, opened_at, now):
+                ws = candidate
+                break
+            self._discard(candidate)
+        self.kick()
+        if ws is not None:
+            self.stats["warm_hits"] += 1
+            return ws
+        self.stats["cold_opens"] += 1
+        return await self._open()
+
+    @asynccontextmanager
+    async def session(self):
+        ws = await self.acquire()
+        try:
+            yield ws
+        finally:
+            await ws.close()
+
+    async def maintain(self):
+        """
+        Drop stale tokens and sessions, then open sessions until the pool is full.
+        The pool is only filled while calls have been arriving recently.
+        """
+        self._check_loop()
+        now = time.monotonic()
+        self._tokens = [entry for entry in self._tokens if entry[1] > now]
+        active = self._last_acquired is not None and now - self._last_acquired < self.idle_timeout
+        target = self.pool_size if active else 0
+        fresh = []
+        for ws, opened_at in self._pool:
+            if len(fresh) < target and self._usable(ws, opened_at, now):
+                fresh.append((ws, opened_at))
+            else:
+                self._discard(ws)
+        self._pool = fresh
+        while len(self._pool) + self._opening < target:
+            self._opening += 1
+            try:
+                ws = await self._open()
+            finally:
+                self._opening -= 1
+            self._pool.append((ws, time.monotonic()))
+        if not target:
+            # Tokens aren't billed; a spare still saves the round trip on a cold open
+            await self._refill_tokens()
+
+    def kick(self):
+        """
+        Schedule a maintain() pass now (after a session was taken from the pool).
+        """
+        if self._maintain_task is None or self._maintain_task.done():
+            self._maintain_task = asyncio.create_task(self.maintain())
+            self._maintain_task.add_done_callback(self._log_task_failure)
+
+    def _log_task_failure(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("AssemblyAI warm-up failed: %r", task.exception())
+
+    async def run(self, interval=STT_POOL_CHECK_INTERVAL):
+        """
+        Background task keeping the pool and token cache warm.
+        """
+        if not ASSEMBLYAI_API_KEY:
+            log.warning("ASSEMBLYAI_API_KEY not set; not pre-warming AssemblyAI sessions")
+            return
+        while True:
+            try:
+                await self.maintain()
+            except Exception as e:
+                log.warning("AssemblyAI warm-up failed: %r", e)
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        pool, self._pool, self._tokens = self._pool, [], []
+        for task in (self._token_task, self._maintain_task):
+            if task is not None and not task.done():
+                task.cancel()
+        await asyncio.gather(*(ws.close() for ws, _ in pool), return_exceptions=True)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def snapshot(self):
+        return {**self.stats, "warm_sessions": len(self._pool), "spare_tokens": len(self._tokens)}
+
+
+STT_SESSIONS = STTSessionManager()
+
+async def stream_transcribe(audio_chunk_iter, frame_ms=50, on_transcript=None):
     """
     Async generator that sends PCM audio chunks to AssemblyAI and yields final transcriptions.
-    audio_chunk_iter: async iterator yielding raw PCM 16kHz mono bytes
-    """
-    async with websockets.connect(
-        ASSEMBLYAI_URL,
-        extra_headers={"Authorization": ASSEMBLYAI_API_KEY},
-        max_size=10 * 1024 * 1024,  # 10MB
-    ) as ws:
-        print("🟢 Connected to AssemblyAI streaming API")
+    audio_chunk_iter: async iterator yielding raw PCM 16kHz mono bytes of any size;
+    they are re-chunked into fixed frame_ms frames through a FrameRingBuffer.
+    on_transcript: optional callback(kind, text) for every parsed message, partials included.
+    """
+    async with STT_SESSIONS.session() as ws:
+        log.info("Connected to AssemblyAI streaming API")
         async def sender():
+            ring = FrameRingBuffer(frame_bytes(frame_ms))
             async for chunk in audio_chunk_iter:
-                await ws.send(chunk)
-            await ws.send(json.dumps({"terminate_session": True}))
+                ring.write(chunk)
+                for frame in ring.frames():
+                    await ws.send(frame)
+            tail = ring.drain()
+            if tail:
+                await ws.send(tail)
+            await ws.send(json.dumps({"type": "Terminate"}))
 
         async def receiver():
+            last_partial_at = None
             while True:
                 try:
                     msg = await ws.recv()
-                    data = json.loads(msg)
-                    if data.get("message_type") == "FinalTranscript":
-                        text = data.get("text", "")
+                    kind, text = parse_message(json.loads(msg))
+                    if on_transcript is not None:
+                        on_transcript(kind, text)
+                    if kind == "partial":
+                        last_partial_at = time.monotonic()
+                    elif kind == "final":
+                        if last_partial_at is not None:
+                            # Endpointing delay: caller's last words to the final transcript
+                            record_stage("stt_final", time.monotonic() - last_partial_at)
+                            last_partial_at = None
                         if text:
-                            print(f"📝 Final transcript: {text}")
+                            log.info("Final transcript: %s", text)
                             yield text
-                    elif data.get("message_type") == "SessionTerminated":
-                        print("🔴 AssemblyAI session terminated")
+                    elif kind == "end":
+                        log.info("AssemblyAI session terminated")
                         break
                 except websockets.ConnectionClosed:
-                    print("🔴 WebSocket closed")
+                    log.info("AssemblyAI WebSocket closed")
                     break
 
         sender_task = asyncio.create_task(sender())
@@ -47,4 +330,10 @@ async def stream_transcribe(audio_chunk_iter):
             async for final_text in receiver_gen:
                 yield final_text
         finally:
-            await sender_task
+            # The session is over (terminated, closed, or the consumer stopped early): a sender still
+            # waiting on caller audio would otherwise keep this generator open forever
+            sender_task.cancel()
+            try:
+                await sender_task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,188 @@
+# services/audio.py
+import numpy as np
+
+# Twilio Media Streams: 8 kHz mono G.711 μ-law, one 20 ms packet (160 bytes) at a time
+TWILIO_SAMPLE_RATE = 8000
+# AssemblyAI streaming input: 16 kHz mono 16-bit PCM
+STT_SAMPLE_RATE = 16000
+
+_ULAW_BIAS = 0x84
+
+
+def _build_ulaw_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + _ULAW_BIAS) << exponent) - _ULAW_BIAS
+    return np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_ulaw_encode_table():
+    # Indexed by the int16 sample reinterpreted as uint16; reference G.711 14-bit encoder
+    pcm = np.arange(65536, dtype=np.int32)
+    pcm = np.where(pcm >= 32768, pcm - 65536, pcm) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), 8159) + 0x21
+    segment = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), magnitude)
+    ulaw = np.where(segment >= 8, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    return (ulaw ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+
+
+def ulaw_to_pcm16(data) -> np.ndarray:
+    """
+    Decode μ-law bytes to an int16 array with a single table lookup.
+    """
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def pcm16_to_ulaw(pcm) -> bytes:
+    """
+    Encode int16 samples (array or raw little-endian bytes) to μ-law bytes.
+    """
+    if not isinstance(pcm, np.ndarray):
+        pcm = np.frombuffer(pcm, dtype=np.int16)
+    return ULAW_ENCODE_TABLE[pcm.view(np.uint16)].tobytes()
+
+
+def design_lowpass(num_taps, cutoff):
+    """
+    Kaiser-windowed sinc lowpass; cutoff is a fraction of the sample rate (0..0.5).
+    """
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+    return taps / taps.sum()
+
+
+class PolyphaseUpsampler:
+    """
+    Streaming integer-factor upsampler (e.g. 8 kHz -> 16 kHz with factor=2).
+    The interpolation filter is split into `factor` phases applied at the input rate,
+    so no zero-stuffed samples are ever multiplied. The last taps_per_phase - 1 input
+    samples are carried between calls, so packet boundaries leave no edge artifacts:
+    feeding a stream packet by packet gives the same output as feeding it whole.
+    One instance per audio stream.
+    """
+
+    def __init__(self, factor=2, taps_per_phase=16, cutoff=0.45):
+        self.factor = factor
+        self.taps_per_phase = taps_per_phase
+        # Passband up to cutoff * input Nyquist; DC gain of `factor` makes up for the inserted samples
+        taps = design_lowpass(factor * taps_per_phase, cutoff / factor) * factor
+        self._phases = [taps[p::factor].astype(np.float32) for p in range(factor)]
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+
+    def reset(self):
+        self._history[:] = 0
+
+    def process(self, pcm) -> np.ndarray:
+        """
+        Upsample int16 samples; returns int16 samples (len(pcm) * factor).
+        """
+        if len(pcm) == 0:
+            return np.zeros(0, dtype=np.int16)
+        x = np.concatenate((self._history, pcm.astype(np.float32)))
+        self._history = x[len(x) - (self.taps_per_phase - 1):]
+        out = np.empty((len(pcm), self.factor), dtype=np.float32)
+        for p, phase in enumerate(self._phases):
+            out[:, p] = np.convolve(x, phase, mode="valid")
+        return np.clip(np.rint(out.ravel()), -32768, 32767).astype(np.int16)
+
+
+class TwilioAudioFrontend:
+    """
+    Per-call inbound path: Twilio μ-law 8 kHz packets -> 16 kHz PCM16 for STT.
+    """
+
+    def __init__(self):
+        self.upsampler = PolyphaseUpsampler(factor=STT_SAMPLE_RATE // TWILIO_SAMPLE_RATE)
+
+    def process(self, ulaw_bytes) -> np.ndarray:
+        """
+        Returns int16 samples; any bytes-like consumer (e.g. FrameRingBuffer.write) takes them as is.
+        """
+        return self.upsampler.process(ulaw_to_pcm16(ulaw_bytes))
+
+
+def frame_bytes(frame_ms, sample_rate=STT_SAMPLE_RATE, sample_width=2):
+    return sample_rate * frame_ms // 1000 * sample_width
+
+
+class FrameRingBuffer:
+    """
+    Preallocated ring that turns arbitrarily sized audio chunks into fixed-size frames
+    (e.g. 50 ms = 1600 bytes of 16 kHz PCM16 for AssemblyAI).
+    write() copies the chunk into the ring once; pop_frame() returns a memoryview into
+    the ring, so emitting a frame allocates no new bytes. The capacity is a whole number
+    of frames and frames are read from frame-aligned offsets, so a frame never wraps.
+    A popped frame is only valid until the next write(): send it (or copy it) first.
+    If the consumer falls behind, the oldest frames are dropped (counted in `dropped`);
+    stale audio is worth less than fresh audio on a live call.
+    """
+
+    def __init__(self, frame_size, capacity_frames=64):
+        self.frame_size = frame_size
+        self.capacity = frame_size * capacity_frames
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._read = 0
+        self._size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self._size
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        n = len(data)
+        if n > self.capacity:
+            # Only the newest capacity bytes can be kept, aligned to a frame boundary
+            skip = n - self.capacity
+            skip += -skip % self.frame_size
+            self.dropped += (self._size + skip) // self.frame_size
+            self._read, self._size = 0, 0
+            data = data[skip:]
+            n = len(data)
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            frames = -(-overflow // self.frame_size)
+            self._read = (self._read + frames * self.frame_size) % self.capacity
+            self._size -= frames * self.frame_size
+            self.dropped += frames
+        start = (self._read + self._size) % self.capacity
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._size += n
+
+    def pop_frame(self):
+        """
+        Next full frame as a memoryview, or None if less than a frame is buffered.
+        """
+        if self._size < self.frame_size:
+            return None
+        frame = self._view[self._read:self._read + self.frame_size]
+        self._read = (self._read + self.frame_size) % self.capacity
+        self._size -= self.frame_size
+        return frame
+
+    def frames(self):
+        while (frame := self.pop_frame()) is not None:
+            yield frame
+
+    def drain(self) -> bytes:
+        """
+        Remaining partial frame (end of stream). Copies, since it is called once per stream.
+        """
+        end = self._read + self._size
+        if end <= self.capacity:
+            tail = bytes(self._view[self._read:end])
+        else:
+            tail = bytes(self._view[self._read:]) + bytes(self._view[:end - self.capacity])
+        self._read, self._size = 0, 0
+        return tail
@@ -1,27 +1,51 @@
 import os
+import re
+import logging
+import time
+import asyncio
 import requests
+import httpx
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from services.circuit_breaker import CALCOM_BREAKER, CircuitOpenError
+from core.logger import get_logger
 load_dotenv()
 
+log = get_logger("caldotcom")
+
 CAL_API_KEY = os.getenv("CAL_API_KEY")
-BASE_URL = "https://api.cal.com/v2"
+# Overridable to point at a local stand-in (mock/fake_upstreams.py)
+BASE_URL = os.getenv("CAL_BASE_URL", "https://api.cal.com/v2")
+V1_BASE_URL = os.getenv("CAL_V1_BASE_URL", "https://api.cal.com/v1")
 CAL_USERNAME = os.getenv("CAL_USERNAME")
 CAL_API_VERSION = "2024-08-13"  # required by v2 API
 
-# --- v2 Booking Endpoints ---
-def create_booking(event_type_id, name, email, start_time, timezone="UTC", length_in_minutes=30, username=None, **kwargs):
-    """
-    Create a booking using Cal.com v2 API.
-    """
-    if not username:
-        username = CAL_USERNAME
-    url = f"{BASE_URL}/bookings"
+# Async client tuning
+CAL_HTTP_TIMEOUT = float(os.getenv("CAL_HTTP_TIMEOUT", "10"))
+CAL_HTTP_CONNECT_TIMEOUT = float(os.getenv("CAL_HTTP_CONNECT_TIMEOUT", "3"))
+CAL_HTTP_RETRIES = int(os.getenv("CAL_HTTP_RETRIES", "2"))
+CAL_HTTP_MAX_CONNECTIONS = int(os.getenv("CAL_HTTP_MAX_CONNECTIONS", "50"))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Shared availability cache: (username, event type, timezone, dateFrom, dateTo) -> (expires_at, response)
+CAL_AVAILABILITY_TTL = float(os.getenv("CAL_AVAILABILITY_TTL", "30"))
+_AVAILABILITY_CACHE = {}
+_AVAILABILITY_INFLIGHT = {}
+_availability_generation = 0
+AVAILABILITY_CACHE_STATS = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+def _v2_headers(json_body=True):
     headers = {
-        "Content-Type": "application/json",
         "cal-api-version": CAL_API_VERSION,
         "Authorization": f"Bearer {CAL_API_KEY}"
     }
+    if json_body:
+        headers["Content-Type"] = "application/json"
+    return headers
+
+def _create_booking_payload(event_type_id, name, email, start_time, timezone, length_in_minutes, username, extra):
+    if not username:
+        username = CAL_USERNAME
     payload = {
         "start": start_time,
         "attendee": {
@@ -34,8 +58,33 @@ def create_booking(event_type_id, name, email, start_time, timezone="UTC", lengt
         "username": username,
         "lengthInMinutes": length_in_minutes
     }
-    payload.update(kwargs)
-    response = requests.post(url, headers=headers, json=payload)
+    payload.update(extra)
+    return payload
+
+def _reschedule_payload(new_start_time, rescheduled_by, rescheduling_reason):
+    payload = {
+        "start": new_start_time,
+        "rescheduledBy": rescheduled_by
+    }
+    if rescheduling_reason:
+        payload["reschedulingReason"] = rescheduling_reason
+    return payload
+
+def _cancel_payload(cancelled_by, cancellation_reason):
+    payload = {}
+    if cancelled_by:
+        payload["cancelledBy"] = cancelled_by
+    if cancellation_reason:
+        payload["cancellationReason"] = cancellation_reason
+    return payload
+
+# --- v2 Booking Endpoints ---
+def create_booking(event_type_id, name, email, start_time, timezone="UTC", length_in_minutes=30, username=None, **kwargs):
+    """
+    Create a booking using Cal.com v2 API.
+    """
+    payload = _create_booking_payload(event_type_id, name, email, start_time, timezone, length_in_minutes, username, kwargs)
+    response = requests.post(f"{BASE_URL}/bookings", headers=_v2_headers(), json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -44,18 +93,8 @@ def reschedule_booking(booking_uid, new_start_time, rescheduled_by, rescheduling
     Reschedule a booking using Cal.com v2 API.
     """
     url = f"{BASE_URL}/bookings/{booking_uid}/reschedule"
-    headers = {
-        "Content-Type": "application/json",
-        "cal-api-version": CAL_API_VERSION,
-        "Authorization": f"Bearer {CAL_API_KEY}"
-    }
-    payload = {
-        "start": new_start_time,
-        "rescheduledBy": rescheduled_by
-    }
-    if rescheduling_reason:
-        payload["reschedulingReason"] = rescheduling_reason
-    response = requests.post(url, headers=headers, json=payload)
+    payload = _reschedule_payload(new_start_time, rescheduled_by, rescheduling_reason)
+    response = requests.post(url, headers=_v2_headers(), json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -64,11 +103,7 @@ def get_booking(booking_uid):
     Get a booking by UID using Cal.com v2 API.
     """
     url = f"{BASE_URL}/bookings/{booking_uid}"
-    headers = {
-        "cal-api-version": CAL_API_VERSION,
-        "Authorization": f"Bearer {CAL_API_KEY}"
-    }
-    response = requests.get(url, headers=headers)
+    response = requests.get(url, headers=_v2_headers(json_body=False))
     response.raise_for_status()
     return response.json()
 
@@ -77,34 +112,20 @@ def cancel_booking(booking_uid, cancelled_by=None, cancellation_reason=None):
     Cancel a booking using Cal.com v2 API.
     """
     url = f"{BASE_URL}/bookings/{booking_uid}/cancel"
-    headers = {
-        "Content-Type": "application/json",
-        "cal-api-version": CAL_API_VERSION,
-        "Authorization": f"Bearer {CAL_API_KEY}"
-    }
-    payload = {}
-    if cancelled_by:
-        payload["cancelledBy"] = cancelled_by
-    if cancellation_reason:
-        payload["cancellationReason"] = cancellation_reason
-    response = requests.post(url, headers=headers, json=payload)
+    payload = _cancel_payload(cancelled_by, cancellation_reason)
+    response = requests.post(url, headers=_v2_headers(), json=payload)
     response.raise_for_status()
     return response.json()
 
 
-def get_available_slots(event_type_id: str = None, username: str = None, timezone: str = "UTC"):
-    """
-    Fetch available slots for a given event type and user using Cal.com v1 API.
-    Returns the JSON response from the API.
-    """
+def _availability_params(event_type_id, username, timezone):
     if not username:
         username = CAL_USERNAME
     if not event_type_id:
         raise ValueError("event_type_id must be provided for get_available_slots.")
-    url = "https://api.cal.com/v1/availability"
     today = datetime.utcnow().date()
     end_date = today + timedelta(days=7)
-    params = {
+    return {
         "username": username,
         "eventTypeId": event_type_id,
         "timezone": timezone,
@@ -112,7 +133,15 @@ def get_available_slots(event_type_id: str = None, username: str = None, timezon
         "dateTo": end_date.isoformat(),
         "apiKey": CAL_API_KEY
     }
-    response = requests.get(url, params=params)
+
+
+def get_available_slots(event_type_id: str = None, username: str = None, timezone: str = "UTC"):
+    """
+    Fetch available slots for a given event type and user using Cal.com v1 API.
+    Returns the JSON response from the API.
+    """
+    params = _availability_params(event_type_id, username, timezone)
+    response = requests.get(f"{V1_BASE_URL}/availability", params=params)
     response.raise_for_status()
     return response.json()
 
@@ -141,11 +170,44 @@ def book_slot_v2(
       - booking_fields_responses: dict
       - debug: bool (print payload and response)
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {CAL_API_KEY}",
-        "cal-api-version": CAL_API_VERSION
-    }
+    headers = _v2_headers()
+    payload = _book_slot_v2_payload(
+        start=start,
+        name=name,
+        email=email,
+        timezone=timezone,
+        event_type_id=event_type_id,
+        event_type_slug=event_type_slug,
+        username=username,
+        length_in_minutes=length_in_minutes,
+        booking_fields_responses=booking_fields_responses
+    )
+    if debug:
+        log.debug("book_slot_v2 payload: %s", payload)
+    response = requests.post(f"{BASE_URL}/bookings", headers=headers, json=payload)
+    if debug or not response.ok:
+        log.log(logging.DEBUG if response.ok else logging.WARNING, "book_slot_v2 response %s: %s", response.status_code, response.text)
+    try:
+        response.raise_for_status()
+    except requests.HTTPError as e:
+        invalidate_availability_cache()
+        raise
+    invalidate_availability_cache()
+    return response.json()
+
+
+def _book_slot_v2_payload(
+    *,
+    start,
+    name,
+    email,
+    timezone,
+    event_type_id=None,
+    event_type_slug=None,
+    username=None,
+    length_in_minutes=None,
+    booking_fields_responses=None
+):
     payload = {
         "start": start,
         "attendee": {
@@ -167,17 +229,7 @@ def book_slot_v2(
         payload["lengthInMinutes"] = int(length_in_minutes)
     if booking_fields_responses:
         payload["bookingFieldsResponses"] = booking_fields_responses
-    if debug:
-        print("[caldotcom.book_slot_v2] Payload:", payload)
-    response = requests.post(f"{BASE_URL}/bookings", headers=headers, json=payload)
-    if debug or not response.ok:
-        print("[caldotcom.book_slot_v2] Response status:", response.status_code)
-        print("[caldotcom.book_slot_v2] Response body:", response.text)
-    try:
-        response.raise_for_status()
-    except requests.HTTPError as e:
-        raise
-    return response.json()
+    return payload
 
 
 def debug_booking(event_type_id, name, email, start_time, timezone="UTC", username=None, api_key=None):
@@ -202,62 +254,398 @@ def debug_booking(event_type_id, name, email, start_time, timezone="UTC", userna
         "start": start_time,
         "timezone": timezone
     }
-    print("[caldotcom.debug_booking] URL:", url)
-    print("[caldotcom.debug_booking] Params:", params)
-    print("[caldotcom.debug_booking] Headers:", headers)
-    print("[caldotcom.debug_booking] Payload:", payload)
+    # params carry the API key, so they are not logged
+    log.info("debug_booking POST %s payload: %s", url, payload)
     resp = requests.post(url, headers=headers, params=params, json=payload)
-    print("[caldotcom.debug_booking] Status:", resp.status_code)
     try:
-        print("[caldotcom.debug_booking] Response JSON:", resp.json())
+        log.info("debug_booking response %s: %s", resp.status_code, resp.json())
         return resp.status_code, resp.json()
     except Exception:
-        print("[caldotcom.debug_booking] Response Text:", resp.text)
+        log.info("debug_booking response %s: %s", resp.status_code, resp.text)
         return resp.status_code, resp.text
 
 
+# --- Event-type index ---
+# Built once at startup and refreshed in the background so the booking path never
+# downloads event types. by_length: minutes -> id, by_slug / by_name: normalised key -> id
+EVENT_TYPE_INDEX = {"by_length": {}, "by_slug": {}, "by_name": {}, "refreshed_at": 0.0}
+EVENT_TYPE_REFRESH_INTERVAL = float(os.getenv("CAL_EVENT_TYPE_REFRESH_INTERVAL", "600"))
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "ten": 10,
+    "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40, "forty-five": 45,
+    "fortyfive": 45, "forty five": 45, "sixty": 60, "ninety": 90
+}
+_NUMBER_WORD_RE = "|".join(re.escape(w) for w in sorted(_NUMBER_WORDS, key=len, reverse=True))
+# Amounts are numbers or whole number words, never arbitrary words, and the one-letter
+# units only count straight after digits ("15m", "1h30m"), so "9 am" is not a duration.
+# The amount is optional so "hour and a half" matches; "15-minute" allows a hyphen before the unit.
+# "and a half" may come before the unit ("two and a half hours") or after it ("an hour and a half").
+_DURATION_RE = re.compile(
+    r"(?:(?P<amount>(?<![\d.])\d+(?:\.\d+)?|\b(?:" + _NUMBER_WORD_RE + r")\b)"
+    r"(?P<half_before>\s+and\s+a\s+half)?[\s-]*)?"
+    r"(?P<unit>(?:(?<=\d)|\b)(?:hours?|hrs?|minutes?|mins?)|(?<=\d)[hm])(?![a-z])"
+    r"(?P<half_after>\s+and\s+a\s+half)?"
+)
+_HALF_HOUR_RE = re.compile(r"(?<!and a )\bhalf(?:\s+an\s+|-|\s+)hour\b")
+
+def _normalize_key(value):
+    return re.sub(r"[^a-z0-9]", "", str(value).lower()) if value else ""
+
+def parse_duration_minutes(duration):
+    """
+    Parse a spoken/LLM duration into minutes.
+    Handles '15m', '30 min', '15-minute', '1 hour', '1.5 hours', '1h30m', 'half an hour',
+    'an hour', 'an hour and a half', '45'.
+    Returns None if nothing sensible can be extracted (including times like '9 am').
+    """
+    if duration is None:
+        return None
+    if isinstance(duration, (int, float)):
+        return int(duration) if duration > 0 else None
+    text = str(duration).strip().lower()
+    if not text or text in ("null", "none", "unknown"):
+        return None
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    if _HALF_HOUR_RE.search(text):
+        return 30
+    if "quarter of an hour" in text or "quarter hour" in text:
+        return 15
+    total = 0.0
+    matched = False
+    for match in _DURATION_RE.finditer(text):
+        amount, unit = match["amount"], match["unit"]
+        and_a_half = match["half_before"] or match["half_after"]
+        if amount and amount[0].isdigit():
+            value = float(amount)
+        elif amount:
+            value = _NUMBER_WORDS[amount]
+        elif and_a_half and unit.startswith("hour"):
+            value = 1  # "hour and a half"
+        else:
+            continue
+        if and_a_half:
+            value += 0.5
+        total += value * 60 if unit.startswith("h") else value
+        matched = True
+    if matched and total > 0:
+        return int(round(total))
+    return None
+
+def _build_event_type_index(event_types):
+    by_length, by_slug, by_name = {}, {}, {}
+    for et in event_types:
+        et_id = et.get("id")
+        if et_id is None:
+            continue
+        length = et.get("length") or et.get("lengthInMinutes")
+        if isinstance(length, (int, float)) and length > 0:
+            # First event type wins for a given length (same order the API returns them)
+            by_length.setdefault(int(length), et_id)
+        slug = _normalize_key(et.get("slug"))
+        if slug:
+            by_slug.setdefault(slug, et_id)
+        name = _normalize_key(et.get("title") or et.get("name"))
+        if name:
+            by_name.setdefault(name, et_id)
+    return {"by_length": by_length, "by_slug": by_slug, "by_name": by_name, "refreshed_at": time.time()}
+
+def _install_event_type_index(event_types):
+    global EVENT_TYPE_INDEX
+    EVENT_TYPE_INDEX = _build_event_type_index(event_types)
+    log.info("Event-type index refreshed: %d lengths, %d slugs", len(EVENT_TYPE_INDEX["by_length"]), len(EVENT_TYPE_INDEX["by_slug"]))
+    return EVENT_TYPE_INDEX
+
+def lookup_event_type_id(duration=None, slug=None):
+    """
+    O(1) event type lookup against the in-memory index. Never touches the network.
+    Tries the parsed duration first, then slug/name matches. Returns None if not found.
+    """
+    index = EVENT_TYPE_INDEX
+    if slug:
+        key = _normalize_key(slug)
+        et_id = index["by_slug"].get(key) or index["by_name"].get(key)
+        if et_id is not None:
+            return et_id
+    minutes = parse_duration_minutes(duration)
+    if minutes is not None and minutes in index["by_length"]:
+        return index["by_length"][minutes]
+    if duration and minutes is None:
+        key = _normalize_key(duration)
+        return index["by_slug"].get(key) or index["by_name"].get(key)
+    return None
+
 def get_event_type_id_by_duration(duration: str, username: str = None):
     """
-    Fetch all event types for the user and return the event type id that matches the given duration string.
-    Duration can be '15m', '30m', '1 hour', etc. (case-insensitive, flexible match).
+    Return the event type id that matches the given duration string, e.g. '15m', '30m', '1 hour'.
+    Uses the precomputed index (built at app startup). Only a script with no event loop
+    fetches event types here, if the index has never been built; inside the app a cold
+    index returns None rather than block the loop on a request.
     Returns None if not found.
     """
+    if not EVENT_TYPE_INDEX["refreshed_at"]:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            log.warning("Event-type index not built yet; not fetching event types on the event loop")
+            return lookup_event_type_id(duration)
+        if not username:
+            username = CAL_USERNAME
+        params = {"username": username, "apiKey": CAL_API_KEY}
+        response = requests.get(f"{BASE_URL}/event-types", params=params)
+        response.raise_for_status()
+        data = response.json()
+        event_types = data.get("eventTypes") or data.get("event_types") or data.get("data") or data
+        if not isinstance(event_types, list):
+            return None
+        _install_event_type_index(event_types)
+    return lookup_event_type_id(duration)
+
+
+# --- Async client (pooled, with timeouts and retries) ---
+_async_client = None
+_async_client_loop = None
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the shared keep-alive AsyncClient for Cal.com.
+    A new client is created if the event loop changed (e.g. repeated asyncio.run in scripts).
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(CAL_HTTP_TIMEOUT, connect=CAL_HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=CAL_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=CAL_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60
+            )
+        )
+        _async_client_loop = loop
+    return _async_client
+
+async def aclose_async_client():
+    global _async_client, _async_client_loop
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+def _retry_delay(attempt, response=None):
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 5.0)
+    return 0.2 * (2 ** attempt)
+
+async def _request(method, url, **kwargs):
+    """
+    Issue a Cal.com request through the Cal.com circuit breaker.
+    Raises CircuitOpenError without touching the network while the breaker is open.
+    401/403 trip the breaker immediately; 5xx/429, timeouts and transport errors count
+    as failures; other 4xx (e.g. a slot that was just taken) do not.
+    """
+    if not CALCOM_BREAKER.allow():
+        raise CircuitOpenError(CALCOM_BREAKER.name)
+    started = time.monotonic()
+    try:
+        result = await _request_with_retries(method, url, **kwargs)
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        if status in (401, 403):
+            CALCOM_BREAKER.record_failure(trip=True)
+        elif status >= 500 or status == 429:
+            CALCOM_BREAKER.record_failure(time.monotonic() - started)
+        else:
+            CALCOM_BREAKER.record_success(time.monotonic() - started)
+        raise
+    except Exception:
+        CALCOM_BREAKER.record_failure(time.monotonic() - started)
+        raise
+    except BaseException:
+        CALCOM_BREAKER.release()
+        raise
+    CALCOM_BREAKER.record_success(time.monotonic() - started)
+    return result
+
+async def _request_with_retries(method, url, *, idempotent=True, retries=None, **kwargs):
+    """
+    Issue a Cal.com request on the pooled client and return the decoded JSON body.
+    Idempotent requests are retried on transport errors and 429/5xx responses.
+    Non-idempotent requests (bookings) are only retried when the connection
+    could not be established, so a booking is never submitted twice.
+    """
+    if retries is None:
+        retries = CAL_HTTP_RETRIES
+    client = get_async_client()
+    for attempt in range(retries + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            if attempt >= retries:
+                raise
+            log.warning("%s %s connect failed (%s), retrying", method, url, e)
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        except httpx.TransportError as e:
+            if not idempotent or attempt >= retries:
+                raise
+            log.warning("%s %s transport error (%s), retrying", method, url, e)
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        if idempotent and response.status_code in RETRY_STATUS_CODES and attempt < retries:
+            log.warning("%s %s returned %s, retrying", method, url, response.status_code)
+            await asyncio.sleep(_retry_delay(attempt, response))
+            continue
+        if response.is_error:
+            log.error("%s %s failed: %s %s", method, url, response.status_code, response.text)
+        response.raise_for_status()
+        return response.json()
+
+def invalidate_availability_cache():
+    """
+    Drop all cached and in-flight availability so the next lookup hits Cal.com.
+    Called after every booking attempt that reached the API.
+    """
+    global _availability_generation
+    _availability_generation += 1
+    _AVAILABILITY_CACHE.clear()
+    _AVAILABILITY_INFLIGHT.clear()
+    AVAILABILITY_CACHE_STATS["invalidations"] += 1
+
+async def _fetch_availability(key, params):
+    generation = _availability_generation
+    try:
+        result = await _request("GET", f"{V1_BASE_URL}/availability", params=params)
+    finally:
+        if _AVAILABILITY_INFLIGHT.get(key) is asyncio.current_task():
+            del _AVAILABILITY_INFLIGHT[key]
+    # A booking may have landed while we were waiting; don't cache pre-booking data
+    if generation == _availability_generation:
+        _AVAILABILITY_CACHE[key] = (time.monotonic() + CAL_AVAILABILITY_TTL, result)
+    return result
+
+def _consume_task_exception(task):
+    if not task.cancelled():
+        task.exception()
+
+async def async_get_available_slots(event_type_id: str = None, username: str = None, timezone: str = "UTC", use_cache: bool = True):
+    """
+    Async version of get_available_slots (Cal.com v1 availability for the next 7 days).
+    Responses are cached for CAL_AVAILABILITY_TTL seconds and concurrent misses for the
+    same key share a single upstream request. The returned dict is shared; don't mutate it.
+    """
+    params = _availability_params(event_type_id, username, timezone)
+    if not use_cache or CAL_AVAILABILITY_TTL <= 0:
+        return await _request("GET", f"{V1_BASE_URL}/availability", params=params)
+    key = (params["username"], str(params["eventTypeId"]), params["timezone"], params["dateFrom"], params["dateTo"])
+    cached = _AVAILABILITY_CACHE.get(key)
+    if cached and cached[0] > time.monotonic():
+        AVAILABILITY_CACHE_STATS["hits"] += 1
+        return cached[1]
+    task = _AVAILABILITY_INFLIGHT.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        AVAILABILITY_CACHE_STATS["misses"] += 1
+        task = asyncio.create_task(_fetch_availability(key, params))
+        task.add_done_callback(_consume_task_exception)
+        _AVAILABILITY_INFLIGHT[key] = task
+    else:
+        AVAILABILITY_CACHE_STATS["coalesced"] += 1
+    # Shield so one cancelled caller doesn't cancel the fetch for everyone else
+    return await asyncio.shield(task)
+
+async def refresh_available_slots(event_type_id: str = None, username: str = None, timezone: str = "UTC"):
+    """
+    Re-fetch availability and overwrite the cache entry in place, so callers keep
+    hitting the old entry until the new one lands (used by the scheduled cache warmer).
+    """
+    params = _availability_params(event_type_id, username, timezone)
+    key = (params["username"], str(params["eventTypeId"]), params["timezone"], params["dateFrom"], params["dateTo"])
+    task = _AVAILABILITY_INFLIGHT.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_fetch_availability(key, params))
+        task.add_done_callback(_consume_task_exception)
+        _AVAILABILITY_INFLIGHT[key] = task
+    return await asyncio.shield(task)
+
+async def async_get_event_types(username: str = None):
+    """
+    Fetch all event types for the user. Returns the raw list (or [] if the response is unexpected).
+    """
     if not username:
         username = CAL_USERNAME
-    url = f"{BASE_URL}/event-types"
     params = {"username": username, "apiKey": CAL_API_KEY}
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
-    event_types = data.get("eventTypes") or data.get("event_types") or data
-    if not isinstance(event_types, list):
-        return None
-    # Normalize duration string for matching
-    norm_duration = duration.lower().replace(' ', '') if duration else None
-    for et in event_types:
-        # Safely handle None for description, name, and length
-        name = (et.get('name') or '').lower().replace(' ', '')
-        desc = (et.get('description') or '').lower().replace(' ', '')
-        et_length = et.get('length')
-        et_duration = str(et_length).lower().replace(' ', '') if et_length is not None else ''
-        # Match if duration string is in name, description, or matches length
-        if norm_duration:
-            if norm_duration in name or norm_duration in desc:
-                return et.get('id')
-            # Try to match '30m' to 30, '15m' to 15, '1hour' to 60, etc.
-            if 'm' in norm_duration:
-                try:
-                    mins = int(norm_duration.replace('m',''))
-                    if et_length == mins:
-                        return et.get('id')
-                except Exception:
-                    pass
-            elif 'hour' in norm_duration:
-                try:
-                    if '1hour' in norm_duration and et_length == 60:
-                        return et.get('id')
-                    if '2hour' in norm_duration and et_length == 120:
-                        return et.get('id')
-                except Exception:
-                    pass
-    return None
+    data = await _request("GET", f"{BASE_URL}/event-types", params=params)
+    if isinstance(data, dict):
+        event_types = data.get("eventTypes") or data.get("event_types") or data.get("data")
+    else:
+        event_types = data
+    return event_types if isinstance(event_types, list) else []
+
+async def async_create_booking(event_type_id, name, email, start_time, timezone="UTC", length_in_minutes=30, username=None, **kwargs):
+    """
+    Async version of create_booking.
+    """
+    payload = _create_booking_payload(event_type_id, name, email, start_time, timezone, length_in_minutes, username, kwargs)
+    result = await _request("POST", f"{BASE_URL}/bookings", idempotent=False, headers=_v2_headers(), json=payload)
+    invalidate_availability_cache()
+    return result
+
+async def async_book_slot_v2(*, debug=False, **kwargs):
+    """
+    Async version of book_slot_v2. Takes the same keyword arguments.
+    """
+    payload = _book_slot_v2_payload(**kwargs)
+    if debug:
+        log.debug("async_book_slot_v2 payload: %s", payload)
+    try:
+        result = await _request("POST", f"{BASE_URL}/bookings", idempotent=False, headers=_v2_headers(), json=payload)
+    except httpx.HTTPStatusError:
+        # Most likely the slot was taken since we last looked
+        invalidate_availability_cache()
+        raise
+    invalidate_availability_cache()
+    if debug:
+        log.debug("async_book_slot_v2 response: %s", result)
+    return result
+
+async def async_get_booking(booking_uid):
+    """
+    Async version of get_booking.
+    """
+    return await _request("GET", f"{BASE_URL}/bookings/{booking_uid}", headers=_v2_headers(json_body=False))
+
+async def async_reschedule_booking(booking_uid, new_start_time, rescheduled_by, rescheduling_reason=None):
+    """
+    Async version of reschedule_booking.
+    """
+    payload = _reschedule_payload(new_start_time, rescheduled_by, rescheduling_reason)
+    url = f"{BASE_URL}/bookings/{booking_uid}/reschedule"
+    result = await _request("POST", url, idempotent=False, headers=_v2_headers(), json=payload)
+    invalidate_availability_cache()
+    return result
+
+async def async_cancel_booking(booking_uid, cancelled_by=None, cancellation_reason=None):
+    """
+    Async version of cancel_booking.
+    """
+    payload = _cancel_payload(cancelled_by, cancellation_reason)
+    url = f"{BASE_URL}/bookings/{booking_uid}/cancel"
+    result = await _request("POST", url, idempotent=False, headers=_v2_headers(), json=payload)
+    invalidate_availability_cache()
+    return result
+
+async def refresh_event_type_index(username: str = None):
+    """
+    Download event types and rebuild the index. Keeps the old index on failure.
+    """
+    try:
+        event_types = await async_get_event_types(username)
+    except Exception as e:
+        log.warning("Event-type index refresh failed: %s", e)
+        return EVENT_TYPE_INDEX
+    return _install_event_type_index(event_types)
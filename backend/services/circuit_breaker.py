@@ -0,0 +1,278 @@
+# services/circuit_breaker.py
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from core.logger import get_logger
+
+log = get_logger("breaker")
+
+# Breaker state is shared by all workers on the host through this SQLite file
+BREAKER_STATE_DB = os.getenv("BREAKER_STATE_DB", "circuit_breakers.sqlite3")
+# How long a worker trusts its cached view of the shared state
+BREAKER_STATE_REFRESH = float(os.getenv("BREAKER_STATE_REFRESH", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+    def __init__(self, name):
+        super().__init__(f"{name} circuit breaker is open")
+        self.name = name
+
+
+class _SharedState:
+    """
+    Tiny SQLite table of (name, state, opened_until) shared across worker processes.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=2, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS breakers (name TEXT PRIMARY KEY, state TEXT NOT NULL, opened_until REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def read(self, name):
+        with self._lock:
+            row = self._db.execute("SELECT state, opened_until FROM breakers WHERE name = ?", (name,)).fetchone()
+        return row if row else (CLOSED, 0.0)
+
+    def write(self, name, state, opened_until):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO breakers (name, state, opened_until, updated_at) VALUES (?, ?, ?, ?)",
+                (name, state, opened_until, time.time())
+            )
+
+    def claim_probe(self, name, now, stale_after):
+        """
+        Atomically move an expired OPEN breaker (or a HALF_OPEN one whose probe owner
+        went quiet for stale_after seconds) to HALF_OPEN. Returns True for the one worker that wins.
+        """
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE breakers SET state = ?, updated_at = ? WHERE name = ? AND "
+                "((state = ? AND opened_until <= ?) OR (state = ? AND updated_at <= ?))",
+                (HALF_OPEN, now, name, OPEN, now, HALF_OPEN, now - stale_after)
+            )
+            return cur.rowcount == 1
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def _get_shared():
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = _SharedState(BREAKER_STATE_DB)
+        return _shared
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker that trips on error rate or on the share of slow calls.
+    Outcomes are tracked per process over a sliding window; the state itself is shared
+    so one worker tripping the breaker protects every worker. Thread-safe.
+    """
+
+    def __init__(self, name, *, error_rate=0.5, slow_rate=0.5, latency_threshold=None, min_calls=5, window=30.0, open_seconds=30.0):
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._lock = threading.Lock()
+        self._cached = (CLOSED, 0.0)
+        self._cached_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"successes": 0, "failures": 0, "rejections": 0, "trips": 0}
+
+    def _state(self, now):
+        if now - self._cached_at >= BREAKER_STATE_REFRESH:
+            try:
+                self._cached = _get_shared().read(self.name)
+            except sqlite3.Error as e:
+                log.warning("Could not read shared state for %s: %s", self.name, e)
+            self._cached_at = now
+        return self._cached
+
+    def _set_state(self, state, opened_until=0.0):
+        self._cached = (state, opened_until)
+        self._cached_at = time.time()
+        try:
+            _get_shared().write(self.name, state, opened_until)
+        except sqlite3.Error as e:
+            log.warning("Could not write shared state for %s: %s", self.name, e)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.time())[0]
+
+    def is_open(self):
+        """
+        True while the breaker is rejecting calls. Does not claim a half-open probe.
+        """
+        now = time.time()
+        with self._lock:
+            state, opened_until = self._state(now)
+            if state == OPEN:
+                return now < opened_until
+            return state == HALF_OPEN and self._probe_in_flight
+
+    def allow(self):
+        """
+        Decide whether a call may go upstream. In half-open state only one probe is let through.
+        """
+        now = time.time()
+        with self._lock:
+            state, opened_until = self._state(now)
+            if state == CLOSED:
+                return True
+            if (state == OPEN and now >= opened_until) or (state == HALF_OPEN and not self._probe_in_flight):
+                # Only one worker wins the probe; the rest keep rejecting until it resolves
+                try:
+                    won = _get_shared().claim_probe(self.name, now, self.open_seconds)
+                except sqlite3.Error:
+                    won = state == OPEN
+                if won:
+                    self._cached = (HALF_OPEN, opened_until)
+                    self._cached_at = now
+                    self._probe_in_flight = True
+                    log.info("%s half-open, sending probe", self.name)
+                    return True
+            self.stats["rejections"] += 1
+            return False
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def record_success(self, latency=None):
+        now = time.time()
+        slow = self.latency_threshold is not None and latency is not None and latency > self.latency_threshold
+        with self._lock:
+            self.stats["successes"] += 1
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._calls.clear()
+                if slow:
+                    self._trip(now, "slow probe")
+                else:
+                    log.info("%s closed", self.name)
+                    self._set_state(CLOSED)
+                return
+            self._calls.append((now, False, slow))
+            self._evaluate(now)
+
+    def record_failure(self, latency=None, trip=False):
+        """
+        Record a failed call. trip=True opens the breaker immediately (e.g. on a 401).
+        """
+        now = time.time()
+        with self._lock:
+            self.stats["failures"] += 1
+            if self._probe_in_flight or trip:
+                self._probe_in_flight = False
+                self._trip(now, "probe failed" if not trip else "hard failure")
+                return
+            self._calls.append((now, True, False))
+            self._evaluate(now)
+
+    def _evaluate(self, now):
+        self._prune(now)
+        total = len(self._calls)
+        if total < self.min_calls or self._cached[0] == OPEN:
+            return
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        if failures / total >= self.error_rate:
+            self._trip(now, f"error rate {failures}/{total}")
+        elif self.latency_threshold is not None and slow / total >= self.slow_rate:
+            self._trip(now, f"slow calls {slow}/{total} over {self.latency_threshold}s")
+
+    def _trip(self, now, reason):
+        self.stats["trips"] += 1
+        self._calls.clear()
+        log.warning("%s OPEN for %ss (%s)", self.name, self.open_seconds, reason)
+        self._set_state(OPEN, now + self.open_seconds)
+
+    @asynccontextmanager
+    async def guard(self, is_failure=None):
+        """
+        async with breaker.guard(): ... — rejects with CircuitOpenError when open and
+        records the outcome and latency otherwise. is_failure(exc) lets callers decide
+        which exceptions count against the upstream (default: all of them).
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure(time.monotonic() - started)
+            else:
+                self.record_success(time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled by our caller (e.g. barge-in): not the upstream's fault
+            self.release()
+            raise
+        self.record_success(time.monotonic() - started)
+
+    def release(self):
+        """
+        Give up a half-open probe without an outcome so the next call can probe immediately.
+        """
+        with self._lock:
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._set_state(OPEN, time.time())
+
+    def snapshot(self):
+        with self._lock:
+            state, opened_until = self._state(time.time())
+            return {**self.stats, "state": state, "opened_until": opened_until}
+
+
+CALCOM_BREAKER = CircuitBreaker(
+    "calcom",
+    latency_threshold=float(os.getenv("CALCOM_BREAKER_LATENCY", "4")),
+    open_seconds=float(os.getenv("CALCOM_BREAKER_OPEN_SECONDS", "60"))
+)
+GEMINI_BREAKER = CircuitBreaker(
+    "gemini",
+    latency_threshold=float(os.getenv("GEMINI_BREAKER_LATENCY", "5")),
+    open_seconds=float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+)
+DEEPGRAM_BREAKER = CircuitBreaker(
+    "deepgram",
+    latency_threshold=float(os.getenv("DEEPGRAM_BREAKER_LATENCY", "3")),
+    open_seconds=float(os.getenv("DEEPGRAM_BREAKER_OPEN_SECONDS", "30"))
+)
+BREAKERS = {b.name: b for b in (CALCOM_BREAKER, GEMINI_BREAKER, DEEPGRAM_BREAKER)}
+
+# Canned replies used while a dependency is tripped (pre-warmed into the TTS cache at startup)
+FALLBACK_REPLIES = {
+    "calcom": "Sorry, our booking system is temporarily unavailable. Redirecting you to a team member.",
+    "gemini": "Sorry, I'm having a little trouble on my end. Could you say that again in a moment?",
+    # Streamed from the TTS cache (never synthesized on demand) when Deepgram can't speak a reply
+    "deepgram": "Sorry, I'm having trouble with my voice right now. Please give me a moment and try again.",
+}
+
+def fallback_reply(name):
+    return FALLBACK_REPLIES.get(name)
@@ -1,48 +1,84 @@
 import os
+import asyncio
 import google.generativeai as genai
+import httpx
 from dotenv import load_dotenv
 import json
-import asyncio
-from functools import lru_cache
+from services.llm_cache import LLMCache
+from services import llm_gateway
+from core.logger import get_logger
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
-
-# Pre-load/warm-up the model (dummy call)
-def _warmup():
-    try:
-        model.generate_content("Hello! This is a warmup.")
-    except Exception:
-        pass
-_warmup()
-
-# Simple in-memory cache for prompt/response pairs
-_gemini_cache = {}
-
-def _cache_key(prompt):
-    return hash(prompt)
+log = get_logger("gpt")
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# Talk to this generateContent REST endpoint instead of going through the SDK,
+# e.g. a local stand-in for load tests (mock/fake_upstreams.py)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+class _RESTResponse:
+    def __init__(self, text):
+        self.text = text
+
+class GeminiRESTModel:
+    """
+    Minimal Gemini REST client with the surface the gateway uses:
+    await generate_content_async(prompt) -> object with .text.
+    """
+
+    def __init__(self, base_url, model_name=GEMINI_MODEL, api_key=None):
+        self.url = f"{base_url.rstrip('/')}/v1beta/models/{model_name}:generateContent"
+        self.api_key = api_key
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=3.0))
+            self._client_loop = loop
+        return self._client
+
+    async def generate_content_async(self, prompt, stream=False):
+        resp = await self._get_client().post(
+            self.url,
+            params={"key": self.api_key or ""},
+            json={"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+        )
+        resp.raise_for_status()
+        parts = resp.json()["candidates"][0]["content"]["parts"]
+        result = _RESTResponse("".join(part.get("text", "") for part in parts))
+        if stream:
+            async def chunks():
+                yield result
+            return chunks()
+        return result
+
+if GEMINI_BASE_URL:
+    model = GeminiRESTModel(GEMINI_BASE_URL, api_key=os.getenv("GEMINI_API_KEY"))
+    llm_gateway.set_model(model)
+else:
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    llm_gateway.set_model(model)
+
+    # Pre-load/warm-up the model (dummy call)
+    def _warmup():
+        try:
+            model.generate_content("Hello! This is a warmup.")
+        except Exception:
+            pass
+    _warmup()
+
+# Bounded LRU/TTL cache for prompt/response pairs (optional SQLite tier via GEMINI_CACHE_DB)
+GEMINI_CACHE = LLMCache(namespace=GEMINI_MODEL)
 
 async def async_generate_content(prompt, streaming=False):
-    key = _cache_key(prompt)
-    if key in _gemini_cache:
-        return _gemini_cache[key]
-    # Use streaming if available
-    if hasattr(model, 'generate_content'):
-        if streaming:
-            # If streaming is supported, use it (Gemini API may not support this yet)
-            res = model.generate_content(prompt, stream=True)
-            # Collect the streamed response
-            raw = "".join([chunk.text for chunk in res])
-        else:
-            res = model.generate_content(prompt)
-            raw = res.text.strip()
-    else:
-        res = model.generate_content(prompt)
-        raw = res.text.strip()
-    _gemini_cache[key] = raw
-    return raw
+    """
+    Cached, non-blocking Gemini call routed through the shared LLM gateway.
+    """
+    return await llm_gateway.generate(prompt, cache=GEMINI_CACHE, stream=streaming)
 
 # --- INTENT PARSING ---
 async def parse_intent(user_input: str):
@@ -75,8 +111,7 @@ Respond ONLY in this JSON format:
         parsed = json.loads(raw)
         return parsed.get("intent"), parsed.get("datetime"), parsed.get("duration")
     except Exception as e:
-        print("❌ Error parsing Gemini output:", e)
-        print("🔴 Raw:", raw)
+        log.warning("Error parsing Gemini output: %s", e, extra={"raw": raw})
         return "unknown", "unknown", None
 
 # --- LLM REPLY GENERATION ---
@@ -147,5 +182,5 @@ Respond ONLY in this JSON format:
         q = json.loads(raw)
         return q
     except Exception as e:
-        print(f"[gpt] Qualification parse error: {e}, raw: {raw}")
+        log.warning("Qualification parse error: %s", e, extra={"raw": raw})
         return {"qualified": False, "reason": "Could not parse LLM output", "route_to": None}
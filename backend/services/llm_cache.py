@@ -0,0 +1,149 @@
+# services/llm_cache.py
+import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024"))
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+# Optional shared tier; set to a file path (e.g. gemini_cache.sqlite3) to enable
+GEMINI_CACHE_DB = os.getenv("GEMINI_CACHE_DB", "")
+GEMINI_CACHE_DB_MAX_ROWS = int(os.getenv("GEMINI_CACHE_DB_MAX_ROWS", "50000"))
+
+
+def prompt_digest(prompt: str, namespace: str = "") -> str:
+    """
+    Stable cache key: identical across processes and restarts, unlike hash().
+    """
+    return hashlib.sha256(f"{namespace}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    LRU + TTL cache for LLM responses with an optional SQLite tier shared by workers.
+    The memory tier is bounded by max_entries; the SQLite tier by max_rows.
+    """
+
+    def __init__(self, namespace="", max_entries=GEMINI_CACHE_MAX_ENTRIES, ttl=GEMINI_CACHE_TTL, db_path=GEMINI_CACHE_DB, max_rows=GEMINI_CACHE_DB_MAX_ROWS):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_writes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires_at)")
+        self._db.commit()
+
+    @property
+    def has_disk_tier(self):
+        return self._db is not None
+
+    def key(self, prompt):
+        return prompt_digest(prompt, self.namespace)
+
+    def _get_memory(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._memory[key]
+            self.stats["expirations"] += 1
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _set_memory(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, prompt):
+        """
+        Return the cached response or None. Checks memory, then the SQLite tier.
+        """
+        key = self.key(prompt)
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self.stats["disk_hits"] += 1
+                    self._set_memory(key, row[0], row[1])
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, prompt, value):
+        key = self.key(prompt)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._set_memory(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at)
+                )
+                self._db_writes += 1
+                if self._db_writes % 500 == 0:
+                    self._prune_db()
+                self._db.commit()
+
+    def _prune_db(self):
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+
+    async def aget(self, prompt):
+        """
+        Async get: memory hits return inline; the SQLite tier is read off the event loop.
+        """
+        if self._db is None:
+            return self.get(prompt)
+        key = self.key(prompt)
+        with self._lock:
+            value = self._get_memory(key, time.time())
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+        return await asyncio.to_thread(self.get, prompt)
+
+    async def aset(self, prompt, value):
+        if self._db is None:
+            self.set(prompt, value)
+        else:
+            await asyncio.to_thread(self.set, prompt, value)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._memory),
+                "hit_rate": round((self.stats["hits"] + self.stats["disk_hits"]) / lookups, 4) if lookups else 0.0,
+                "disk_tier": self._db is not None,
+            }
@@ -0,0 +1,139 @@
+# services/llm_gateway.py
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from services.llm_cache import prompt_digest
+from services.circuit_breaker import GEMINI_BREAKER, CircuitOpenError
+from core.tracing import stage
+
+# Max Gemini requests in flight per process, and the per-request deadline in seconds
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "8"))
+
+# Only used when the SDK has no async API
+_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+_model = None
+_semaphore = None
+_semaphore_loop = None
+# prompt digest -> in-flight task, so identical concurrent prompts share one request
+_INFLIGHT = {}
+# in-flight task -> callers still waiting on it
+_WAITERS = {}
+GATEWAY_STATS = {"requests": 0, "coalesced": 0, "cache_hits": 0, "timeouts": 0, "errors": 0, "abandoned": 0}
+
+
+def set_model(model):
+    """
+    Install the GenerativeModel (or any object with generate_content[_async]) the gateway calls.
+    """
+    global _model
+    _model = model
+
+
+def get_model():
+    if _model is None:
+        # services.gpt configures the SDK and installs its model on import
+        import services.gpt  # noqa: F401
+    return _model
+
+
+def _get_semaphore():
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def in_flight():
+    return len(_INFLIGHT)
+
+
+async def _call_model(model, prompt, stream):
+    if hasattr(model, "generate_content_async"):
+        res = await model.generate_content_async(prompt, stream=stream) if stream else await model.generate_content_async(prompt)
+        if stream:
+            return "".join([chunk.text async for chunk in res])
+        return res.text
+    loop = asyncio.get_running_loop()
+    if stream:
+        def collect():
+            return "".join([chunk.text for chunk in model.generate_content(prompt, stream=True)])
+        return await loop.run_in_executor(_executor, collect)
+    res = await loop.run_in_executor(_executor, model.generate_content, prompt)
+    return res.text
+
+
+async def _run(key, prompt, stream, cache):
+    try:
+        async with _get_semaphore():
+            GATEWAY_STATS["requests"] += 1
+            async with GEMINI_BREAKER.guard():
+                # Only upstream calls are latency samples; cache hits and coalesced callers
+                # are counted in GATEWAY_STATS instead
+                with stage("gemini"):
+                    text = await asyncio.wait_for(_call_model(get_model(), prompt, stream), GEMINI_TIMEOUT)
+    except asyncio.TimeoutError:
+        GATEWAY_STATS["timeouts"] += 1
+        raise
+    except CircuitOpenError:
+        raise
+    except Exception:
+        GATEWAY_STATS["errors"] += 1
+        raise
+    finally:
+        if _INFLIGHT.get(key) is asyncio.current_task():
+            del _INFLIGHT[key]
+    text = text.strip()
+    if cache is not None:
+        await cache.aset(prompt, text)
+    return text
+
+
+def _consume_task_exception(task):
+    if not task.cancelled():
+        task.exception()
+
+
+async def generate(prompt: str, *, cache=None, timeout: float = None, stream: bool = False) -> str:
+    """
+    Single entry point for Gemini calls. Never blocks the event loop.
+    - cache: optional LLMCache consulted before and filled after the request
+    - timeout: this caller's deadline (defaults to GEMINI_TIMEOUT); a caller timing out
+      does not cancel the shared request for other callers
+    In-flight requests are capped at GEMINI_MAX_CONCURRENCY and identical prompts
+    issued concurrently are joined into one upstream request. If every caller waiting
+    on a request is cancelled (e.g. barge-in), the request itself is cancelled.
+    Raises CircuitOpenError immediately while the Gemini breaker is open.
+    The "gemini" stage times the upstream request only, not cache hits or coalesced waits.
+    Returns the stripped response text.
+    """
+    if cache is not None:
+        cached = await cache.aget(prompt)
+        if cached is not None:
+            GATEWAY_STATS["cache_hits"] += 1
+            return cached
+    key = prompt_digest(prompt, "stream" if stream else "")
+    task = _INFLIGHT.get(key)
+    if task is None and GEMINI_BREAKER.is_open():
+        raise CircuitOpenError(GEMINI_BREAKER.name)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_run(key, prompt, stream, cache))
+        task.add_done_callback(_consume_task_exception)
+        _INFLIGHT[key] = task
+    else:
+        GATEWAY_STATS["coalesced"] += 1
+    _WAITERS[task] = _WAITERS.get(task, 0) + 1
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout or GEMINI_TIMEOUT)
+    except asyncio.CancelledError:
+        # Nobody left to hear the answer: stop paying for it
+        if _WAITERS[task] == 1 and not task.done():
+            task.cancel()
+            GATEWAY_STATS["abandoned"] += 1
+        raise
+    finally:
+        _WAITERS[task] -= 1
+        if not _WAITERS[task]:
+            del _WAITERS[task]
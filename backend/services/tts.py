@@ -1,38 +1,234 @@
 # services/tts.py
 import os
 import requests
+import httpx
 from dotenv import load_dotenv
 import asyncio
+import time
+from services.tts_cache import TTS_CACHE, tts_cache_key
+from services.circuit_breaker import DEEPGRAM_BREAKER, fallback_reply
+from core.logger import get_logger
+from core.tracing import traced, record_stage
 load_dotenv()
 
-def speak_sync(text: str, filename: str = "response.wav") -> str:
-    if not text or not isinstance(text, str) or not text.strip():
-        print("❌ TTS Error: text must be a non-empty string.")
-        return ""
-    url = (
-        "https://api.deepgram.com/v1/speak"
-        "?model=aura-orion-en"
-        "&encoding=linear16"
-        "&sample_rate=16000"
-    )
-    headers = {
+log = get_logger("tts")
+
+DEEPGRAM_SPEAK_URL = os.getenv("DEEPGRAM_SPEAK_URL", "https://api.deepgram.com/v1/speak")
+TTS_MODEL = "aura-orion-en"
+TTS_ENCODING = "linear16"
+TTS_SAMPLE_RATE = 16000
+# 100ms of 16kHz 16-bit mono per streamed chunk
+TTS_STREAM_CHUNK_SIZE = int(os.getenv("TTS_STREAM_CHUNK_SIZE", "3200"))
+
+def _deepgram_headers():
+    return {
         "Authorization": f"Token {os.getenv('DEEPGRAM_API_KEY')}",
         "Content-Type": "application/json"
     }
+
+def _record_deepgram_status(status_code, started):
+    if status_code == 200:
+        DEEPGRAM_BREAKER.record_success(time.monotonic() - started)
+    elif status_code in (401, 403):
+        DEEPGRAM_BREAKER.record_failure(trip=True)
+    elif status_code >= 500 or status_code == 429:
+        DEEPGRAM_BREAKER.record_failure(time.monotonic() - started)
+    else:
+        DEEPGRAM_BREAKER.record_success(time.monotonic() - started)
+
+def _speak_params(model, encoding, sample_rate, container=None):
+    params = {"model": model, "encoding": encoding, "sample_rate": sample_rate}
+    if container:
+        params["container"] = container
+    return params
+
+def speak_sync(text: str, filename: str = "response.wav") -> str:
+    """
+    Returns "" when the text can't be synthesized (e.g. the Deepgram breaker is open);
+    the <Gather> route then has Twilio <Say> the reply instead.
+    """
+    if not text or not isinstance(text, str) or not text.strip():
+        log.error("TTS Error: text must be a non-empty string.")
+        return ""
+    key = None
+    if TTS_CACHE is not None:
+        # Cached audio is served from its content-addressed file instead of a new one
+        key = tts_cache_key(text, TTS_MODEL, TTS_ENCODING, TTS_SAMPLE_RATE)
+        cached_path = TTS_CACHE.get_path(key)
+        if cached_path:
+            return cached_path
+        cached_audio = TTS_CACHE.get(key)
+        if cached_audio is not None:
+            return TTS_CACHE.put(key, cached_audio)
+    if not DEEPGRAM_BREAKER.allow():
+        log.warning("TTS Error: Deepgram circuit breaker is open")
+        return ""
+    params = _speak_params(TTS_MODEL, TTS_ENCODING, TTS_SAMPLE_RATE)
     payload = {"text": text}
+    started = time.monotonic()
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        try:
+            response = requests.post(DEEPGRAM_SPEAK_URL, params=params, headers=_deepgram_headers(), json=payload)
+        except Exception:
+            DEEPGRAM_BREAKER.record_failure(time.monotonic() - started)
+            raise
+        _record_deepgram_status(response.status_code, started)
         if response.status_code == 200:
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            print(f"✅ TTS saved to: {filename}")
+            if key is not None:
+                filename = TTS_CACHE.put(key, response.content)
+            else:
+                with open(filename, "wb") as f:
+                    f.write(response.content)
+            log.debug("TTS saved to: %s", filename)
             return filename
         else:
-            print("❌ TTS Error:", response.text)
+            log.error("TTS Error: %s", response.text)
             return ""
     except Exception as e:
-        print("❌ TTS Error:", e)
+        log.error("TTS Error: %s", e)
         return ""
 
+@traced("tts")
 async def speak(text: str, filename: str = "response.wav") -> str:
+    """
+    Synthesize text to a WAV file and return its path. When the TTS cache is enabled
+    the returned path is the cached file for this text, not necessarily `filename`.
+    """
     return await asyncio.to_thread(speak_sync, text, filename)
+
+# --- Streaming TTS ---
+async def _fallback_chunks(text, model, encoding, sample_rate, container, chunk_size):
+    """
+    The canned "deepgram" fallback in the requested format, from the TTS cache (pre-warmed
+    at startup), for a media stream that would otherwise play silence. Nothing if not cached.
+    """
+    fallback = fallback_reply("deepgram")
+    if TTS_CACHE is None or not fallback or text.strip() == fallback:
+        return
+    key = tts_cache_key(fallback, model, encoding, sample_rate, container)
+    audio = TTS_CACHE.get_memory(key)
+    if audio is None:
+        audio = await asyncio.to_thread(TTS_CACHE.get, key)
+    if audio is None:
+        log.warning("Deepgram fallback reply is not cached; the caller hears silence")
+        return
+    for i in range(0, len(audio), chunk_size):
+        yield audio[i:i + chunk_size]
+
+_async_client = None
+_async_client_loop = None
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=3.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=60)
+        )
+        _async_client_loop = loop
+    return _async_client
+
+async def aclose_async_client():
+    global _async_client, _async_client_loop
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+async def speak_stream(
+    text: str,
+    *,
+    model: str = TTS_MODEL,
+    encoding: str = TTS_ENCODING,
+    sample_rate: int = TTS_SAMPLE_RATE,
+    container: str = None,
+    chunk_size: int = TTS_STREAM_CHUNK_SIZE
+):
+    """
+    Async generator that yields audio bytes as Deepgram produces them.
+    With the defaults the concatenated chunks are the same WAV speak() writes to disk;
+    pass container="none" for raw PCM, or encoding="mulaw", sample_rate=8000 for Twilio.
+    If Deepgram can't start the reply (breaker open, error status, transport error) the
+    cached "deepgram" fallback is yielded instead; otherwise nothing on error (logged).
+    """
+    if not text or not isinstance(text, str) or not text.strip():
+        log.error("TTS Error: text must be a non-empty string.")
+        return
+    requested = time.monotonic()
+    key = None
+    if TTS_CACHE is not None:
+        key = tts_cache_key(text, model, encoding, sample_rate, container)
+        audio = TTS_CACHE.get_memory(key)
+        if audio is None:
+            audio = await asyncio.to_thread(TTS_CACHE.get, key)
+        if audio is not None:
+            record_stage("tts_first_chunk", time.monotonic() - requested)
+            for i in range(0, len(audio), chunk_size):
+                yield audio[i:i + chunk_size]
+            return
+    if not DEEPGRAM_BREAKER.allow():
+        log.warning("TTS Error: Deepgram circuit breaker is open")
+        async for chunk in _fallback_chunks(text, model, encoding, sample_rate, container, chunk_size):
+            yield chunk
+        return
+    client = _get_async_client()
+    params = _speak_params(model, encoding, sample_rate, container)
+    chunks = []
+    started = time.monotonic()
+    recorded = False
+    first_chunk = True
+    failed = False
+    try:
+        async with client.stream("POST", DEEPGRAM_SPEAK_URL, params=params, headers=_deepgram_headers(), json={"text": text}) as response:
+            # Time to first byte is what the breaker's latency threshold measures
+            _record_deepgram_status(response.status_code, started)
+            recorded = True
+            if response.status_code != 200:
+                body = await response.aread()
+                log.error("TTS Error: %s", body.decode(errors="replace"))
+                failed = True
+            else:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    if first_chunk:
+                        record_stage("tts_first_chunk", time.monotonic() - requested)
+                        first_chunk = False
+                    if key is not None:
+                        chunks.append(chunk)
+                    yield chunk
+    except httpx.HTTPError as e:
+        if not recorded:
+            DEEPGRAM_BREAKER.record_failure(time.monotonic() - started)
+            recorded = True
+        log.error("TTS Error: %s", e)
+        failed = True
+    finally:
+        if not recorded:
+            # Cancelled before Deepgram answered; don't hold a half-open probe
+            DEEPGRAM_BREAKER.release()
+    if failed:
+        # Half a reply can't be patched up; only one that never started gets the fallback
+        if first_chunk:
+            async for chunk in _fallback_chunks(text, model, encoding, sample_rate, container, chunk_size):
+                yield chunk
+        return
+    # Only complete syntheses are cached (a consumer that stops early never gets here)
+    if key is not None and chunks:
+        await asyncio.to_thread(TTS_CACHE.put, key, b"".join(chunks), container)
+
+async def prewarm_tts_cache(texts, formats=None):
+    """
+    Synthesize static responses into the TTS cache so their first use is a memory hit.
+    formats: list of speak_stream keyword dicts (defaults to the WAV format speak() uses).
+    """
+    if TTS_CACHE is None:
+        return 0
+    formats = formats or [{}]
+    warmed = 0
+    for text in dict.fromkeys(t for t in texts if t and t.strip()):
+        for fmt in formats:
+            async for _ in speak_stream(text, **fmt):
+                pass
+            warmed += 1
+    log.info("Pre-warmed %d cached responses", warmed)
+    return warmed
@@ -0,0 +1,178 @@
+# services/tts_cache.py
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") != "0"
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+# Cached files live next to the per-turn responses so /audio/{filename} can serve them
+TTS_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "mock"))
+CACHE_FILE_PREFIX = "tts_"
+
+
+def tts_cache_key(text: str, model: str, encoding: str, sample_rate: int, container: str = None) -> str:
+    """
+    Content address for a synthesized utterance: same text + voice + format -> same audio.
+    """
+    raw = "\x1f".join([text.strip(), model, encoding, str(sample_rate), container or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier audio cache: an in-memory LRU bounded by bytes, backed by files in
+    TTS_CACHE_DIR bounded by a disk byte budget (least recently used files are deleted).
+    Thread-safe, since speak() runs synthesis in a worker thread.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_budget=TTS_CACHE_MEMORY_BYTES, disk_budget=TTS_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> (path, size)
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "memory_evictions": 0, "disk_evictions": 0}
+        self._scan_disk()
+
+    def _scan_disk(self):
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.startswith(CACHE_FILE_PREFIX) or name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = name[len(CACHE_FILE_PREFIX):].split(".", 1)[0]
+            entries.append((st.st_mtime, key, path, st.st_size))
+        # Oldest first so the LRU order survives restarts
+        for _, key, path, size in sorted(entries):
+            self._disk[key] = (path, size)
+            self._disk_bytes += size
+
+    def _path_for(self, key, container):
+        ext = "wav" if not container or container == "wav" else "raw"
+        return os.path.join(self.directory, f"{CACHE_FILE_PREFIX}{key}.{ext}")
+
+    def _remember(self, key, audio):
+        if len(audio) > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def get_memory(self, key):
+        """
+        Memory-tier lookup only; never touches the filesystem.
+        """
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            return audio
+
+    def get(self, key):
+        """
+        Return cached audio bytes (memory first, then disk) or None.
+        """
+        audio = self.get_memory(key)
+        if audio is not None:
+            return audio
+        with self._lock:
+            entry = self._disk.get(key)
+        if entry is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        try:
+            with open(entry[0], "rb") as f:
+                audio = f.read()
+        except OSError:
+            with self._lock:
+                self._drop_disk(key)
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self.stats["disk_hits"] += 1
+            self._remember(key, audio)
+        return audio
+
+    def get_path(self, key):
+        """
+        Return the on-disk path for a cached entry (promoting it in the LRU), or None.
+        A None result is not counted as a miss; callers fall through to get().
+        """
+        with self._lock:
+            entry = self._disk.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._drop_disk(key)
+                return None
+            self._disk.move_to_end(key)
+            self.stats["disk_hits"] += 1
+            return entry[0]
+
+    def put(self, key, audio, container=None):
+        """
+        Store audio in both tiers and return the file path.
+        """
+        if not audio:
+            return ""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path_for(key, container)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, audio)
+            self._drop_disk(key)
+            self._disk[key] = (path, len(audio))
+            self._disk_bytes += len(audio)
+            self._evict_disk()
+        return path
+
+    def _drop_disk(self, key):
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_budget and len(self._disk) > 1:
+            _, (path, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.stats["disk_evictions"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+TTS_CACHE = TTSCache() if TTS_CACHE_ENABLED else None
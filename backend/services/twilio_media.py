@@ -0,0 +1,125 @@
+# services/twilio_media.py
+import os
+import json
+import time
+import base64
+import asyncio
+from services.audio import FrameRingBuffer
+from core.logger import get_logger
+from core.tracing import mark
+
+log = get_logger("twilio_media")
+
+# speak_stream arguments for audio Twilio can play as-is: raw 8 kHz μ-law
+TWILIO_TTS_FORMAT = {"encoding": "mulaw", "sample_rate": 8000, "container": "none"}
+# 20 ms of 8 kHz μ-law
+TWILIO_FRAME_BYTES = 160
+TWILIO_FRAME_SECONDS = 0.02
+# How far ahead of real time frames are sent; enough to ride out jitter, small enough
+# that a "clear" (barge-in) throws away little audio
+TWILIO_PLAYOUT_LEAD_MS = float(os.getenv("TWILIO_PLAYOUT_LEAD_MS", "100"))
+
+
+class TwilioMediaPlayer:
+    """
+    Sends audio back to the caller over a Twilio Media Streams websocket as base64
+    μ-law `media` messages, one 20 ms frame each, paced to real time plus a small lead.
+    A `mark` follows every reply; Twilio echoes it back once the caller has heard
+    everything before it, which is how we know playback finished.
+    """
+
+    def __init__(self, websocket, stream_sid):
+        self.websocket = websocket
+        self.stream_sid = stream_sid
+        self._pending_marks = set()
+        self._marks_seq = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.stats = {"frames_sent": 0, "replies": 0, "marks_acked": 0, "clears": 0}
+
+    @property
+    def is_playing(self):
+        """
+        True while audio has been sent that the caller hasn't finished hearing.
+        """
+        return not self._idle.is_set()
+
+    async def _send(self, message):
+        await self.websocket.send_text(json.dumps(message))
+
+    async def _send_frame(self, frame):
+        await self._send({
+            "event": "media",
+            "streamSid": self.stream_sid,
+            "media": {"payload": base64.b64encode(frame).decode("ascii")},
+        })
+        self.stats["frames_sent"] += 1
+
+    async def play(self, chunks, name=None):
+        """
+        Stream an async iterator of μ-law chunks (any size) to the caller, then send a mark.
+        Returns the mark name.
+        """
+        self._idle.clear()
+        self._marks_seq += 1
+        name = name or f"reply-{self._marks_seq}"
+        ring = FrameRingBuffer(TWILIO_FRAME_BYTES, capacity_frames=256)
+        lead = TWILIO_PLAYOUT_LEAD_MS / 1000
+        started = None
+        sent = 0
+        try:
+            async for chunk in chunks:
+                ring.write(chunk)
+                for frame in ring.frames():
+                    if started is None:
+                        started = time.monotonic()
+                    # Frame n is due at started + n * 20 ms; stay at most `lead` ahead of that
+                    delay = started + sent * TWILIO_FRAME_SECONDS - lead - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await self._send_frame(frame)
+                    if not sent:
+                        mark("first_audio_byte")
+                    sent += 1
+            tail = ring.drain()
+            if tail:
+                # μ-law silence is 0xFF; pad so Twilio always gets whole frames
+                await self._send_frame(tail + b"\xff" * (TWILIO_FRAME_BYTES - len(tail)))
+                sent += 1
+            # Registered before sending so an echo that races the send isn't missed
+            self._pending_marks.add(name)
+            await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+        except BaseException:
+            self._pending_marks.discard(name)
+            if not self._pending_marks:
+                self._idle.set()
+            raise
+        finally:
+            # Closing the generator early (barge-in) aborts the upstream TTS request
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+        self.stats["replies"] += 1
+        log.debug("Sent %d frames for %s", sent, name)
+        return name
+
+    async def clear(self):
+        """
+        Drop everything Twilio has buffered but not yet played (barge-in).
+        Twilio echoes the pending marks back, which on_mark ignores.
+        """
+        await self._send({"event": "clear", "streamSid": self.stream_sid})
+        self._pending_marks.clear()
+        self._idle.set()
+        self.stats["clears"] += 1
+
+    def on_mark(self, name):
+        """
+        Call with the name of every `mark` event Twilio sends back.
+        """
+        self._pending_marks.discard(name)
+        self.stats["marks_acked"] += 1
+        if not self._pending_marks:
+            self._idle.set()
+
+    async def wait_idle(self):
+        await self._idle.wait()
@@ -24,4 +24,15 @@ def send_sms(to_number, message, from_number):
         from_=from_number,
         to=to_number
     )
-    return msg.sid
\ No newline at end of file
+    return msg.sid
+def hangup_call(call_sid):
+    """
+    End an in-progress call by replacing its TwiML with <Hangup/>.
+    Used by the media stream path, which has no TwiML response of its own to hang up with.
+    Args:
+        call_sid (str): The call to end
+    Returns:
+        The call's status after the update
+    """
+    call = client.calls(call_sid).update(twiml="<Response><Hangup/></Response>")
+    return call.status
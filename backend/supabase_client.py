@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+from core.log_writer import BatchedLogWriter
+from core.logger import get_logger
+load_dotenv()
+
+log = get_logger("calls")
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_ANON_PUBLIC_KEY") or os.getenv("SUPABASE_KEY")
+SUPABASE_CALLS_TABLE = os.getenv("SUPABASE_CALLS_TABLE", "calls")
+# supabase | sqlite; defaults to supabase when credentials are configured
+CALLS_BACKEND = os.getenv("CALLS_BACKEND") or ("supabase" if SUPABASE_URL and SUPABASE_KEY else "sqlite")
+# Local stand-in for the calls table (offline runs, load tests)
+CALLS_DB = os.getenv("CALLS_DB", "calls.sqlite3")
+# Durable queue of rows whose insert failed
+CALLS_RETRY_DB = os.getenv("CALLS_RETRY_DB", "calls_retry.sqlite3")
+CALLS_BATCH_SIZE = int(os.getenv("CALLS_BATCH_SIZE", "50"))
+CALLS_FLUSH_INTERVAL = float(os.getenv("CALLS_FLUSH_INTERVAL", "2"))
+CALLS_RETRY_INTERVAL = float(os.getenv("CALLS_RETRY_INTERVAL", "30"))
+CALLS_RETRY_MAX_BACKOFF = float(os.getenv("CALLS_RETRY_MAX_BACKOFF", "900"))
+# Calls with no turn for this long (no hangup callback received) are flushed as abandoned
+CALL_IDLE_TIMEOUT = float(os.getenv("CALL_IDLE_TIMEOUT", "1800"))
+# Recently finished call SIDs remembered so a late or repeated finish never writes a second row
+FINISHED_CALLS_REMEMBERED = int(os.getenv("FINISHED_CALLS_REMEMBERED", "4096"))
+
+
+class SupabaseCallsBackend:
+    """
+    Inserts rows into the Supabase calls table. The client is synchronous, so
+    inserts run in the BatchedLogWriter's worker thread, never on the event loop.
+    """
+
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_KEY, table=SUPABASE_CALLS_TABLE):
+        from supabase import create_client
+        self.table = table
+        self._client = create_client(url, key)
+
+    def insert(self, rows):
+        self._client.table(self.table).insert(rows).execute()
+
+
+class SQLiteCallsBackend:
+    """
+    Same calls table in a local SQLite file, so the pipeline runs without Supabase.
+    """
+
+    def __init__(self, path=CALLS_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "id INTEGER PRIMARY KEY, phone_number TEXT, transcript TEXT, booking_time TEXT, status TEXT, call_timestamp TEXT)"
+        )
+        self._db.commit()
+
+    def insert(self, rows):
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO calls (phone_number, transcript, booking_time, status, call_timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(r.get("phone_number"), r.get("transcript"), r.get("booking_time"), r.get("status"), r.get("call_timestamp")) for r in rows]
+            )
+            self._db.commit()
+
+
+class RetryQueue:
+    """
+    SQLite-backed queue of rows that failed to insert, retried with exponential backoff.
+    Survives restarts, so a Supabase outage never loses a finished call.
+    """
+
+    def __init__(self, path=CALLS_RETRY_DB, max_backoff=CALLS_RETRY_MAX_BACKOFF):
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY, row TEXT NOT NULL, attempts INTEGER NOT NULL, next_attempt REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def push(self, rows, attempts=0):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO pending (row, attempts, next_attempt) VALUES (?, ?, ?)",
+                [(json.dumps(r), attempts, now) for r in rows]
+            )
+            self._db.commit()
+
+    def due(self, limit):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, row, attempts FROM pending WHERE next_attempt <= ? ORDER BY id LIMIT ?", (time.time(), limit)
+            ).fetchall()
+        return [(row_id, json.loads(row), attempts) for row_id, row, attempts in rows]
+
+    def ack(self, ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in ids])
+            self._db.commit()
+
+    def backoff(self, ids, attempts):
+        delay = min(self.max_backoff, 2 ** attempts * 5)
+        with self._lock:
+            self._db.executemany(
+                "UPDATE pending SET attempts = attempts + 1, next_attempt = ? WHERE id = ?",
+                [(time.time() + delay, i) for i in ids]
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+
+class CallRecorder:
+    """
+    Buffers each call's transcript in memory while the call runs and writes one row
+    per call at hangup. Turns only append to a list; rows go through a BatchedLogWriter
+    whose sink inserts in batches off the event loop, and anything the backend rejects
+    lands in the retry queue.
+    Buffers are per process: a call whose turns are spread over several workers is
+    written once per worker that saw part of it.
+    """
+
+    def __init__(self, backend, retry_queue, batch_size=CALLS_BATCH_SIZE, flush_interval=CALLS_FLUSH_INTERVAL):
+        self.backend = backend
+        self.retry_queue = retry_queue
+        self._calls = {}  # call_sid -> in-progress call
+        self._finished = {}  # call_sid -> None, oldest first, at most FINISHED_CALLS_REMEMBERED
+        self.writer = BatchedLogWriter(self._insert, batch_size=batch_size, flush_interval=flush_interval)
+        self.stats = {"finished": 0, "inserted": 0, "queued_for_retry": 0, "retried": 0}
+
+    @staticmethod
+    def _new_call():
+        return {
+            "phone_number": None,
+            "turns": [],
+            "booking_time": None,
+            "status": None,
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "last_activity": time.monotonic(),
+        }
+
+    def _call(self, call_sid):
+        call = self._calls.get(call_sid)
+        if call is None:
+            call = self._calls[call_sid] = self._new_call()
+        return call
+
+    def start_call(self, call_sid, phone_number=None):
+        call = self._call(call_sid)
+        if phone_number:
+            call["phone_number"] = phone_number
+
+    def add_turn(self, call_sid, user_text, agent_text):
+        call = self._call(call_sid)
+        call["turns"].append(("Caller", user_text))
+        call["turns"].append(("Agent", agent_text))
+        call["last_activity"] = time.monotonic()
+
+    def set_booking(self, call_sid, booking_time):
+        call = self._call(call_sid)
+        call["booking_time"] = booking_time
+        call["status"] = "booked"
+
+    def finish_call(self, call_sid, status="completed", phone_number=None, create=False):
+        """
+        Hand the call's row to the batched writer. Safe to call more than once
+        (the hangup callback and the media stream's end can both fire): only the first
+        call for a call_sid writes a row, later ones return False.
+        create=True also writes a row for a call this process never saw start, e.g. the
+        status callback of a call that was never answered.
+        """
+        call = self._calls.pop(call_sid, None)
+        if call is None:
+            if not create or call_sid in self._finished:
+                return False
+            call = self._new_call()
+        if phone_number and not call["phone_number"]:
+            call["phone_number"] = phone_number
+        self._finished[call_sid] = None
+        if len(self._finished) > FINISHED_CALLS_REMEMBERED:
+            del self._finished[next(iter(self._finished))]
+        row = {
+            "phone_number": call["phone_number"],
+            "transcript": "\n".join(f"{speaker}: {text}" for speaker, text in call["turns"]),
+            "booking_time": call["booking_time"],
+            "status": call["status"] or status,
+            "call_timestamp": call["started_at"],
+        }
+        self.stats["finished"] += 1
+        if not self.writer.write_nowait(row):
+            # Writer queue full: the retry worker inserts it instead; a finished call is never dropped
+            log.warning("Call writer queue full, queued %s for retry", call_sid)
+            self.retry_queue.push([row])
+            self.stats["queued_for_retry"] += 1
+        return True
+
+    def finish_idle(self, max_idle=CALL_IDLE_TIMEOUT, status="abandoned"):
+        cutoff = time.monotonic() - max_idle
+        stale = [sid for sid, call in self._calls.items() if call["last_activity"] <= cutoff]
+        for sid in stale:
+            self.finish_call(sid, status=status)
+        return len(stale)
+
+    def _insert(self, rows):
+        try:
+            self.backend.insert(rows)
+            self.stats["inserted"] += len(rows)
+        except Exception as e:
+            log.warning("Insert of %d rows failed, queued for retry: %s", len(rows), e)
+            self.retry_queue.push(rows)
+            self.stats["queued_for_retry"] += len(rows)
+
+    def retry_pending(self, limit=CALLS_BATCH_SIZE):
+        """
+        One pass over the retry queue; runs in a worker thread.
+        """
+        pending = self.retry_queue.due(limit)
+        if not pending:
+            return 0
+        ids = [row_id for row_id, _, _ in pending]
+        try:
+            self.backend.insert([row for _, row, _ in pending])
+        except Exception as e:
+            log.warning("Retry of %d rows failed: %s", len(pending), e)
+            self.retry_queue.backoff(ids, max(attempts for _, _, attempts in pending))
+            return 0
+        self.retry_queue.ack(ids)
+        self.stats["retried"] += len(pending)
+        return len(pending)
+
+    async def run_retry_worker(self, interval=CALLS_RETRY_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.finish_idle()
+            try:
+                while await asyncio.to_thread(self.retry_pending):
+                    pass
+            except sqlite3.Error as e:
+                log.error("Retry queue error: %s", e)
+
+    def in_progress(self):
+        """
+        Calls this process has seen start (or take a turn) and not yet finish.
+        """
+        return len(self._calls)
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "backend": type(self.backend).__name__,
+            "in_progress": self.in_progress(),
+            "retry_queue": len(self.retry_queue),
+            "writer": dict(self.writer.stats),
+        }
+
+
+def create_calls_backend(kind=CALLS_BACKEND):
+    if kind == "supabase":
+        return SupabaseCallsBackend()
+    if kind == "sqlite":
+        return SQLiteCallsBackend()
+    raise ValueError(f"Unknown CALLS_BACKEND: {kind}")
+
+
+CALL_RECORDER = CallRecorder(create_calls_backend(), RetryQueue())
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# SQLite stores, lock files and logs use relative paths; keep them out of the tree
+os.chdir(tempfile.mkdtemp(prefix="chronos-tests-"))
+# No real upstreams: the REST adapter instead of the Gemini SDK (which warms up over the network),
+# no background prefetches or scheduler
+os.environ.setdefault("GEMINI_BASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("AGENT_PREFETCH_AVAILABILITY", "0")
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+os.environ.setdefault("CALLS_BACKEND", "sqlite")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
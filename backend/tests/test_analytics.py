@@ -0,0 +1,68 @@
+import sqlite3
+from core.analytics import DailyRollups
+
+DAY = "2025-07-01"
+
+
+def test_flush_is_additive_across_workers(tmp_path):
+    path = str(tmp_path / "analytics.sqlite3")
+    worker_a, worker_b = DailyRollups(path), DailyRollups(path)
+    worker_a.incr("calls", day=DAY)
+    worker_a.incr("intent:book_call", 2, day=DAY)
+    worker_b.incr("calls", 3, day=DAY)
+    assert worker_a.flush() == 2
+    assert worker_b.flush() == 1
+    worker_a.incr("calls", day=DAY)
+    worker_a.flush()
+    assert worker_b.counters(DAY) == {"calls": 5, "intent:book_call": 2}
+
+
+def test_empty_flush_writes_nothing(tmp_path):
+    rollups = DailyRollups(str(tmp_path / "analytics.sqlite3"))
+    assert rollups.flush() == 0
+    assert rollups.counters(DAY) == {}
+
+
+def test_counters_include_unflushed_deltas(tmp_path):
+    rollups = DailyRollups(str(tmp_path / "analytics.sqlite3"))
+    rollups.incr("turns", 2, day=DAY)
+    rollups.flush()
+    rollups.incr("turns", day=DAY)
+    rollups.incr("turns", day="2025-07-02")
+    assert rollups.counters(DAY) == {"turns": 3}
+    assert rollups.counters("2025-07-02") == {"turns": 1}
+
+
+def test_failed_flush_keeps_the_deltas(tmp_path):
+    rollups = DailyRollups(str(tmp_path / "analytics.sqlite3"))
+    rollups.incr("calls", day=DAY)
+    real_db = rollups._db
+
+    class BrokenDB:
+        def executemany(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+    rollups._db = BrokenDB()
+    assert rollups.flush() == 0
+    rollups.incr("calls", day=DAY)
+    rollups._db = real_db
+    assert rollups.flush() == 1
+    assert rollups.counters(DAY) == {"calls": 2}
+
+
+def test_snapshot_reports_cumulative_latency_buckets(tmp_path):
+    rollups = DailyRollups(str(tmp_path / "analytics.sqlite3"))
+    for ms in (80, 300, 300, 9000):
+        rollups.observe_latency(ms, day=DAY)
+    rollups.incr("booking:success", day=DAY)
+    rollups.incr("router_skip:junk_message", day=DAY)
+    snapshot = rollups.snapshot(DAY)
+    latency = snapshot["turn_latency_ms"]
+    assert latency["count"] == 4
+    assert latency["avg"] == 2420.0
+    assert latency["buckets"]["le_100"] == 1
+    assert latency["buckets"]["le_250"] == 1
+    assert latency["buckets"]["le_500"] == 3
+    assert latency["buckets"]["le_8000"] == 3
+    assert latency["buckets"]["le_inf"] == 4
+    assert snapshot["bookings"] == {"success": 1, "failure": 0}
+    assert snapshot["router_skips"] == {"junk_message": 1}
@@ -0,0 +1,164 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core import agent
+from core.analytics import ANALYTICS
+from routes import voice
+from services.assembly import SpeechStartDetector
+from services.twilio_media import TwilioMediaPlayer
+
+
+def test_first_partial_of_each_utterance_signals_speech():
+    speech = SpeechStartDetector(min_words=1)
+    assert speech.update("partial", "wait")
+    assert not speech.update("partial", "wait a")  # same utterance
+    assert not speech.update("final", "Wait a second.")
+    assert speech.update("partial", "actually")  # next utterance
+
+
+def test_short_partials_and_silence_are_ignored():
+    speech = SpeechStartDetector(min_words=2)
+    assert not speech.update("partial", "")
+    assert not speech.update("partial", "uh")
+    assert speech.update("partial", "uh wait")
+    assert not speech.update(None, "")
+    assert not speech.update("end", "")
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def test_clear_drops_pending_playback():
+    async def run():
+        ws = FakeWebSocket()
+        player = TwilioMediaPlayer(ws, "MZ1")
+
+        async def audio():
+            yield b"\xff" * 480
+        name = await player.play(audio())
+        assert player.is_playing
+        await player.clear()
+        assert not player.is_playing
+        # Twilio still echoes the cleared mark; it must not confuse the next reply
+        player.on_mark(name)
+        assert not player.is_playing
+        return [message["event"] for message in ws.sent]
+    assert asyncio.run(run()) == ["media", "media", "media", "mark", "clear"]
+
+
+def test_cancelled_play_closes_the_tts_stream():
+    closed = []
+
+    async def run():
+        player = TwilioMediaPlayer(FakeWebSocket(), "MZ1")
+
+        async def audio():
+            try:
+                while True:
+                    yield b"\xff" * 160
+                    await asyncio.sleep(0.01)
+            finally:
+                closed.append(True)
+        task = asyncio.create_task(player.play(audio()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not player.is_playing
+    asyncio.run(run())
+    assert closed == [True]
+
+
+class FakeAssemblyAI:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def send(self, frame):
+        pass
+
+    async def close(self):
+        pass
+
+    async def __aiter__(self):
+        for delay, message in self.messages:
+            await asyncio.sleep(delay)
+            yield json.dumps(message)
+        await asyncio.Event().wait()
+
+
+def test_caller_speech_cancels_the_running_turn(monkeypatch):
+    aai = FakeAssemblyAI([
+        (0.05, {"message_type": "FinalTranscript", "text": "book me a call"}),
+        (0.1, {"message_type": "PartialTranscript", "text": "wait actually"}),
+    ])
+    turn = {}
+
+    class Sessions:
+        @asynccontextmanager
+        async def session(self):
+            yield aai
+
+    async def slow_agent_loop(text, session_id, synthesize):
+        turn["started"] = True
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            turn["cancelled"] = True
+            raise
+
+    async def greeting(text, **kwargs):
+        yield b"\xff" * 160
+
+    async def fake_load_session_state(call_sid):
+        return {}
+    monkeypatch.setattr(voice, "STT_SESSIONS", Sessions())
+    monkeypatch.setattr(voice, "agent_loop", slow_agent_loop)
+    monkeypatch.setattr(voice, "speak_stream", greeting)
+    monkeypatch.setattr(voice, "load_session_state", fake_load_session_state)
+    barge_ins = ANALYTICS.counters().get("barge_ins", 0)
+    app = FastAPI()
+    app.include_router(voice.router)
+    with TestClient(app) as client, client.websocket_connect("/twilio/stream") as ws:
+        ws.send_text(json.dumps({"event": "start", "streamSid": "MZ1", "start": {"callSid": "CAbarge"}}))
+        events = []
+        while "clear" not in events:
+            message = json.loads(ws.receive_text())
+            events.append(message["event"])
+            if message["event"] == "mark":
+                ws.send_text(json.dumps({"event": "mark", "mark": message["mark"]}))
+        ws.send_text(json.dumps({"event": "stop"}))
+    assert turn == {"started": True, "cancelled": True}
+    assert ANALYTICS.counters().get("barge_ins", 0) == barge_ins + 1
+
+
+def test_detached_booking_releases_booking_pending(monkeypatch):
+    saved = []
+    state = {"booking_pending": True}
+    monkeypatch.setattr(agent, "get_session_state", lambda session_id: state)
+    monkeypatch.setattr(agent, "save_session_state", saved.append)
+    monkeypatch.setattr(agent.CALL_RECORDER, "set_booking", lambda *args: None)
+    contact = {"name": "Vaishakh"}
+
+    async def run(outcome):
+        async def book():
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        task = asyncio.ensure_future(book())
+        await asyncio.wait({task})
+        agent._record_detached_booking(task, "CA1", "2025-07-01T15:00:00Z", contact)
+    asyncio.run(run({"uid": "bk_1"}))
+    assert state["booking_pending"] is False
+    assert state["last_booking"]["slot"] == "2025-07-01T15:00:00Z"
+    state.update(booking_pending=True, last_booking=None)
+    asyncio.run(run(RuntimeError("Cal.com 500")))
+    assert state["booking_pending"] is False and state["last_booking"] is None
+    assert len(saved) == 2
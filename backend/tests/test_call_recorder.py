@@ -0,0 +1,73 @@
+import sqlite3
+import pytest
+import supabase_client
+from supabase_client import CallRecorder, SQLiteCallsBackend, RetryQueue
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    return CallRecorder(SQLiteCallsBackend(str(tmp_path / "calls.sqlite3")), RetryQueue(str(tmp_path / "retry.sqlite3")))
+
+
+def rows(recorder):
+    with recorder.backend._lock:
+        return recorder.backend._db.execute(
+            "SELECT phone_number, transcript, status FROM calls ORDER BY id"
+        ).fetchall()
+
+
+def test_call_is_written_once_at_hangup(recorder):
+    recorder.start_call("CA1", "+15550001")
+    recorder.add_turn("CA1", "Book me in", "Done")
+    assert recorder.finish_call("CA1")
+    assert rows(recorder) == [("+15550001", "Caller: Book me in\nAgent: Done", "completed")]
+    assert recorder.in_progress() == 0
+
+
+def test_finishing_twice_writes_one_row(recorder):
+    # The media stream ends, then Twilio's status callback arrives
+    recorder.start_call("CA1", "+15550001")
+    recorder.add_turn("CA1", "Hi", "Hello")
+    assert recorder.finish_call("CA1")
+    assert not recorder.finish_call("CA1", status="completed", create=False)
+    assert not recorder.finish_call("CA1", status="completed", phone_number="+15550001", create=True)
+    assert len(rows(recorder)) == 1
+    assert recorder.stats["finished"] == 1
+    assert recorder.in_progress() == 0
+
+
+def test_unanswered_call_gets_a_row(recorder):
+    assert recorder.finish_call("CA2", status="no-answer", phone_number="+15550002", create=True)
+    assert not recorder.finish_call("CA2", status="no-answer", phone_number="+15550002", create=True)
+    assert rows(recorder) == [("+15550002", "", "no-answer")]
+
+
+def test_unknown_call_is_not_created_by_default(recorder):
+    assert not recorder.finish_call("CA3")
+    assert rows(recorder) == []
+
+
+def test_booking_status_wins_over_hangup_status(recorder):
+    recorder.set_booking("CA4", "2025-07-01T15:00:00Z")
+    recorder.finish_call("CA4", status="completed")
+    assert rows(recorder)[0][2] == "booked"
+
+
+def test_finished_calls_are_forgotten_oldest_first(recorder, monkeypatch):
+    monkeypatch.setattr(supabase_client, "FINISHED_CALLS_REMEMBERED", 2)
+    for sid in ("CA1", "CA2", "CA3"):
+        recorder.finish_call(sid, create=True)
+    assert list(recorder._finished) == ["CA2", "CA3"]
+
+
+def test_failed_insert_goes_to_the_retry_queue(recorder):
+    class Down:
+        def insert(self, rows):
+            raise sqlite3.OperationalError("database is locked")
+    backend, recorder.backend = recorder.backend, Down()
+    recorder.start_call("CA5")
+    recorder.finish_call("CA5")
+    assert len(recorder.retry_queue) == 1
+    recorder.backend = backend
+    assert recorder.retry_pending() == 1
+    assert len(rows(recorder)) == 1 and len(recorder.retry_queue) == 0
@@ -0,0 +1,199 @@
+import time
+import asyncio
+import httpx
+import pytest
+from services import circuit_breaker, tts
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN, fallback_reply
+from services.tts_cache import TTSCache, tts_cache_key
+
+
+@pytest.fixture(autouse=True)
+def shared_state(tmp_path, monkeypatch):
+    """
+    A fresh shared-state file per test, read on every call (no cached view).
+    """
+    state = circuit_breaker._SharedState(str(tmp_path / "breakers.sqlite3"))
+    monkeypatch.setattr(circuit_breaker, "_shared", state)
+    monkeypatch.setattr(circuit_breaker, "BREAKER_STATE_REFRESH", 0)
+    return state
+
+
+def make_breaker(name="upstream", **kwargs):
+    options = {"min_calls": 4, "error_rate": 0.5, "window": 30.0, "open_seconds": 0.05}
+    options.update(kwargs)
+    return CircuitBreaker(name, **options)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record_failure(0.01)
+
+
+def test_stays_closed_below_min_calls_and_error_rate():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure(0.01)
+    assert breaker.state == CLOSED
+    fresh = make_breaker("fresh")
+    for _ in range(4):
+        fresh.record_success(0.01)
+    for _ in range(3):
+        fresh.record_failure(0.01)  # 3/7 failed
+    assert fresh.state == CLOSED and fresh.allow()
+
+
+def test_opens_on_error_rate_and_rejects():
+    breaker = make_breaker()
+    trip(breaker)
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.stats["trips"] == 1 and breaker.stats["rejections"] == 1
+
+
+def test_opens_on_slow_calls():
+    breaker = make_breaker(latency_threshold=1.0, slow_rate=0.5)
+    for latency in (2.0, 2.0, 0.1, 0.1):
+        breaker.record_success(latency)
+    assert breaker.state == OPEN
+
+
+def test_hard_failure_trips_immediately():
+    breaker = make_breaker()
+    breaker.record_failure(trip=True)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success(0.01)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure(0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_slow_probe_reopens():
+    breaker = make_breaker(latency_threshold=1.0)
+    trip(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success(2.0)
+    assert breaker.state == OPEN
+
+
+def test_state_is_shared_between_workers():
+    worker_a, worker_b = make_breaker("calcom"), make_breaker("calcom")
+    trip(worker_a)
+    assert worker_b.state == OPEN
+    assert not worker_b.allow()
+    assert make_breaker("other").allow()
+
+
+def test_only_one_worker_wins_the_probe():
+    worker_a, worker_b = make_breaker("calcom"), make_breaker("calcom")
+    trip(worker_a)
+    time.sleep(0.06)
+    assert [worker_a.allow(), worker_b.allow()] == [True, False]
+    worker_a.record_success(0.01)
+    assert worker_b.allow()
+
+
+def test_claim_probe(shared_state):
+    now = time.time()
+    shared_state.write("x", OPEN, now + 10)
+    assert not shared_state.claim_probe("x", now, stale_after=30)  # still open
+    assert shared_state.claim_probe("x", now + 10, stale_after=30)
+    assert not shared_state.claim_probe("x", now + 10, stale_after=30)  # already half-open
+    # A probe owner that went quiet is taken over once its claim is stale
+    assert shared_state.claim_probe("x", now + 10 + 31, stale_after=30)
+    assert not shared_state.claim_probe("missing", now, stale_after=30)
+
+
+def test_guard_records_outcomes_and_raises_when_open():
+    breaker = make_breaker()
+
+    async def call(fail):
+        async with breaker.guard():
+            if fail:
+                raise RuntimeError("upstream down")
+
+    async def run():
+        for _ in range(breaker.min_calls):
+            with pytest.raises(RuntimeError):
+                await call(True)
+        with pytest.raises(CircuitOpenError):
+            await call(False)
+    asyncio.run(run())
+    assert breaker.stats["failures"] == 4
+
+
+def test_cancelled_probe_is_released():
+    breaker = make_breaker()
+    trip(breaker)
+    time.sleep(0.06)
+
+    async def run():
+        async def probe():
+            async with breaker.guard():
+                await asyncio.sleep(10)
+        task = asyncio.create_task(probe())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+    # Released without an outcome: the next call may probe straight away
+    assert breaker.allow()
+
+
+def test_every_breaker_has_a_fallback_reply():
+    for name in circuit_breaker.BREAKERS:
+        assert fallback_reply(name)
+
+
+# --- Deepgram fallback in speak_stream ---
+FALLBACK_AUDIO = b"\x01\x02" * 400
+
+
+@pytest.fixture
+def tts_cache(tmp_path, monkeypatch):
+    cache = TTSCache(directory=str(tmp_path))
+    monkeypatch.setattr(tts, "TTS_CACHE", cache)
+    key = tts_cache_key(fallback_reply("deepgram"), tts.TTS_MODEL, "mulaw", 8000, "none")
+    cache.put(key, FALLBACK_AUDIO, "none")
+    return cache
+
+
+def collect(text):
+    async def run():
+        return b"".join([chunk async for chunk in tts.speak_stream(
+            text, encoding="mulaw", sample_rate=8000, container="none", chunk_size=160)])
+    return asyncio.run(run())
+
+
+def test_open_deepgram_breaker_streams_the_cached_fallback(tts_cache, monkeypatch):
+    monkeypatch.setattr(tts, "DEEPGRAM_BREAKER", make_breaker("deepgram-open", open_seconds=60))
+    trip(tts.DEEPGRAM_BREAKER)
+    assert collect("Your call is booked for 3pm.") == FALLBACK_AUDIO
+
+
+def test_deepgram_error_streams_the_cached_fallback(tts_cache, monkeypatch):
+    monkeypatch.setattr(tts, "DEEPGRAM_BREAKER", make_breaker("deepgram-error"))
+    transport = httpx.MockTransport(lambda request: httpx.Response(503, text="overloaded"))
+    monkeypatch.setattr(tts, "_get_async_client", lambda: httpx.AsyncClient(transport=transport))
+    assert collect("Your call is booked for 3pm.") == FALLBACK_AUDIO
+    assert tts.DEEPGRAM_BREAKER.stats["failures"] == 1
@@ -0,0 +1,83 @@
+import pytest
+from services import caldotcom
+from services.caldotcom import parse_duration_minutes, lookup_event_type_id, get_event_type_id_by_duration
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("15m", 15),
+    ("30 min", 30),
+    ("15min", 15),
+    ("thirty mins", 30),
+    ("45", 45),
+    (45, 45),
+    ("45-minute", 45),
+    ("15-minute call", 15),
+    ("forty-five minutes", 45),
+    ("forty five minutes", 45),
+    ("forty-five-minute meeting", 45),
+    ("1 hour", 60),
+    ("an hour", 60),
+    ("an hr", 60),
+    ("2h", 120),
+    ("1.5 hours", 90),
+    ("1h30m", 90),
+    ("1 hour 30 minutes", 90),
+    ("half an hour", 30),
+    ("half-hour", 30),
+    ("a half hour call", 30),
+    ("quarter of an hour", 15),
+    ("an hour and a half", 90),
+    ("hour and a half", 90),
+    ("two and a half hours", 150),
+    ("I'm free for a 30-minute chat", 30),
+    ("9 am for 30 minutes", 30),
+])
+def test_parses_durations(text, minutes):
+    assert parse_duration_minutes(text) == minutes
+
+
+@pytest.mark.parametrize("text", [
+    None, "", "null", "unknown", 0, "sometime", "book a meeting",
+    # Times of day are not durations
+    "9 am", "10am", "at 3 pm", "ham",
+])
+def test_rejects_non_durations(text):
+    assert parse_duration_minutes(text) is None
+
+
+@pytest.fixture
+def event_type_index(monkeypatch):
+    index = caldotcom._build_event_type_index([
+        {"id": 1, "length": 15, "slug": "quick-chat", "title": "Quick chat"},
+        {"id": 2, "length": 30, "slug": "intro-call", "title": "Intro call"},
+        {"id": 3, "lengthInMinutes": 90, "slug": "deep-dive", "title": "Deep dive"},
+        {"id": 4, "length": 30, "slug": "second-30", "title": "Second 30"},
+    ])
+    monkeypatch.setattr(caldotcom, "EVENT_TYPE_INDEX", index)
+    return index
+
+
+@pytest.mark.parametrize("duration, slug, expected", [
+    ("15-minute", None, 1),
+    ("half an hour", None, 2),  # first event type of a length wins
+    ("an hour and a half", None, 3),
+    ("2 hours", None, None),
+    ("Deep dive", None, 3),
+    (None, "intro-call", 2),
+    ("9 am", None, None),
+])
+def test_lookup_event_type_id(event_type_index, duration, slug, expected):
+    assert lookup_event_type_id(duration, slug=slug) == expected
+
+
+def test_cold_index_never_fetches_on_the_event_loop(monkeypatch):
+    import asyncio
+    monkeypatch.setattr(caldotcom, "EVENT_TYPE_INDEX", {"by_length": {}, "by_slug": {}, "by_name": {}, "refreshed_at": 0.0})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("blocking request on the event loop")
+    monkeypatch.setattr(caldotcom.requests, "get", fail)
+
+    async def lookup():
+        return get_event_type_id_by_duration("30m")
+    assert asyncio.run(lookup()) is None
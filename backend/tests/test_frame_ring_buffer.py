@@ -0,0 +1,97 @@
+import numpy as np
+from services.audio import FrameRingBuffer, TwilioAudioFrontend, PolyphaseUpsampler, frame_bytes
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_frame_bytes():
+    assert frame_bytes(50) == 1600
+    assert frame_bytes(20, sample_rate=8000, sample_width=1) == 160
+
+
+def test_reframes_arbitrary_chunks():
+    ring = FrameRingBuffer(frame_size=4, capacity_frames=4)
+    stream = bytes(range(30))
+    out = []
+    for chunk in chunks(stream, 3):
+        ring.write(chunk)
+        out.extend(bytes(frame) for frame in ring.frames())
+    assert b"".join(out) == stream[:28]
+    assert all(len(frame) == 4 for frame in out)
+    assert ring.drain() == stream[28:]
+    assert len(ring) == 0 and ring.dropped == 0
+
+
+def test_writes_wrap_around_the_end():
+    ring = FrameRingBuffer(frame_size=4, capacity_frames=3)
+    ring.write(b"aaaabbbb")
+    assert bytes(ring.pop_frame()) == b"aaaa"
+    assert bytes(ring.pop_frame()) == b"bbbb"
+    ring.write(b"ccccdd")  # starts at offset 8: the tail wraps to the front
+    assert bytes(ring.pop_frame()) == b"cccc"
+    assert ring.pop_frame() is None
+    ring.write(b"dd")
+    assert bytes(ring.pop_frame()) == b"dddd"
+    assert ring.dropped == 0
+
+
+def test_drain_joins_a_wrapped_partial_frame():
+    ring = FrameRingBuffer(frame_size=4, capacity_frames=2)
+    ring.write(b"xxxx")
+    ring.pop_frame()
+    ring.write(b"abcd")
+    ring.pop_frame()
+    ring.write(b"ef")
+    assert ring.drain() == b"ef"
+    ring.write(b"1234ab")
+    ring.pop_frame()
+    ring.write(b"cd12")  # "ab" + "cd" + "12" spans the end of the ring
+    assert bytes(ring.pop_frame()) == b"abcd"
+    assert ring.drain() == b"12"
+
+
+def test_overflow_drops_the_oldest_frames():
+    ring = FrameRingBuffer(frame_size=4, capacity_frames=2)
+    ring.write(b"aaaabbbb")
+    ring.write(b"cc")
+    assert ring.dropped == 1
+    assert bytes(ring.pop_frame()) == b"bbbb"
+    ring.write(b"cc")
+    assert bytes(ring.pop_frame()) == b"cccc"
+
+
+def test_chunk_larger_than_the_ring_keeps_the_newest_frames():
+    ring = FrameRingBuffer(frame_size=4, capacity_frames=2)
+    ring.write(b"zz")
+    ring.write(b"aaaabbbbccccdd")
+    # The skipped prefix is rounded up to whole frames, so "ccccdd" is kept; the buffered "zz"
+    # and the skipped 8 bytes count as 2 dropped frames
+    assert ring.dropped == 2
+    assert bytes(ring.pop_frame()) == b"cccc"
+    assert ring.drain() == b"dd"
+
+
+def test_accepts_int16_arrays():
+    ring = FrameRingBuffer(frame_size=frame_bytes(10))
+    samples = np.arange(240, dtype=np.int16)
+    ring.write(samples)
+    frame = ring.pop_frame()
+    assert np.frombuffer(frame, dtype=np.int16).tolist() == list(range(160))
+    assert len(ring) == 160
+
+
+def test_upsampler_is_packet_boundary_independent():
+    rng = np.random.default_rng(0)
+    pcm = rng.integers(-8000, 8000, 1600).astype(np.int16)
+    whole = PolyphaseUpsampler().process(pcm)
+    streamed = PolyphaseUpsampler()
+    packets = np.concatenate([streamed.process(packet) for packet in chunks(pcm, 160)])
+    assert len(whole) == 3200
+    assert np.array_equal(whole, packets)
+
+
+def test_frontend_turns_a_twilio_packet_into_16k_pcm():
+    frontend = TwilioAudioFrontend()
+    assert frontend.process(b"\xff" * 160).shape == (320,)
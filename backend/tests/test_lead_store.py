@@ -0,0 +1,58 @@
+import json
+import threading
+from datetime import datetime
+from core.lead_store import LeadStore
+
+
+def write_legacy_log(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "timestamp": f"2025-07-01T10:{i:02d}:00Z",
+                "session_id": f"CA{i}",
+                "qualification": {"qualified": i % 2 == 0},
+            }) + "\n")
+
+
+def test_legacy_log_is_imported_once(tmp_path):
+    legacy = str(tmp_path / "daily_log.jsonl")
+    write_legacy_log(legacy, 5)
+    db = str(tmp_path / "leads.sqlite3")
+    first = LeadStore(db, legacy_log=legacy)
+    since = datetime(2025, 7, 1)
+    assert first.count(since) == 5
+    assert first.count(since, qualified_only=True) == 3
+    # A restart (or a second worker) finds the marker and skips the import
+    LeadStore(db, legacy_log=legacy)
+    assert first.count(since) == 5
+
+
+def test_concurrent_workers_import_once(tmp_path):
+    legacy = str(tmp_path / "daily_log.jsonl")
+    write_legacy_log(legacy, 20)
+    db = str(tmp_path / "leads.sqlite3")
+    LeadStore(db, legacy_log=None)  # create the schema before the race
+    errors = []
+
+    def worker():
+        try:
+            LeadStore(db, legacy_log=legacy)
+        except Exception as exc:
+            errors.append(exc)
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert LeadStore(db, legacy_log=None).count(datetime(2025, 7, 1)) == 20
+
+
+def test_existing_leads_are_not_reimported(tmp_path):
+    legacy = str(tmp_path / "daily_log.jsonl")
+    write_legacy_log(legacy, 3)
+    db = str(tmp_path / "leads.sqlite3")
+    store = LeadStore(db, legacy_log=None)
+    store([{"timestamp": "2025-07-02T09:00:00Z", "session_id": "CAnew", "qualification": {"qualified": True}}])
+    LeadStore(db, legacy_log=legacy)
+    assert store.count(datetime(2025, 7, 1)) == 1
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from core.tracing import TRACER, begin_turn, end_turn, render_prometheus
+from services import llm_gateway
+from services.llm_cache import LLMCache
+
+
+class FakeModel:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return type("Response", (), {"text": f"  reply to {prompt}  "})()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(llm_gateway, "_model", fake)
+    return fake
+
+
+def gemini_samples():
+    return TRACER.snapshot().get("gemini", (None, 0.0, 0))[2]
+
+
+def test_only_upstream_calls_are_timed(model):
+    cache = LLMCache(namespace="test-timing", db_path="")
+    stats = dict(llm_gateway.GATEWAY_STATS)
+    samples = gemini_samples()
+
+    async def run():
+        # Three identical concurrent prompts share one request...
+        replies = await asyncio.gather(*(llm_gateway.generate("hello", cache=cache) for _ in range(3)))
+        # ...and the next one is a cache hit
+        replies.append(await llm_gateway.generate("hello", cache=cache))
+        return replies
+    assert asyncio.run(run()) == ["reply to hello"] * 4
+    assert model.calls == 1
+    assert gemini_samples() == samples + 1
+    delta = {key: llm_gateway.GATEWAY_STATS[key] - stats[key] for key in stats}
+    assert delta["requests"] == 1 and delta["coalesced"] == 2 and delta["cache_hits"] == 1
+
+
+def test_upstream_call_lands_in_the_callers_turn(model):
+    async def run():
+        trace = begin_turn("CAgateway")
+        try:
+            await llm_gateway.generate("turn prompt")
+        finally:
+            end_turn(trace)
+        return trace
+    trace = asyncio.run(run())
+    assert [name for name, _ in trace.stages] == ["gemini"]
+
+
+def test_cancelled_request_is_not_a_sample(model):
+    model.delay = 10
+    samples = gemini_samples()
+
+    async def run():
+        task = asyncio.create_task(llm_gateway.generate("slow prompt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.01)
+    asyncio.run(run())
+    assert gemini_samples() == samples
+
+
+def test_counters_are_rendered():
+    text = render_prometheus({}, {"chronos_gemini_coalesced_total": ("Joined requests.", 2)})
+    assert "# TYPE chronos_gemini_coalesced_total counter\nchronos_gemini_coalesced_total 2\n" in text
@@ -0,0 +1,116 @@
+import asyncio
+import fcntl
+import os
+from datetime import datetime, timezone
+import pytest
+from scheduler import CronTrigger, IntervalTrigger, Scheduler, _parse_cron_field
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 5, [0, 1, 2, 3, 4, 5]),
+    ("*/15", 0, 59, [0, 15, 30, 45]),
+    ("1-3,7", 0, 10, [1, 2, 3, 7]),
+    ("5/20", 0, 59, [5, 25, 45]),
+    ("9", 0, 23, [9]),
+])
+def test_parse_cron_field(field, low, high, expected):
+    assert _parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("field", ["60", "5-2", "-1"])
+def test_parse_cron_field_rejects_out_of_range(field):
+    with pytest.raises(ValueError):
+        _parse_cron_field(field, 0, 59)
+
+
+@pytest.mark.parametrize("expression, now, expected", [
+    # 22:00 IST is 16:30 UTC
+    ("0 22 * * *", utc(2025, 7, 1, 12, 0), utc(2025, 7, 1, 16, 30)),
+    ("0 22 * * *", utc(2025, 7, 1, 16, 30), utc(2025, 7, 2, 16, 30)),
+    # 00:30 IST on the 2nd is still the 1st in UTC
+    ("30 0 * * *", utc(2025, 7, 1, 12, 0), utc(2025, 7, 1, 19, 0)),
+    # Mondays at 09:00 IST; 2025-07-01 is a Tuesday
+    ("0 9 * * 1", utc(2025, 7, 1, 12, 0), utc(2025, 7, 7, 3, 30)),
+    # Day 7 is Sunday too
+    ("0 9 * * 7", utc(2025, 7, 1, 12, 0), utc(2025, 7, 6, 3, 30)),
+    # Day-of-month and day-of-week both restricted: either matches (the 5th is a Saturday)
+    ("0 9 5 * 1", utc(2025, 7, 1, 12, 0), utc(2025, 7, 5, 3, 30)),
+    ("*/30 * * * *", utc(2025, 7, 1, 12, 10), utc(2025, 7, 1, 12, 30)),
+])
+def test_cron_matches_in_kolkata(expression, now, expected):
+    assert CronTrigger(expression, "Asia/Kolkata").next_fire(now) == expected
+
+
+def test_cron_rejects_bad_expressions():
+    with pytest.raises(ValueError):
+        CronTrigger("0 22 * *")
+    with pytest.raises(ValueError):
+        CronTrigger("0 22 30 2 *").next_fire(utc(2025, 7, 1))
+
+
+def test_interval_fire_times_are_aligned():
+    trigger = IntervalTrigger(60)
+    assert trigger.next_fire(125.0) == 180
+    assert trigger.next_fire(180.0) == 240
+
+
+def make_scheduler(tmp_path):
+    scheduler = Scheduler(lock_dir=str(tmp_path / "locks"))
+    runs = []
+
+    async def digest():
+        runs.append(1)
+    job = scheduler.every("digest", 60, digest)
+    return scheduler, job, runs
+
+
+def test_exclusive_job_runs_once_per_fire_time(tmp_path):
+    worker_a, job_a, runs = make_scheduler(tmp_path)
+    worker_b, job_b, _ = make_scheduler(tmp_path)
+    job_b.func = job_a.func
+
+    async def run():
+        assert await worker_a.run_job(job_a, 120.0)
+        assert not await worker_b.run_job(job_b, 120.0)  # fire time already taken
+        assert await worker_b.run_job(job_b, 180.0)
+    asyncio.run(run())
+    assert len(runs) == 2
+    assert job_b.stats["skipped"] == 1
+
+
+def test_held_lock_skips_the_run(tmp_path):
+    scheduler, job, runs = make_scheduler(tmp_path)
+    os.makedirs(scheduler.lock_dir)
+    with open(os.path.join(scheduler.lock_dir, "digest.lock"), "a+") as held:
+        fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert not asyncio.run(scheduler.run_job(job, 120.0))
+    assert not runs
+    assert asyncio.run(scheduler.run_job(job, 120.0))
+    assert runs == [1]
+
+
+def test_non_exclusive_jobs_run_in_every_worker(tmp_path):
+    worker_a, job_a, runs = make_scheduler(tmp_path)
+    worker_b, job_b, _ = make_scheduler(tmp_path)
+    job_b.func = job_a.func
+    job_a.exclusive = job_b.exclusive = False
+
+    async def run():
+        await worker_a.run_job(job_a, 120.0)
+        await worker_b.run_job(job_b, 120.0)
+    asyncio.run(run())
+    assert len(runs) == 2
+
+
+def test_failures_are_recorded(tmp_path):
+    scheduler = Scheduler(lock_dir=str(tmp_path / "locks"))
+
+    async def broken():
+        raise RuntimeError("smtp down")
+    job = scheduler.every("broken", 60, broken)
+    assert asyncio.run(scheduler.run_job(job, 60.0))
+    assert job.stats["failures"] == 1 and job.stats["last_error"] == "smtp down"
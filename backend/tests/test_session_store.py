@@ -0,0 +1,119 @@
+import time
+import asyncio
+import threading
+import pytest
+from core.session_store import SessionRecord, InMemorySessionStore, SQLiteSessionStore
+
+
+def test_record_only_accepts_declared_fields():
+    record = SessionRecord("CA1")
+    record["last_intent"] = "book_call"
+    assert record.get("last_intent") == "book_call"
+    assert record.get("qualified", "unknown") == "unknown"
+    assert record.get("not_a_field", 1) == 1
+    with pytest.raises(KeyError):
+        record["last_intnet"] = "typo"
+
+
+def test_idle_sessions_expire():
+    store = InMemorySessionStore(idle_ttl=60, max_sessions=100)
+    old, _ = store.get_or_create("CAold")
+    store.get_or_create("CAnew")
+    old.last_seen -= 61
+    store.evict_expired()
+    assert store.get("CAold") is None
+    assert store.get("CAnew") is not None
+    assert store.evictions == 1
+
+
+def test_least_recently_seen_session_is_evicted_at_capacity():
+    store = InMemorySessionStore(idle_ttl=3600, max_sessions=2)
+    store.get_or_create("CA1")
+    store.get_or_create("CA2")
+    store.get_or_create("CA1")  # touch: CA2 is now least recently seen
+    store.get_or_create("CA3")
+    assert store.get("CA2") is None
+    assert store.get("CA1") is not None and store.get("CA3") is not None
+    assert len(store) == 2
+
+
+def test_get_or_create_reports_creation_once():
+    store = InMemorySessionStore()
+    first, created = store.get_or_create("CA1")
+    again, created_again = store.get_or_create("CA1")
+    assert created and not created_again
+    assert first is again
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+def test_sqlite_round_trip_between_workers(db_path):
+    async def run():
+        worker_a = SQLiteSessionStore(db_path, flush_interval=0.01)
+        worker_b = SQLiteSessionStore(db_path, flush_interval=0.01)
+        record, created = await worker_a.load("CA1")
+        assert created
+        record["last_intent"] = "book_call"
+        record["errors"].append("slow calendar")
+        record["last_intent_result"] = ("book_call", "tomorrow", "30m")
+        worker_a.save(record)
+        await worker_a.writer.flush()
+        other, created = await worker_b.load("CA1")
+        assert not created
+        assert other["last_intent"] == "book_call"
+        assert other["errors"] == ["slow calendar"]
+        assert other["last_intent_result"] == ("book_call", "tomorrow", "30m")
+        await worker_a.writer.close()
+        await worker_b.writer.close()
+    asyncio.run(run())
+
+
+def test_first_touch_on_another_worker_does_not_clobber_state(db_path):
+    async def run():
+        worker_a = SQLiteSessionStore(db_path, flush_interval=0.01)
+        record, _ = await worker_a.load("CA1")
+        record["qualified"] = {"qualified": True}
+        worker_a.save(record)
+        await worker_a.writer.close()
+        worker_b = SQLiteSessionStore(db_path, flush_interval=0.01)
+        seen, created = worker_b.get_or_create("CA1")
+        assert not created
+        assert seen["qualified"] == {"qualified": True}
+        await worker_b.writer.close()
+        again, _ = await SQLiteSessionStore(db_path).load("CA1")
+        assert again["qualified"] == {"qualified": True}
+    asyncio.run(run())
+
+
+def test_older_rows_never_overwrite_newer_ones(db_path):
+    store = SQLiteSessionStore(db_path)
+    store._unflushed["CA1"] = 2
+    store._write_rows([("CA1", '{"last_intent": "new"}', 200.0)])
+    store._write_rows([("CA1", '{"last_intent": "old"}', 100.0)])
+    assert store.get("CA1")["last_intent"] == "new"
+    assert not store._unflushed
+
+
+def test_full_queue_writes_off_the_event_loop(db_path):
+    async def run():
+        store = SQLiteSessionStore(db_path)
+        store.writer.max_queue = 0
+        written_on = []
+        write_rows = store._write_rows
+
+        def spy(rows):
+            written_on.append(threading.get_ident())
+            write_rows(rows)
+        store._write_rows = spy
+        record, _ = store._local.get_or_create("CA1")
+        record["last_intent"] = "cancel_call"
+        store.save(record)
+        deadline = time.monotonic() + 2
+        while store._unflushed and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert written_on and threading.get_ident() not in written_on
+        assert store.get("CA1")["last_intent"] == "cancel_call"
+    asyncio.run(run())
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from core import agent
+from core.agent import speculation_matches, take_speculation, speculate_turn, PartialSpeculator
+
+
+@pytest.mark.parametrize("speculated, final, expected", [
+    ("book a call for tomorrow", "Book a call for tomorrow.", True),
+    ("book a call for tomorrow afternoon", "book a call for tomorrow afternoon please", True),
+    ("book a call at 3", "book a call at 4", False),
+    ("book a call at 3", "book a call at 3 30", False),
+    ("book a call tomorrow", "cancel my call tomorrow", False),
+    ("I'd like a 30 minute call", "I'd like a 30-minute call", True),
+])
+def test_speculation_matches(speculated, final, expected):
+    assert speculation_matches(speculated, final) == expected
+
+
+def speculation(text, result=None, error=None, delay=0.0):
+    async def plan():
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result or {"plan": {"intent": "book_call"}}
+    return {"text": text, "task": asyncio.create_task(plan()), "contact": {"name": "Vaishakh"}}
+
+
+def test_matching_speculation_is_used():
+    async def run():
+        state = {"speculation": speculation("book a call for tomorrow", delay=0.01)}
+        result = await take_speculation(state, "Book a call for tomorrow.")
+        assert state["speculation"] is None
+        return result
+    assert asyncio.run(run()) == {"plan": {"intent": "book_call"}, "contact": {"name": "Vaishakh"}}
+
+
+def test_different_utterance_cancels_the_speculation():
+    async def run():
+        spec = speculation("book a call at 3", delay=10)
+        state = {"speculation": spec}
+        assert await take_speculation(state, "book a call at 4") is None
+        await asyncio.sleep(0)
+        assert spec["task"].cancelled()
+        assert state["speculation"] is None
+    asyncio.run(run())
+
+
+def test_failed_or_cancelled_speculation_is_a_miss():
+    async def run():
+        failed = {"speculation": speculation("book a call tomorrow", error=RuntimeError("Gemini 500"))}
+        assert await take_speculation(failed, "book a call tomorrow") is None
+        cancelled = speculation("book a call tomorrow", delay=10)
+        cancelled["task"].cancel()
+        await asyncio.sleep(0)
+        assert await take_speculation({"speculation": cancelled}, "book a call tomorrow") is None
+        assert await take_speculation({}, "book a call tomorrow") is None
+    asyncio.run(run())
+
+
+def test_speculation_from_another_loop_is_not_awaited():
+    # E.g. a worker thread's loop; awaiting its task here would fail
+    other_loop = asyncio.new_event_loop()
+    spec = {"text": "book a call tomorrow", "task": other_loop.create_task(asyncio.sleep(10)), "contact": {}}
+
+    async def run():
+        return await take_speculation({"speculation": spec}, "book a call tomorrow")
+    try:
+        assert asyncio.run(run()) is None
+        other_loop.run_until_complete(asyncio.sleep(0))
+        assert spec["task"].cancelled()
+    finally:
+        other_loop.close()
+
+
+@pytest.fixture
+def speculative_plans(monkeypatch):
+    started = []
+
+    async def fake_plan(text, contact):
+        started.append(text)
+        return {"plan": None}
+    monkeypatch.setattr(agent, "_speculative_plan", fake_plan)
+    return started
+
+
+def test_speculate_turn_skips_router_answers_and_pending_bookings(speculative_plans):
+    async def run():
+        state = agent.get_session_state("CAspec1")
+        assert speculate_turn("ok", "CAspec1") is None  # junk: the router answers it
+        state["booking_pending"] = True
+        assert speculate_turn("book a call for tomorrow", "CAspec1") is None
+        state["booking_pending"] = False
+        task = speculate_turn("book a call for tomorrow", "CAspec1")
+        assert speculate_turn("book a call for tomorrow", "CAspec1") is task  # same partial
+        await task
+        agent.discard_speculation(state)
+    asyncio.run(run())
+    assert speculative_plans == ["book a call for tomorrow"]
+
+
+def test_partial_speculator_waits_for_a_stable_partial(speculative_plans):
+    async def run():
+        speculator = PartialSpeculator("CAspec2", stable_ms=30, min_words=3)
+        speculator.update("partial", "book a")  # too short
+        speculator.update("partial", "book a call")
+        await asyncio.sleep(0.01)
+        speculator.update("partial", "book a call tomorrow")  # changed: restarts the wait
+        await asyncio.sleep(0.06)
+        speculator.update("partial", "book a call tomorrow at")
+        speculator.update("final", "Book a call tomorrow at noon.")  # final: no speculation
+        await asyncio.sleep(0.06)
+        agent.discard_speculation(agent.get_session_state("CAspec2"))
+    asyncio.run(run())
+    assert speculative_plans == ["book a call tomorrow"]
@@ -0,0 +1,97 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+import websockets
+from services import assembly
+from services.assembly import stream_transcribe
+
+
+class FakeSession:
+    """
+    Replies with the given messages, then closes like AssemblyAI dropping the socket.
+    """
+
+    def __init__(self, messages):
+        self.replies = asyncio.Queue()
+        for message in messages:
+            self.replies.put_nowait(json.dumps(message))
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def recv(self):
+        if self.replies.empty():
+            raise websockets.ConnectionClosed(None, None)
+        await asyncio.sleep(0.01)
+        return self.replies.get_nowait()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    holder = {}
+
+    class Sessions:
+        @asynccontextmanager
+        async def session(self):
+            yield holder["session"]
+
+    def use(messages):
+        holder["session"] = FakeSession(messages)
+        return holder["session"]
+    monkeypatch.setattr(assembly, "STT_SESSIONS", Sessions())
+    return use
+
+
+def test_finals_are_yielded_and_partials_reported(session):
+    session([
+        {"message_type": "PartialTranscript", "text": "book a"},
+        {"message_type": "FinalTranscript", "text": "Book a call."},
+        {"message_type": "SessionTerminated"},
+    ])
+    seen = []
+
+    async def audio():
+        yield b"\x00" * 4000
+
+    async def run():
+        return [text async for text in stream_transcribe(audio(), on_transcript=lambda kind, text: seen.append(kind))]
+    assert asyncio.run(run()) == ["Book a call."]
+    assert seen == ["partial", "final", "end"]
+
+
+def test_closed_session_stops_the_sender(session):
+    fake = session([{"message_type": "FinalTranscript", "text": "Hello."}])
+    stopped = []
+
+    async def endless_audio():
+        # A caller stream that never ends on its own
+        try:
+            while True:
+                yield b"\x00" * 1600
+                await asyncio.sleep(0.01)
+        finally:
+            stopped.append(True)
+
+    async def run():
+        return [text async for text in stream_transcribe(endless_audio())]
+    assert asyncio.run(asyncio.wait_for(run(), 2)) == ["Hello."]
+    assert stopped == [True]
+    assert fake.sent and all(frame == b"\x00" * 1600 for frame in map(bytes, fake.sent))
+
+
+def test_consumer_stopping_early_stops_the_sender(session):
+    session([{"message_type": "FinalTranscript", "text": "Hello."}] * 3)
+
+    async def endless_audio():
+        while True:
+            yield b"\x00" * 1600
+            await asyncio.sleep(0.01)
+
+    async def run():
+        transcripts = stream_transcribe(endless_audio())
+        first = await transcripts.__anext__()
+        await transcripts.aclose()
+        return first
+    assert asyncio.run(asyncio.wait_for(run(), 2)) == "Hello."
@@ -0,0 +1,76 @@
+import json
+import asyncio
+import pytest
+from core import agent
+from core.agent import validate_turn_plan, plan_reply, SLOT_PLACEHOLDER
+
+VALID_PLAN = {
+    "qualified": True,
+    "reason": "Series B SaaS founder",
+    "route_to": None,
+    "intent": "book_call",
+    "datetime": "tomorrow 3pm",
+    "duration": "30m",
+    "reply": f"  You're booked for {SLOT_PLACEHOLDER}.  ",
+}
+
+
+def test_valid_plan_is_normalised():
+    plan = validate_turn_plan(dict(VALID_PLAN, reason=None))
+    assert plan["reply"] == f"You're booked for {SLOT_PLACEHOLDER}."
+    assert plan["reason"] == ""
+    assert plan["route_to"] is None
+
+
+@pytest.mark.parametrize("changes", [
+    {"qualified": "yes"},
+    {"qualified": None},
+    {"route_to": "Bob"},
+    {"intent": "book"},
+    {"datetime": 15},
+    {"duration": ["30m"]},
+    {"reply": ""},
+    {"reply": "   "},
+    {"reply": None},
+])
+def test_invalid_plans_are_rejected(changes):
+    with pytest.raises(ValueError):
+        validate_turn_plan(dict(VALID_PLAN, **changes))
+
+
+def test_non_object_is_rejected():
+    with pytest.raises(ValueError):
+        validate_turn_plan(["not", "a", "plan"])
+
+
+def test_plan_reply_fills_the_slot():
+    plan = validate_turn_plan(VALID_PLAN)
+    assert plan_reply(plan, "2025-07-01T15:00:00Z") == "You're booked for 2025-07-01T15:00:00Z."
+
+
+def test_plan_reply_needs_a_slot_for_a_placeholder():
+    assert plan_reply(validate_turn_plan(VALID_PLAN)) is None
+
+
+def test_plan_reply_without_placeholder():
+    plan = validate_turn_plan(dict(VALID_PLAN, intent="ask_question", reply="We build AI agents."))
+    assert plan_reply(plan) == "We build AI agents."
+    assert plan_reply(plan, "ignored") == "We build AI agents."
+
+
+def test_plan_reply_without_plan():
+    assert plan_reply(None, "slot") is None
+
+
+@pytest.mark.parametrize("raw, ok", [
+    (json.dumps(VALID_PLAN), True),
+    ("```json\n" + json.dumps(VALID_PLAN) + "\n```", True),
+    ("not json", False),
+    (json.dumps(dict(VALID_PLAN, intent="dance")), False),
+])
+def test_plan_turn_strips_fences_and_falls_back(monkeypatch, raw, ok):
+    async def fake_generate(prompt):
+        return raw
+    monkeypatch.setattr(agent, "llm_generate", fake_generate)
+    plan = asyncio.run(agent.plan_turn("Book me a call", agent.pick_contact()))
+    assert (plan is not None) == ok
@@ -0,0 +1,112 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from routes import voice
+from routes.voice import ends_call
+
+CALL_SID = "CAstream1"
+
+
+@pytest.mark.parametrize("result, expected", [
+    ({"intent": "cancel_call", "qualification": {"qualified": True}}, True),
+    ({"intent": "book_call", "qualification": {"qualified": False}}, True),
+    ({"intent": "book_call", "qualification": {"qualified": True}}, False),
+    ({"intent": "ask_question", "qualification": {}}, False),
+    ({"intent": None}, False),
+])
+def test_ends_call(result, expected):
+    assert ends_call(result) == expected
+
+
+class FakeAssemblyAI:
+    """
+    Yields the given transcript messages, then stays open like a live session.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(bytes(frame))
+
+    async def close(self):
+        pass
+
+    async def __aiter__(self):
+        for message in self.messages:
+            await asyncio.sleep(0.05)
+            yield json.dumps(message)
+        await asyncio.Event().wait()
+
+
+@pytest.fixture
+def stream_call(monkeypatch):
+    hangups = []
+    replies = []
+
+    def run(intent, qualified=True):
+        aai = FakeAssemblyAI([{"message_type": "FinalTranscript", "text": "please cancel my call"}])
+
+        class Sessions:
+            @asynccontextmanager
+            async def session(self):
+                yield aai
+
+        async def fake_agent_loop(text, session_id, synthesize):
+            replies.append(text)
+            return {"text": "Okay, goodbye.", "intent": intent, "qualification": {"qualified": qualified}}
+
+        async def fake_speak_stream(text, **kwargs):
+            yield b"\xff" * 320
+
+        async def fake_load_session_state(call_sid):
+            return {}
+        monkeypatch.setattr(voice, "STT_SESSIONS", Sessions())
+        monkeypatch.setattr(voice, "agent_loop", fake_agent_loop)
+        monkeypatch.setattr(voice, "speak_stream", fake_speak_stream)
+        monkeypatch.setattr(voice, "load_session_state", fake_load_session_state)
+        monkeypatch.setattr(voice, "hangup_call", hangups.append)
+        monkeypatch.setattr(voice, "TWILIO_HANGUP_GRACE", 2)
+        app = FastAPI()
+        app.include_router(voice.router)
+        events = []
+        with TestClient(app) as client, client.websocket_connect("/twilio/stream") as ws:
+            ws.send_text(json.dumps({"event": "start", "streamSid": "MZ1", "start": {"callSid": CALL_SID}}))
+            try:
+                for _ in range(200):
+                    message = json.loads(ws.receive_text())
+                    events.append(message["event"])
+                    if message["event"] == "mark":
+                        # Twilio echoes a mark once the caller has heard the audio before it
+                        ws.send_text(json.dumps({"event": "mark", "mark": message["mark"]}))
+                        if intent != "cancel_call" and qualified and events.count("mark") == 2:
+                            break
+            except WebSocketDisconnect:
+                events.append("closed")
+        return events, replies, hangups
+    return run
+
+
+def test_cancel_confirmation_hangs_up_the_stream(stream_call):
+    events, replies, hangups = stream_call("cancel_call")
+    assert replies == ["please cancel my call"]
+    assert hangups == [CALL_SID]
+    assert events.count("mark") == 2  # greeting, then the goodbye
+    assert events[-1] == "closed"
+
+
+def test_unqualified_goodbye_hangs_up_the_stream(stream_call):
+    events, _, hangups = stream_call("book_call", qualified=False)
+    assert hangups == [CALL_SID]
+    assert events[-1] == "closed"
+
+
+def test_ordinary_reply_keeps_the_call_open(stream_call):
+    events, replies, hangups = stream_call("book_call")
+    assert replies and not hangups
+    assert "closed" not in events
@@ -0,0 +1,72 @@
+import warnings
+import numpy as np
+import pytest
+from services.audio import ULAW_DECODE_TABLE, ULAW_ENCODE_TABLE, ulaw_to_pcm16, pcm16_to_ulaw
+
+# Scalar reference G.711 μ-law codec (Sun Microsystems g711.c), independent of the numpy tables
+SEG_END = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+
+def reference_encode(sample):
+    pcm = sample >> 2
+    if pcm < 0:
+        pcm, mask = -pcm, 0x7F
+    else:
+        mask = 0xFF
+    pcm = min(pcm, 8159) + 0x21
+    seg = next((i for i, end in enumerate(SEG_END) if pcm <= end), 8)
+    if seg >= 8:
+        return 0x7F ^ mask
+    return ((seg << 4) | ((pcm >> (seg + 1)) & 0x0F)) ^ mask
+
+
+def reference_decode(code):
+    code = ~code & 0xFF
+    t = (((code & 0x0F) << 3) + 0x84) << ((code & 0x70) >> 4)
+    return 0x84 - t if code & 0x80 else t - 0x84
+
+
+def test_decode_table_matches_reference():
+    assert ULAW_DECODE_TABLE.tolist() == [reference_decode(code) for code in range(256)]
+
+
+def test_encode_table_matches_reference():
+    samples = np.arange(-32768, 32768, dtype=np.int16)
+    expected = [reference_encode(int(s)) for s in samples]
+    assert ULAW_ENCODE_TABLE[samples.view(np.uint16)].tolist() == expected
+
+
+@pytest.mark.parametrize("code, sample", [
+    (0x00, -32124), (0x0F, -16764), (0x7E, -8), (0x7F, 0),
+    (0x80, 32124), (0x8F, 16764), (0xFE, 8), (0xFF, 0),
+])
+def test_known_decode_values(code, sample):
+    assert ulaw_to_pcm16(bytes([code]))[0] == sample
+
+
+@pytest.mark.parametrize("sample, code", [
+    (0, 0xFF), (-1, 0x7E), (-4, 0x7E), (32767, 0x80), (-32768, 0x00), (1000, 0xCE), (-1000, 0x4E),
+])
+def test_known_encode_values(sample, code):
+    assert pcm16_to_ulaw(np.array([sample], dtype=np.int16)) == bytes([code])
+
+
+def test_codes_survive_a_round_trip():
+    codes = bytes(range(256))
+    # 0x7F (-0) decodes to 0, which encodes as +0 (0xFF)
+    expected = codes.replace(b"\x7f", b"\xff")
+    assert pcm16_to_ulaw(ulaw_to_pcm16(codes)) == expected
+
+
+def test_encode_accepts_raw_bytes():
+    samples = np.array([0, 1000, -1000, 32767], dtype=np.int16)
+    assert pcm16_to_ulaw(samples.tobytes()) == pcm16_to_ulaw(samples)
+
+
+def test_matches_audioop():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")  # removed in Python 3.13
+    samples = np.arange(-32768, 32768, dtype=np.int16)
+    assert pcm16_to_ulaw(samples) == audioop.lin2ulaw(samples.tobytes(), 2)
+    assert ulaw_to_pcm16(bytes(range(256))).tobytes() == audioop.ulaw2lin(bytes(range(256)), 2)